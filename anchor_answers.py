@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from server.database_utils import db_operation
+from task_config import ANCHOR_ANSWER_CACHE_TTL, USER_ROLE
+
+
+def _parse_json(value, default):
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except Exception:
+            return default
+    return value if value is not None else default
+
+
+def parse_anchor_answers(row) -> Dict[str, str]:
+    """
+    workspace_id -> anchor answer for one users_updated row
+
+    Only workspaces the user has joined count, as in the per-user lookup this replaces.
+    """
+    workspaces = _parse_json(row.get('workspaces'), [])
+    anchor_answers = _parse_json(row.get('anchor_answers'), {})
+    if not isinstance(workspaces, list) or not isinstance(anchor_answers, dict):
+        return {}
+    joined = {str(ws_id) for ws_id in workspaces}
+    return {str(ws_id): answer for ws_id, answer in anchor_answers.items()
+            if str(ws_id) in joined and answer}
+
+
+class AnchorAnswerCache:
+    """Anchor answers of all eligible users, grouped by workspace.
+
+    Filled with one query over users_updated; the JSON columns are parsed once per load.
+    Users invalidated after an update are re-read together on the next lookup, and the
+    whole mapping is reloaded once it is older than `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float = ANCHOR_ANSWER_CACHE_TTL):
+        self.ttl = ttl
+        self._by_workspace: Dict[str, Dict[str, str]] = {}
+        self._workspaces_of: Dict[str, set] = {}
+        self._loaded_at: Optional[float] = None
+        self._stale_users: set = set()
+        self._lock = threading.RLock()
+        self.stats = {'full_loads': 0, 'partial_loads': 0, 'lookups': 0}
+
+    def _set_user(self, user_id: str, answers: Dict[str, str]):
+        for ws_id in self._workspaces_of.pop(user_id, ()):
+            members = self._by_workspace.get(ws_id)
+            if members is not None:
+                members.pop(user_id, None)
+                if not members:
+                    del self._by_workspace[ws_id]
+        if answers:
+            for ws_id, answer in answers.items():
+                self._by_workspace.setdefault(ws_id, {})[user_id] = answer
+            self._workspaces_of[user_id] = set(answers)
+
+    def _load_all(self):
+        rows = db_operation('''
+            SELECT id, workspaces, anchor_answers FROM users_updated
+            WHERE role = %s AND status = 'active'
+        ''', [USER_ROLE], fetch_all=True)
+        if rows is False:
+            return
+        self._by_workspace = {}
+        self._workspaces_of = {}
+        for row in rows or []:
+            self._set_user(str(row['id']), parse_anchor_answers(row))
+        self._stale_users.clear()
+        self._loaded_at = time.monotonic()
+        self.stats['full_loads'] += 1
+
+    def _load_users(self, user_ids):
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        rows = db_operation(f'''
+            SELECT id, workspaces, anchor_answers FROM users_updated
+            WHERE role = %s AND status = 'active' AND id IN ({placeholders})
+        ''', [USER_ROLE] + list(user_ids), fetch_all=True)
+        if rows is False:
+            return
+        found = {str(row['id']): row for row in rows or []}
+        for user_id in user_ids:
+            row = found.get(user_id)
+            # Users that are no longer active drop out of the mapping
+            self._set_user(user_id, parse_anchor_answers(row) if row else {})
+        self._stale_users.difference_update(user_ids)
+        self.stats['partial_loads'] += 1
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            self._load_all()
+        elif self._stale_users:
+            self._load_users(sorted(self._stale_users))
+
+    def workspace_answers(self, workspace_id, user_ids: Optional[Iterable] = None) -> Dict[str, str]:
+        """
+        user_id -> anchor answer for a workspace
+
+        Args:
+            workspace_id: Workspace to look up
+            user_ids: Restrict to these users (e.g. users eligible for a task)
+        """
+        with self._lock:
+            self.stats['lookups'] += 1
+            self._ensure_loaded()
+            answers = self._by_workspace.get(str(workspace_id), {})
+            if user_ids is None:
+                return dict(answers)
+            return {str(user_id): answers[str(user_id)] for user_id in user_ids if str(user_id) in answers}
+
+    def user_answer(self, user_id, workspace_id) -> str:
+        with self._lock:
+            self.stats['lookups'] += 1
+            self._ensure_loaded()
+            return self._by_workspace.get(str(workspace_id), {}).get(str(user_id), "")
+
+    def invalidate(self, user_id=None):
+        """Mark one user (after an update to their row) or everything as stale"""
+        with self._lock:
+            if user_id is None:
+                self._loaded_at = None
+            else:
+                self._stale_users.add(str(user_id))
+
+    def get_stats(self) -> Dict:
+        return {
+            'workspaces': len(self._by_workspace),
+            'users': len(self._workspaces_of),
+            'stale_users': len(self._stale_users),
+            'age_seconds': round(time.monotonic() - self._loaded_at, 1) if self._loaded_at is not None else None,
+            **self.stats
+        }
+
+
+anchor_answer_cache = AnchorAnswerCache()
+
+
+def invalidate_anchor_answers(user_id=None):
+    """
+    Call after a user's workspaces or anchor answers change
+
+    Only this process's cache is invalidated; caches in other processes (e.g. a
+    separate scheduler) pick the change up at their next full reload, after
+    ANCHOR_ANSWER_CACHE_TTL seconds.
+    """
+    anchor_answer_cache.invalidate(user_id)
@@ -0,0 +1,208 @@
+"""
+Per-area coverage counters, kept up to date as responses and tasks are written.
+
+One row per (source, area, day), where source is 'lexi' or 'workspace:<id>':
+    visits      rows that got a user (lexi reports, assigned or answered tasks), by that day
+    unassigned  tasks still waiting for a user, by the day they were created
+    completed   tasks completed, by completion day
+
+Writers add counter_upsert(...) to the transaction that changes the underlying rows,
+so the counters move atomically with the data. Readers get per-area totals from
+O(areas x days) counter rows instead of scanning response history.
+
+    python area_coverage.py rebuild     # recompute every counter from the lexi and tasks tables
+"""
+import sys
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+COVERAGE_TABLE = 'area_coverage'
+LEXI_SOURCE = 'lexi'
+COUNTERS = ('visits', 'unassigned', 'completed')
+
+CREATE_COVERAGE_TABLE = f'''
+    CREATE TABLE IF NOT EXISTS {COVERAGE_TABLE} (
+        source VARCHAR(64) NOT NULL,
+        area VARCHAR(255) NOT NULL,
+        day DATE NOT NULL,
+        visits INT NOT NULL DEFAULT 0,
+        unassigned INT NOT NULL DEFAULT 0,
+        completed INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (source, area, day)
+    )
+'''
+
+_table_ready = False
+
+
+def _database_utils():
+    # The Flask server imports database_utils directly; the task modules run inside the
+    # server package
+    try:
+        import database_utils
+    except ImportError:
+        from server import database_utils
+    return database_utils
+
+
+def workspace_source(workspace_id) -> str:
+    return f"workspace:{workspace_id}"
+
+
+def _day(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and value:
+        return datetime.fromisoformat(value[:19]).date()
+    return datetime.now().date()
+
+
+def counter_upsert(source: str, events: Iterable[Tuple[str, object, Dict[str, int]]]):
+    """
+    Operation that adds counter deltas, for db_transaction / db_claim_rows
+
+    Args:
+        source: 'lexi' or workspace_source(id)
+        events: (area, day, {'visits': 1, 'unassigned': -1, ...}) per changed row
+
+    Returns:
+        (query, params_list) pair; params_list is empty when nothing changes
+    """
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for area, day, deltas in events:
+        if not area:
+            continue
+        row = totals[(str(area), _day(day))]
+        for counter, delta in deltas.items():
+            row[counter] += delta
+    params = [[source, area, day] + [row[c] for c in COUNTERS]
+              for (area, day), row in sorted(totals.items()) if any(row.values())]
+    query = f'''
+        INSERT INTO {COVERAGE_TABLE} (source, area, day, {', '.join(COUNTERS)})
+        VALUES (%s, %s, %s, {', '.join(['%s'] * len(COUNTERS))})
+        ON DUPLICATE KEY UPDATE {', '.join(f'{c} = {c} + VALUES({c})' for c in COUNTERS)}
+    '''
+    return query, params
+
+
+def ensure_coverage_table() -> bool:
+    """Create the counters table if needed; a newly created table is filled with rebuild()"""
+    global _table_ready
+    if _table_ready:
+        return True
+    db = _database_utils()
+    exists = db.db_operation(f"SHOW TABLES LIKE '{COVERAGE_TABLE}'", fetch_one=True)
+    if exists is False:
+        return False
+    if not db.db_operation(CREATE_COVERAGE_TABLE):
+        return False
+    _table_ready = True
+    if not exists:
+        print(f"[AreaCoverage] Created {COVERAGE_TABLE}, building counters from existing data")
+        rebuild()
+    return True
+
+
+def area_totals(source: str, areas: Optional[List[str]] = None,
+                since: Optional[date] = None) -> Dict[str, Dict[str, int]]:
+    """
+    area -> {'visits', 'unassigned', 'completed'} summed over days, in one query
+
+    Args:
+        source: 'lexi' or workspace_source(id)
+        areas: Only these areas (all areas with counters if None)
+        since: Only days on or after this date
+    """
+    ensure_coverage_table()
+    conditions = ['source = %s']
+    params: list = [source]
+    if areas is not None:
+        if not areas:
+            return {}
+        conditions.append(f"area IN ({', '.join(['%s'] * len(areas))})")
+        params.extend(areas)
+    if since is not None:
+        conditions.append('day >= %s')
+        params.append(since)
+    rows = _database_utils().db_operation(f'''
+        SELECT area, {', '.join(f'SUM({c}) AS {c}' for c in COUNTERS)}
+        FROM {COVERAGE_TABLE}
+        WHERE {' AND '.join(conditions)}
+        GROUP BY area
+    ''', params, fetch_all=True) or []
+    return {row['area']: {c: int(row[c] or 0) for c in COUNTERS} for row in rows}
+
+
+def under_covered_areas(source: str, areas: List[str], limit: int = 5,
+                        since: Optional[date] = None) -> List[Tuple[str, int]]:
+    """The `limit` areas with the fewest visits, as (area, visits), for dashboards"""
+    totals = area_totals(source, areas, since)
+    visits = sorted(((area, totals.get(area, {}).get('visits', 0)) for area in areas), key=lambda item: item[1])
+    return visits[:limit]
+
+
+def _rebuild_operations(source_filter: str, source_expr: str, select_query: str) -> list:
+    return [
+        (f'DELETE FROM {COVERAGE_TABLE} WHERE source LIKE %s', [[source_filter]]),
+        (f'''
+            INSERT INTO {COVERAGE_TABLE} (source, area, day, {', '.join(COUNTERS)})
+            SELECT {source_expr}, area, day, SUM(visits), SUM(unassigned), SUM(completed)
+            FROM ({select_query}) events
+            WHERE area IS NOT NULL AND day IS NOT NULL
+            GROUP BY source_key, area, day
+        ''', [[]]),
+    ]
+
+
+def rebuild() -> int:
+    """
+    Recompute every counter from the lexi and tasks tables
+
+    Lexi and the workspaces are each replaced in one transaction.
+
+    Returns:
+        Number of sources rebuilt (lexi, workspaces)
+    """
+    from task_config import TASKS_TABLE
+
+    sources = [
+        (LEXI_SOURCE, f"'{LEXI_SOURCE}'", '''
+            SELECT NULL AS source_key, general_area AS area, DATE(created_at) AS day,
+                   1 AS visits, 0 AS unassigned, 0 AS completed
+            FROM lexi
+        '''),
+        (workspace_source('%'), f"CONCAT('{workspace_source('')}', source_key)", f'''
+            SELECT workspace_id AS source_key, area, DATE(COALESCE(time_task_assigned, time_task_created)) AS day,
+                   1 AS visits, 0 AS unassigned, 0 AS completed
+            FROM {TASKS_TABLE} WHERE user_id IS NOT NULL
+            UNION ALL
+            SELECT workspace_id, area, DATE(time_task_created), 0, 1, 0
+            FROM {TASKS_TABLE} WHERE user_id IS NULL
+            UNION ALL
+            SELECT workspace_id, area, DATE(time_completed), 0, 0, 1
+            FROM {TASKS_TABLE} WHERE time_completed IS NOT NULL
+        '''),
+    ]
+    db = _database_utils()
+    rebuilt = 0
+    for source_filter, source_expr, select_query in sources:
+        if db.db_transaction(_rebuild_operations(source_filter, source_expr, select_query)) is False:
+            print(f"[AreaCoverage] Failed to rebuild counters for {source_filter}")
+        else:
+            rebuilt += 1
+    print(f"[AreaCoverage] Rebuilt counters for {rebuilt}/{len(sources)} sources")
+    return rebuilt
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['rebuild']:
+        print("Usage: python area_coverage.py rebuild")
+        sys.exit(2)
+    if not ensure_coverage_table():
+        sys.exit(1)
+    # A table created just now was already rebuilt by ensure_coverage_table
+    sys.exit(0 if rebuild() else 1)
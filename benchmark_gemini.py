@@ -0,0 +1,178 @@
+"""
+Load benchmark for /check-typo and /format-answers.
+
+Runs against the in-process Flask app with the fake Gemini backend by default, so it needs
+no network and spends no quota. Pass --url to drive a running server instead.
+
+    python benchmark_gemini.py --rate 20 --duration 30
+    GEMINI_FAKE_LATENCY=uniform:0.1,1.5 GEMINI_FAKE_ERROR_RATE=0.05 python benchmark_gemini.py
+    python benchmark_gemini.py --url http://localhost:5000 --rate 5
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# Sentences are replayed word by word, like the client resending text after each debounce
+TYPO_SENTENCES = [
+    "I speak spanich and englsh at home",
+    "My family speaks Vietnamese and a little French",
+    "I heard people speaking Japanes near the campus center",
+    "Teh group was speaking Korean and Mandarin",
+    "I am learning Arabic and Portuguese this year",
+    "My freind speaks Hindi Urdu and Punjabi",
+    "We speak German at home and English at school",
+    "I recieve messages in Russian from my grandparents",
+]
+
+FORMAT_ANSWERS = [
+    "spanish, english",
+    "I speak English and Spanish and French",
+    "Vietnamese English I speak Japanese too",
+    "mandarin/cantonese",
+    "I can speak English, I also know Spanish, And a bit of French",
+    "I know Python, JavaScript, and React",
+    "Tagalog and some Ilocano",
+    "english, ENGLISH, spanish",
+]
+
+
+def build_workload(total: int, seed: int) -> List[Tuple[str, Dict]]:
+    """Build a deterministic mix of typo (growing prefixes) and format requests"""
+    rng = random.Random(seed)
+    requests = []
+    while len(requests) < total:
+        if rng.random() < 0.7:
+            words = rng.choice(TYPO_SENTENCES).split()
+            for i in range(3, len(words) + 1):
+                requests.append(('/check-typo', {'text': ' '.join(words[:i])}))
+        else:
+            requests.append(('/format-answers', {'text': rng.choice(FORMAT_ANSWERS), 'main_data_type': 'languages'}))
+    return requests[:total]
+
+
+class Driver:
+    """Sends requests either through the Flask test client or over HTTP"""
+
+    def __init__(self, url: Optional[str]):
+        self.url = url.rstrip('/') if url else None
+        if self.url:
+            import requests
+            self.session = requests.Session()
+        else:
+            from server import app
+            self.app = app
+            self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.app.test_client()
+        return self._local.client
+
+    def post(self, path: str, payload: Dict) -> Dict:
+        if self.url:
+            return self.session.post(self.url + path, json=payload, timeout=30).json()
+        return self._client().post(path, json=payload).get_json()
+
+    def stats(self) -> Dict:
+        if self.url:
+            return self.session.get(self.url + '/check-typo/stats', timeout=30).json()
+        return self._client().get('/check-typo/stats').get_json()
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(int(round(pct / 100 * (len(values) - 1))), len(values) - 1)
+    return round(values[index] * 1000, 2)
+
+
+def run_benchmark(driver: Driver, rate: float, duration: float, workers: int, seed: int) -> Dict:
+    """Drive the endpoints open-loop at `rate` requests/second and summarize the results"""
+    workload = build_workload(max(1, int(rate * duration)), seed)
+    latencies: Dict[str, List[float]] = {}
+    outcomes = {'ok': 0, 'degraded': 0, 'error': 0, 'local': 0}
+    lock = threading.Lock()
+
+    def send(path: str, payload: Dict):
+        start = time.perf_counter()
+        try:
+            result = driver.post(path, payload) or {}
+            outcome = 'degraded' if 'degraded' in result else 'error' if 'error' in result else 'ok'
+        except Exception:
+            result, outcome = {}, 'error'
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.setdefault(path, []).append(elapsed)
+            outcomes[outcome] += 1
+            if result.get('source') == 'local':
+                outcomes['local'] += 1
+
+    before = driver.stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, (path, payload) in enumerate(workload):
+            # Open-loop schedule: request i leaves at start + i / rate regardless of response times
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, path, payload)
+    elapsed = time.perf_counter() - start
+    after = driver.stats()
+
+    upstream_calls = (after.get('client') or {}).get('total_calls', 0) - (before.get('client') or {}).get('total_calls', 0)
+    total = len(workload)
+    all_latencies = [l for values in latencies.values() for l in values]
+    return {
+        'requests': total,
+        'target_rate': rate,
+        'achieved_rate': round(total / elapsed, 2) if elapsed else None,
+        'outcomes': outcomes,
+        'latency_ms': {
+            'all': {'p50': percentile(all_latencies, 50), 'p99': percentile(all_latencies, 99)},
+            **{path: {'p50': percentile(values, 50), 'p99': percentile(values, 99), 'count': len(values)}
+               for path, values in latencies.items()}
+        },
+        'upstream_calls': upstream_calls,
+        'upstream_calls_saved': total - upstream_calls,
+        'cache_hit_ratio': round(1 - upstream_calls / total, 3) if total else 0.0,
+        'word_cache_hits': after.get('word_cache_hits', 0) - before.get('word_cache_hits', 0),
+        'format_local_hit_rate': after.get('format_local_hit_rate'),
+        'upstream_latency_ms': (after.get('client') or {}).get('latency_ms'),
+        'circuit_breaker': (after.get('client') or {}).get('circuit_breaker'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Gemini-backed endpoints')
+    parser.add_argument('--url', help='Base URL of a running server (default: in-process app with fake backend)')
+    parser.add_argument('--rate', type=float, default=10.0, help='Target requests per second')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds of load to generate')
+    parser.add_argument('--workers', type=int, default=32, help='Concurrent request threads')
+    parser.add_argument('--seed', type=int, default=42, help='Workload seed')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    if not args.url:
+        # Offline run: fake model, private quota file and limits that never interfere
+        os.environ.setdefault('GEMINI_BACKEND', 'fake')
+        os.environ.setdefault('GEMINI_QUOTA_DB', os.path.join(tempfile.mkdtemp(), 'gemini_quota.sqlite3'))
+        os.environ.setdefault('GEMINI_MAX_DAILY_CALLS', '1000000')
+        os.environ.setdefault('GEMINI_CALLS_PER_SECOND', '1000')
+        os.environ.setdefault('GEMINI_BURST_CALLS', '1000')
+
+    report = run_benchmark(Driver(args.url), args.rate, args.duration, args.workers, args.seed)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
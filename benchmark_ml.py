@@ -0,0 +1,244 @@
+"""
+Throughput benchmark for the entity analyzer (MLanguageAnalyzer).
+
+Runs a seeded synthetic corpus of users_lexi.anchor_answer-style answers through
+extract_entities_ml, calculate_comprehensive_score(s_batch) and rank_users_for_task_ml,
+across text lengths, batch sizes and CPU thread counts. Reports per-stage latency,
+items/sec, model load time and peak RSS as JSON, optionally compared with a baseline.
+
+Every stage starts from an empty embedding store and similarity index in a temp
+directory: `cold_ms` is its first call, the other timings cover the `--repeats` warm
+calls that follow.
+
+    python benchmark_ml.py --output ml_bench.json
+    python benchmark_ml.py --threads 1 2 4 --batch-sizes 1 8 32 --baseline ml_bench.json
+    python benchmark_ml.py --cold            # no embedding store, lexicon or similarity index
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Corpus vocabulary; answers are stored as JSON arrays and embedded joined with ', '
+CORPUS_LANGUAGES = [
+    "English", "Spanish", "French", "Vietnamese", "Mandarin", "Cantonese", "Korean", "Japanese",
+    "Tagalog", "Arabic", "Hindi", "Urdu", "Portuguese", "German", "Russian", "Italian", "Farsi",
+]
+CORPUS_PHRASES = [
+    "{lang}",
+    "I speak {lang}",
+    "fluent in {lang}",
+    "a little {lang}",
+    "learning {lang} at school",
+    "{lang} at home with my family",
+    "I understand {lang} but don't speak it well",
+    "native {lang} speaker",
+]
+# Items per answer for each length bucket
+TEXT_LENGTHS = {'short': (1, 2), 'medium': (3, 4), 'long': (6, 10)}
+
+
+def build_corpus(count: int, length: str, seed: int) -> List[str]:
+    """Deterministic anchor answers (as embedded text) for one length bucket"""
+    from embedding_store import anchor_answer_text
+
+    rng = random.Random(f"{seed}-{length}")
+    low, high = TEXT_LENGTHS[length]
+    corpus = []
+    for _ in range(count):
+        items = [rng.choice(CORPUS_PHRASES).format(lang=rng.choice(CORPUS_LANGUAGES))
+                 for _ in range(rng.randint(low, high))]
+        corpus.append(anchor_answer_text(json.dumps(items)))
+    return corpus
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def set_threads(threads: int):
+    """Limit CPU threads for PyTorch (ONNX Runtime reads ONNX_NUM_THREADS at load time)"""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+
+
+@contextmanager
+def fresh_stores():
+    """Point the embedding store and similarity index at an empty temp directory"""
+    import embedding_store
+    import similarity_index
+
+    if not embedding_store.EMBEDDING_STORE_DIR:
+        # --cold: the stores are disabled altogether
+        yield
+        return
+    saved = embedding_store.EMBEDDING_STORE_DIR, similarity_index.SIMILARITY_INDEX_DIR
+    with tempfile.TemporaryDirectory(prefix='ml_bench_') as directory:
+        embedding_store.use_directory(directory)
+        similarity_index.use_directory(directory)
+        try:
+            yield
+        finally:
+            embedding_store.use_directory(saved[0])
+            similarity_index.use_directory(saved[1])
+
+
+def _measure(fn, items: int, repeats: int) -> Dict:
+    """Time one cold call on empty stores, then `repeats` warm calls"""
+    with fresh_stores():
+        start = time.perf_counter()
+        fn()
+        cold_seconds = time.perf_counter() - start
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    timings = np.array(timings)
+    return {
+        'items': items,
+        'cold_ms': round(cold_seconds * 1000, 3),
+        'mean_ms': round(float(timings.mean()) * 1000, 3),
+        'p50_ms': round(float(np.median(timings)) * 1000, 3),
+        'per_item_ms': round(float(timings.mean()) * 1000 / max(items, 1), 3),
+        'items_per_sec': round(items / float(timings.mean()), 2) if timings.mean() else None,
+    }
+
+
+def run_suite(args) -> Dict:
+    from model_registry import model_registry
+    from sentiment_analysis import MLanguageAnalyzer
+
+    # Model load time (cold, first use in this process)
+    load_start = time.perf_counter()
+    for key in ('ner', 'zero_shot', 'sentence_transformer'):
+        model_registry.get(key)
+    load_seconds = time.perf_counter() - load_start
+
+    results: Dict[str, Dict] = {}
+    for threads in args.threads:
+        set_threads(threads)
+        for length in args.lengths:
+            corpus = build_corpus(args.corpus_size, length, args.seed)
+            prefix = f"threads={threads}/length={length}"
+
+            # A fresh analyzer per stage so its in-memory caches start empty
+            analyzer = MLanguageAnalyzer("languages")
+            sample = corpus[:args.single_items]
+            results[f"{prefix}/extract_entities_ml"] = _measure(
+                lambda: [analyzer.extract_entities_ml(text) for text in sample], len(sample), args.repeats)
+            analyzer = MLanguageAnalyzer("languages")
+            results[f"{prefix}/calculate_comprehensive_score"] = _measure(
+                lambda: [analyzer.calculate_comprehensive_score(text) for text in sample], len(sample), args.repeats)
+
+            for batch_size in args.batch_sizes:
+                analyzer = MLanguageAnalyzer("languages")
+                results[f"{prefix}/batch={batch_size}/calculate_comprehensive_scores_batch"] = _measure(
+                    lambda: analyzer.calculate_comprehensive_scores_batch(corpus, batch_size=batch_size),
+                    len(corpus), args.repeats)
+
+            analyzer = MLanguageAnalyzer("languages")
+            users = {f"user{i}": text for i, text in enumerate(corpus)}
+            area_answers = build_corpus(args.area_answers, 'short', args.seed + 1)
+            results[f"{prefix}/rank_users_for_task_ml"] = _measure(
+                lambda: analyzer.rank_users_for_task_ml(users, area_answers, "Benchmark Area"),
+                len(users), args.repeats)
+
+    return {
+        'config': {
+            'corpus_size': args.corpus_size,
+            'single_items': args.single_items,
+            'area_answers': args.area_answers,
+            'repeats': args.repeats,
+            'seed': args.seed,
+            'cold': args.cold,
+            'inference_backend': model_registry.backend,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+        },
+        'model_load_seconds': round(load_seconds, 2),
+        'model_stats': model_registry.get_stats()['models'],
+        'stages': results,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def compare_with_baseline(report: Dict, baseline: Dict, tolerance: float) -> Dict:
+    """Per-stage mean latency ratio against the baseline; ratios above 1 + tolerance are regressions"""
+    comparison = {}
+    regressions = []
+    for stage, current in report['stages'].items():
+        previous = baseline.get('stages', {}).get(stage)
+        if not previous or not previous.get('mean_ms'):
+            continue
+        ratio = round(current['mean_ms'] / previous['mean_ms'], 3)
+        comparison[stage] = {'baseline_ms': previous['mean_ms'], 'current_ms': current['mean_ms'], 'ratio': ratio}
+        if ratio > 1 + tolerance:
+            regressions.append(stage)
+
+    if baseline.get('peak_rss_mb'):
+        comparison['peak_rss_mb'] = {
+            'baseline': baseline['peak_rss_mb'],
+            'current': report['peak_rss_mb'],
+            'ratio': round(report['peak_rss_mb'] / baseline['peak_rss_mb'], 3)
+        }
+    return {'tolerance': tolerance, 'stages': comparison, 'regressions': regressions}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the ML entity analyzer')
+    parser.add_argument('--corpus-size', type=int, default=64, help='Answers per length bucket')
+    parser.add_argument('--single-items', type=int, default=16, help='Answers timed one call at a time')
+    parser.add_argument('--area-answers', type=int, default=8, help='Area answers for rank_users_for_task_ml')
+    parser.add_argument('--lengths', nargs='+', default=list(TEXT_LENGTHS), choices=list(TEXT_LENGTHS))
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--threads', nargs='+', type=int, default=[os.cpu_count() or 1])
+    parser.add_argument('--repeats', type=int, default=3, help='Timed repetitions per stage')
+    parser.add_argument('--seed', type=int, default=42, help='Corpus seed')
+    parser.add_argument('--cold', action='store_true',
+                        help='Disable the embedding store, lexicon fast path and similarity index')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--baseline', help='Compare against a previous JSON report')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed slowdown vs baseline (0.1 = 10%%)')
+    args = parser.parse_args(argv)
+
+    if args.cold:
+        # Read at import time by the analyzer modules, so set before importing them
+        os.environ['EMBEDDING_STORE_DIR'] = ''
+        os.environ['ML_LEXICON_FAST_PATH'] = '0'
+        os.environ['ML_SIMILARITY_INDEX'] = '0'
+
+    report = run_suite(args)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['baseline_comparison'] = compare_with_baseline(report, json.load(f), args.tolerance)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    regressions = report.get('baseline_comparison', {}).get('regressions')
+    if regressions:
+        print(f"[Benchmark] {len(regressions)} stage(s) slower than baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
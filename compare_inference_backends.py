@@ -0,0 +1,134 @@
+"""
+Accuracy vs latency report for the PyTorch and quantized ONNX Runtime model backends.
+
+Runs a fixed sample through NER, zero-shot and sentence embeddings on both backends and
+reports per-stage latency next to agreement with the PyTorch outputs.
+
+    python compare_inference_backends.py
+    ONNX_NUM_THREADS=2 python compare_inference_backends.py --output onnx_report.json
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from model_registry import ModelRegistry
+from sentiment_analysis import LANGUAGE_CATEGORIES
+
+# Fixed sample so reports from different machines and thread settings are comparable
+SAMPLE_TEXTS = [
+    "I speak English and Spanish.",
+    "My family speaks Vietnamese at home and I learned French in school.",
+    "I'm fluent in Mandarin, conversational in Cantonese.",
+    "Heard Korean and Japanese near the library.",
+    "Arabic, Hindi, and a little Urdu",
+    "I grew up in Brazil so Portuguese is my first language.",
+    "Some German and Russian from my grandparents.",
+    "Tagalog",
+    "I can read Italian but I don't speak it well.",
+    "Mostly English, basic Spanish, learning Korean.",
+]
+ZERO_SHOT_LABELS = ["is a language name", "is a country name", "is a person name", "is a place name"]
+
+
+def _timed(fn, runs: int) -> Dict:
+    """Run fn `runs` times; return the last result and latency summary in ms"""
+    timings = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'result': result, 'mean_ms': round(float(np.mean(timings)), 2), 'p50_ms': round(float(np.median(timings)), 2)}
+
+
+def run_backend(backend: str, runs: int) -> Dict:
+    """Run the fixed sample through one backend"""
+    registry = ModelRegistry(backend=backend)
+    load_start = time.perf_counter()
+    ner = registry.get('ner')
+    zero_shot = registry.get('zero_shot')
+    sentence_model = registry.get('sentence_transformer')
+    load_seconds = time.perf_counter() - load_start
+
+    # One untimed pass so lazy session setup is not counted as inference
+    ner(SAMPLE_TEXTS[0])
+    zero_shot(SAMPLE_TEXTS[0], ZERO_SHOT_LABELS)
+    sentence_model.encode(SAMPLE_TEXTS[:1])
+
+    ner_run = _timed(lambda: [ner(text) for text in SAMPLE_TEXTS], runs)
+    zero_shot_run = _timed(lambda: [zero_shot(text, ZERO_SHOT_LABELS)['labels'][0] for text in SAMPLE_TEXTS], runs)
+    language_run = _timed(
+        lambda: [zero_shot(text, list(LANGUAGE_CATEGORIES))['labels'][0] for text in SAMPLE_TEXTS], runs)
+    embedding_run = _timed(lambda: np.asarray(sentence_model.encode(SAMPLE_TEXTS, batch_size=32)), runs)
+
+    return {
+        'backend': backend,
+        'load_seconds': round(load_seconds, 2),
+        'stats': registry.get_stats(),
+        'latency_ms': {
+            'ner': {k: v for k, v in ner_run.items() if k != 'result'},
+            'zero_shot': {k: v for k, v in zero_shot_run.items() if k != 'result'},
+            'language_category': {k: v for k, v in language_run.items() if k != 'result'},
+            'embedding': {k: v for k, v in embedding_run.items() if k != 'result'},
+        },
+        'outputs': {
+            'entities': [sorted({e['word'] for e in result}) for result in ner_run['result']],
+            'zero_shot': zero_shot_run['result'],
+            'language_category': language_run['result'],
+            'embeddings': embedding_run['result'],
+        }
+    }
+
+
+def _jaccard(a: List[str], b: List[str]) -> float:
+    a, b = set(a), set(b)
+    return 1.0 if not a and not b else len(a & b) / len(a | b)
+
+
+def compare(reference: Dict, candidate: Dict) -> Dict:
+    """Agreement of the candidate backend with the reference outputs"""
+    ref, cand = reference['outputs'], candidate['outputs']
+    ref_emb = ref['embeddings'] / np.linalg.norm(ref['embeddings'], axis=1, keepdims=True)
+    cand_emb = cand['embeddings'] / np.linalg.norm(cand['embeddings'], axis=1, keepdims=True)
+    cosines = np.sum(ref_emb * cand_emb, axis=1)
+    return {
+        'ner_entity_jaccard': round(float(np.mean([_jaccard(a, b) for a, b in zip(ref['entities'], cand['entities'])])), 3),
+        'zero_shot_top_label_agreement': round(float(np.mean([a == b for a, b in zip(ref['zero_shot'], cand['zero_shot'])])), 3),
+        'language_category_agreement': round(float(np.mean(
+            [a == b for a, b in zip(ref['language_category'], cand['language_category'])])), 3),
+        'embedding_cosine_mean': round(float(cosines.mean()), 4),
+        'embedding_cosine_min': round(float(cosines.min()), 4),
+        'speedup': {
+            stage: round(reference['latency_ms'][stage]['mean_ms'] / candidate['latency_ms'][stage]['mean_ms'], 2)
+            for stage in reference['latency_ms'] if candidate['latency_ms'][stage]['mean_ms']
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare PyTorch and ONNX Runtime inference backends')
+    parser.add_argument('--runs', type=int, default=3, help='Timed passes over the sample per stage')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    reference = run_backend('torch', args.runs)
+    candidate = run_backend('onnx', args.runs)
+
+    report = {
+        'samples': len(SAMPLE_TEXTS),
+        'runs': args.runs,
+        'torch': {k: v for k, v in reference.items() if k != 'outputs'},
+        'onnx': {k: v for k, v in candidate.items() if k != 'outputs'},
+        'agreement': compare(reference, candidate),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
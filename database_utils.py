@@ -64,38 +64,167 @@ def db_operation(query, params=None, fetch_one=False, fetch_all=False):
         if conn:
             conn.close()
 
-def expire_old_tasks():
-    """Expire old tasks that haven't been completed"""
+def db_transaction(operations):
+    """
+    Run several statements in one transaction (all or nothing)
+
+    Args:
+        operations: List of (query, params_list) pairs; each query runs once per params entry
+            through executemany
+
+    Returns:
+        Total rows affected, or False if the transaction failed and was rolled back
+    """
+    conn = None
+    try:
+        conn = connectDB(DB_NAME)
+        if not conn:
+            print("[DB] Failed to connect to database")
+            return False
+
+        affected = 0
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            for query, params_list in operations:
+                if not params_list:
+                    continue
+                cursor.executemany(query, params_list)
+                affected += cursor.rowcount
+        conn.commit()
+        print(f"[DB] Transaction committed: {len(operations)} statement(s) - Rows affected: {affected}")
+        return affected
+    except Exception as e:
+        print(f"[DB] Transaction error, rolling back: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def db_claim_rows(claim_query, params, process):
+    """
+    Lock rows, let `process` decide what to write for them, and commit it all in one transaction
+
+    claim_query should end in FOR UPDATE SKIP LOCKED (MySQL 8+) so concurrent workers,
+    threads or other server instances, claim disjoint rows instead of waiting on each other.
+
+    Args:
+        claim_query: SELECT ... FOR UPDATE SKIP LOCKED
+        params: Parameters for claim_query
+        process: Called with the claimed rows; returns a list of (query, params_list) pairs
+
+    Returns:
+        (claimed rows, rows affected); rows affected is False if the transaction was rolled back
+    """
+    conn = None
+    rows = []
+    try:
+        conn = connectDB(DB_NAME)
+        if not conn:
+            print("[DB] Failed to connect to database")
+            return [], False
+
+        conn.begin()
+        affected = 0
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(claim_query, params or ())
+            rows = cursor.fetchall()
+            for query, params_list in (process(rows) if rows else []):
+                if not params_list:
+                    continue
+                cursor.executemany(query, params_list)
+                affected += cursor.rowcount
+        conn.commit()
+        print(f"[DB] Claimed {len(rows)} rows - Rows affected: {affected}")
+        return rows, affected
+    except Exception as e:
+        print(f"[DB] Claim transaction error, rolling back: {e}")
+        if conn:
+            conn.rollback()
+        return rows, False
+    finally:
+        if conn:
+            conn.close()
+
+# Transitions applied by expire_old_tasks: name -> WHERE clause; %s is the expiry cutoff.
+# The cutoff comes from the application clock, like the assignment timestamps it is compared to.
+EXPIRY_TRANSITIONS = {
+    # Tasks not accepted within the window after assignment
+    'not_accepted': """
+        task_status IN ('created', 'assigned')
+        AND time_task_assigned IS NOT NULL
+        AND time_task_responded IS NULL
+        AND time_task_assigned < %s
+    """,
+    # Tasks not completed within the window after acceptance
+    'not_completed': """
+        task_status = 'accepted'
+        AND time_task_responded IS NOT NULL
+        AND time_completed IS NULL
+        AND time_task_responded < %s
+    """,
+}
+
+_expiry_stats = {'runs': 0, 'expired_total': 0, 'last_expired': None, 'last_duration_s': None,
+                 'last_chunks': None, 'last_run_at': None, 'failures': 0}
+
+def expire_old_tasks(expiry_hours=None, chunk_size=None):
+    """
+    Expire old tasks that haven't been completed
+
+    Each transition is one UPDATE over the tasks table, repeated in chunks of
+    chunk_size rows so no statement holds row locks for long. Every chunk uses the
+    same cutoff, computed once per run. While SYNC_WORKSPACE_TABLES is on, the
+    workspace tables are synced first and the expired tasks copied back afterwards.
+
+    Args:
+        expiry_hours: Hours before a task expires (TASK_EXPIRY_HOURS by default)
+        chunk_size: Rows per UPDATE (TASK_EXPIRY_CHUNK_SIZE by default)
+
+    Returns:
+        Number of tasks expired per transition
+    """
+    import time
     from datetime import datetime, timedelta
 
-    workspaces = db_operation('SELECT * FROM workspaces', fetch_all=True) or []
-    now = datetime.now()
-    for ws in workspaces:
-        ws_id = ws['id']
-        table_name = f"workspace_{ws_id}_responses"
-        # Expire tasks not accepted within 24h of assignment
-        db_operation(
-            f"""
-            UPDATE {table_name}
-            SET task_status = 'incomplete'
-            WHERE
-                task_status IN ('created', 'assigned')
-                AND time_task_assigned IS NOT NULL
-                AND time_task_responded IS NULL
-                AND time_task_assigned < %s
-            """,
-            [(now - timedelta(hours=24)).strftime('%Y-%m-%d %H:%M:%S')]
-        )
-        # Expire tasks not completed within 24h of acceptance
-        db_operation(
-            f"""
-            UPDATE {table_name}
-            SET task_status = 'incomplete'
-            WHERE
-                task_status = 'accepted'
-                AND time_task_responded IS NOT NULL
-                AND time_completed IS NULL
-                AND time_task_responded < %s
-            """,
-            [(now - timedelta(hours=24)).strftime('%Y-%m-%d %H:%M:%S')]
-        )
+    from task_config import TASK_EXPIRY_CHUNK_SIZE, TASK_EXPIRY_HOURS, TASKS_TABLE
+    from task_store import ensure_tasks_table, mirror_expired_tasks, sync_workspace_tables
+
+    if not ensure_tasks_table():
+        _expiry_stats['failures'] += 1
+        return {}
+    sync_workspace_tables()
+    expiry_hours = TASK_EXPIRY_HOURS if expiry_hours is None else expiry_hours
+    chunk_size = chunk_size or TASK_EXPIRY_CHUNK_SIZE
+    cutoff = datetime.now() - timedelta(hours=expiry_hours)
+    started = time.perf_counter()
+    expired = {}
+    chunks = 0
+    for name, condition in EXPIRY_TRANSITIONS.items():
+        expired[name] = 0
+        query = f"UPDATE {TASKS_TABLE} SET task_status = 'incomplete' WHERE {condition} LIMIT %s"
+        while True:
+            affected = db_transaction([(query, [[cutoff, chunk_size]])])
+            chunks += 1
+            if affected is False:
+                _expiry_stats['failures'] += 1
+                break
+            expired[name] += affected
+            if affected < chunk_size:
+                break
+    mirror_expired_tasks()
+
+    duration = time.perf_counter() - started
+    total = sum(expired.values())
+    _expiry_stats['runs'] += 1
+    _expiry_stats['expired_total'] += total
+    _expiry_stats['last_expired'] = expired
+    _expiry_stats['last_duration_s'] = round(duration, 3)
+    _expiry_stats['last_chunks'] = chunks
+    _expiry_stats['last_run_at'] = datetime.now().isoformat(timespec='seconds')
+    print(f"[DB] Expired {total} tasks ({expired}) in {duration:.2f}s over {chunks} statement(s)")
+    return expired
+
+def get_expiry_stats():
+    """Tasks expired and time taken, for the last expire_old_tasks run and overall"""
+    return dict(_expiry_stats)
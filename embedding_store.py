@@ -0,0 +1,299 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Persistent embedding cache location (set via environment); empty disables the store
+EMBEDDING_STORE_DIR = os.environ.get('EMBEDDING_STORE_DIR', str(Path(__file__).parent / 'embedding_store'))
+# Stored rows (live or not) that trigger a compaction; 0 lets stores grow without bound
+EMBEDDING_STORE_MAX_ROWS = int(os.environ.get('EMBEDDING_STORE_MAX_ROWS', '100000'))
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text before hashing so formatting-only differences share an embedding"""
+    text = unicodedata.normalize('NFC', text or '')
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def anchor_answer_text(anchor_answer) -> str:
+    """Text that is embedded for a users_lexi.anchor_answer value (JSON array of strings)"""
+    if isinstance(anchor_answer, str):
+        try:
+            anchor_answer = json.loads(anchor_answer)
+        except Exception:
+            return anchor_answer
+    if isinstance(anchor_answer, list):
+        return ', '.join(str(item) for item in anchor_answer if item)
+    return ''
+
+
+class EmbeddingStore:
+    """Append-only, memory-mapped store of float32 embeddings for one embedding space.
+
+    The name is the model plus its backend (model_registry.embedding_space()), so torch
+    and quantized ONNX vectors never share a store. Rows live in `<name>.f32` (raw float32, one row per text) and `<name>.index.jsonl`
+    maps text hashes to row numbers. Invalidation appends a tombstone line instead of
+    rewriting anything. Several processes can share a store: writers serialize on an
+    flock, and readers pick up rows appended by others when the files grow.
+
+    Once the files hold EMBEDDING_STORE_MAX_ROWS rows, the appending writer compacts
+    them: both files are rewritten with only the live rows (the newest half of the
+    limit at most), dropping invalidated and superseded ones. Readers notice the new
+    files by inode and reload their index.
+    """
+
+    def __init__(self, model_name: str, dim: int, directory: str = EMBEDDING_STORE_DIR):
+        safe_name = re.sub(r'[^a-zA-Z0-9_.-]', '_', model_name)
+        self.model_name = model_name
+        self.dim = dim
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.directory / f'{safe_name}.f32'
+        self.index_path = self.directory / f'{safe_name}.index.jsonl'
+        self.lock_path = self.directory / f'{safe_name}.lock'
+        self.data_path.touch(exist_ok=True)
+        self.index_path.touch(exist_ok=True)
+
+        self._index: Dict[str, int] = {}
+        self._index_offset = 0
+        self._matrix: Optional[np.memmap] = None
+        self._matrix_rows = 0
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.compactions = 0
+
+    def _refresh(self):
+        """Read index lines and data rows appended since the last refresh (ours or other processes')"""
+        # A shared flock keeps a compaction from swapping the files halfway through
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            try:
+                self._refresh_locked()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh_locked(self):
+        generation = (self.index_path.stat().st_ino, self.data_path.stat().st_ino)
+        if generation != self._generation:
+            # New files (first refresh or another process compacted): row numbers changed
+            self._generation = generation
+            self._index = {}
+            self._index_offset = 0
+            self._matrix = None
+            self._matrix_rows = -1
+
+        if self.index_path.stat().st_size > self._index_offset:
+            with open(self.index_path, 'rb') as f:
+                f.seek(self._index_offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # Partially written line; pick it up next time
+                    self._index_offset += len(line)
+                    entry = json.loads(line)
+                    if entry['row'] < 0:
+                        self._index.pop(entry['key'], None)
+                    else:
+                        self._index[entry['key']] = entry['row']
+
+        rows = self.data_path.stat().st_size // (self.dim * 4)
+        if rows != self._matrix_rows:
+            self._matrix = np.memmap(self.data_path, dtype=np.float32, mode='r', shape=(rows, self.dim)) if rows else None
+            self._matrix_rows = rows
+
+    def _lookup(self, text: str) -> Optional[np.ndarray]:
+        row = self._index.get(text_key(text))
+        if row is None or row >= self._matrix_rows:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._matrix[row]
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return the cached embedding (a read-only view into the memory map) or None"""
+        with self._lock:
+            self._refresh()
+            return self._lookup(text)
+
+    def put_many(self, texts: List[str], embeddings: np.ndarray):
+        """Append embeddings for texts (rows of `embeddings` in the same order)"""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(len(texts), self.dim)
+        with self._lock, open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Row numbers come from the file size, so appends from other processes are respected
+                first_row = self.data_path.stat().st_size // (self.dim * 4)
+                with open(self.data_path, 'ab') as f:
+                    f.write(embeddings.tobytes())
+                with open(self.index_path, 'a') as f:
+                    for offset, text in enumerate(texts):
+                        f.write(json.dumps({'key': text_key(text), 'row': first_row + offset}) + '\n')
+                if EMBEDDING_STORE_MAX_ROWS and first_row + len(texts) >= EMBEDDING_STORE_MAX_ROWS:
+                    self._compact_locked(EMBEDDING_STORE_MAX_ROWS // 2)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def compact(self, keep_rows: Optional[int] = None) -> int:
+        """
+        Rewrite the store with only its live rows
+
+        Args:
+            keep_rows: Keep at most this many live rows, the most recently written ones
+
+        Returns:
+            Number of rows kept
+        """
+        with self._lock, open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                return self._compact_locked(keep_rows)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _compact_locked(self, keep_rows: Optional[int]) -> int:
+        self._refresh_locked()
+        stored_rows = self._matrix_rows
+        live = sorted((row, key) for key, row in self._index.items() if row < stored_rows)
+        if keep_rows is not None:
+            live = live[len(live) - keep_rows:] if keep_rows < len(live) else live
+
+        data_tmp = self.data_path.with_name(self.data_path.name + '.tmp')
+        index_tmp = self.index_path.with_name(self.index_path.name + '.tmp')
+        with open(data_tmp, 'wb') as f:
+            for start in range(0, len(live), 4096):
+                rows = [row for row, _ in live[start:start + 4096]]
+                f.write(np.ascontiguousarray(self._matrix[rows], dtype=np.float32).tobytes())
+        with open(index_tmp, 'w') as f:
+            for new_row, (_, key) in enumerate(live):
+                f.write(json.dumps({'key': key, 'row': new_row}) + '\n')
+        os.replace(data_tmp, self.data_path)
+        os.replace(index_tmp, self.index_path)
+
+        self.compactions += 1
+        print(f"[EmbeddingStore] Compacted {self.model_name}: kept {len(live)} of {stored_rows} rows")
+        self._refresh_locked()
+        return len(live)
+
+    def invalidate(self, texts: Iterable[str]):
+        """Drop cached embeddings for texts (appends tombstones; the rows are reclaimed by compaction)"""
+        keys = [text_key(text) for text in texts if text]
+        if not keys:
+            return
+        with self._lock, open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(self.index_path, 'a') as f:
+                    for key in keys:
+                        f.write(json.dumps({'key': key, 'row': -1}) + '\n')
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Read-through lookup: return embeddings for texts, computing only the missing ones
+
+        Args:
+            texts: Texts to embed
+            encode_fn: Called once with the list of texts not yet in the store
+        """
+        result = np.empty((len(texts), self.dim), dtype=np.float32)
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            self._refresh()
+            for i, text in enumerate(texts):
+                cached = self._lookup(text)
+                if cached is None:
+                    missing.setdefault(normalize_text(text), []).append(i)
+                else:
+                    result[i] = cached
+
+        if missing:
+            new_texts = list(missing.keys())
+            new_embeddings = np.asarray(encode_fn(new_texts), dtype=np.float32)
+            self.put_many(new_texts, new_embeddings)
+            for text, embedding in zip(new_texts, new_embeddings):
+                result[missing[text]] = embedding
+        return result
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            self._refresh()
+            lookups = self.hits + self.misses
+            return {
+                'model_name': self.model_name,
+                'dim': self.dim,
+                'live_entries': len(self._index),
+                'stored_rows': self._matrix_rows,
+                'max_rows': EMBEDDING_STORE_MAX_ROWS,
+                'compactions': self.compactions,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'path': str(self.data_path)
+            }
+
+
+_stores: Dict[str, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_store(model_name: str, dim: int) -> Optional[EmbeddingStore]:
+    """Get the shared store for an embedding space (model plus backend), or None if the store is disabled"""
+    if not EMBEDDING_STORE_DIR:
+        return None
+    with _stores_lock:
+        if model_name not in _stores:
+            _stores[model_name] = EmbeddingStore(model_name, dim, EMBEDDING_STORE_DIR)
+        return _stores[model_name]
+
+
+def use_directory(directory: str):
+    """Open stores under `directory` from now on ('' disables them), e.g. for benchmarks"""
+    global EMBEDDING_STORE_DIR
+    with _stores_lock:
+        EMBEDDING_STORE_DIR = directory
+        _stores.clear()
+
+
+def get_store_stats() -> Dict:
+    """Get hit rates and sizes of the stores opened by this process"""
+    return {model_name: store.get_stats() for model_name, store in list(_stores.items())}
+
+
+def invalidate_texts(model_name: str, texts: Iterable[str]):
+    """Invalidate texts in an embedding space whose store files exist, without loading the model"""
+    if not EMBEDDING_STORE_DIR:
+        return
+    texts = [text for text in texts if text]
+    if not texts:
+        return
+    store = _stores.get(model_name)
+    if store is None:
+        safe_name = re.sub(r'[^a-zA-Z0-9_.-]', '_', model_name)
+        index_path = Path(EMBEDDING_STORE_DIR) / f'{safe_name}.index.jsonl'
+        if not index_path.exists():
+            return
+        # Dimension is irrelevant for tombstones
+        store = EmbeddingStore(model_name, dim=1, directory=EMBEDDING_STORE_DIR)
+    store.invalidate(texts)
+
+
+def invalidate_anchor_answer(model_name: str, old_anchor_answer, new_anchor_answer) -> bool:
+    """Drop the old embedding when a user's anchor answer changes; returns True if it changed"""
+    old_text = anchor_answer_text(old_anchor_answer)
+    if old_text and old_text != anchor_answer_text(new_anchor_answer):
+        invalidate_texts(model_name, [old_text])
+        return True
+    return False
@@ -1,14 +1,13 @@
 import hashlib
 import json
 import os
-import time
+import re
 from typing import Dict, List, Optional, Tuple
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    print("Warning: google.generativeai not installed. Typo checking will be disabled.")
-    genai = None
+from gemini_backends import GEMINI_BACKEND, create_model
+from gemini_client import AsyncGeminiClient, GeminiUnavailableError
+from gemini_quota import GeminiQuotaManager
+from language_lexicon import canonicalize_languages
 
 
 class GeminiTypoChecker:
@@ -17,24 +16,48 @@ class GeminiTypoChecker:
     def __init__(self):
         self.cache: Dict[str, Dict] = {}
         self.cache_size_limit = 200  # Increased for free tier
+        # Per-word verdicts: normalized word -> suggestion dict, or None if the word is spelled correctly
+        self.word_cache: Dict[str, Optional[Dict]] = {}
+        self.word_cache_size_limit = 5000
+        self.word_cache_hits = 0
+        self.words_sent_to_model = 0
+        # Format requests answered by the local language canonicalizer vs. sent on to Gemini
+        self.format_local_hits = 0
+        self.format_local_misses = 0
         self.api_key = os.environ.get('GEMINI_API_KEY')
         self.model_name = 'gemini-2.0-flash-exp'
-        self.daily_api_calls = 0
-        self.last_reset_date = time.strftime('%Y-%m-%d')
-        self.max_daily_calls = 50  # Conservative limit for free tier
+        # Daily budget and rate limit are shared with every other worker process
+        self.quota = GeminiQuotaManager()
+        self.max_daily_calls = self.quota.max_daily_calls
 
-        if self.api_key and genai:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel(self.model_name)
+        self.backend = GEMINI_BACKEND
+        self.model = create_model(self.model_name, self.api_key, self.backend)
+
+        if self.model is not None:
+            self.client = AsyncGeminiClient(self.model)
             self.enabled = True
         else:
             self.model = None
+            self.client = None
             self.enabled = False
             print("Warning: Gemini API key not configured or library not available")
 
+    def _normalize_text(self, text: str) -> str:
+        """Normalize text so case, whitespace and punctuation differences share a cache entry"""
+        return ' '.join(word for _, word in self._tokenize(text))
+
+    def _tokenize(self, text: str) -> List[Tuple[str, str]]:
+        """Split text into (word as typed, normalized word) pairs, dropping punctuation"""
+        tokens = []
+        for match in re.finditer(r"[\w']+", text):
+            surface = match.group(0).strip("'")
+            if surface:
+                tokens.append((surface, surface.lower()))
+        return tokens
+
     def _get_cache_key(self, text: str) -> str:
         """Generate cache key for text"""
-        return hashlib.md5(text.encode()).hexdigest()
+        return hashlib.md5(self._normalize_text(text).encode()).hexdigest()
 
     def _manage_cache_size(self):
         """Remove oldest entries if cache is full"""
@@ -44,21 +67,86 @@ class GeminiTypoChecker:
             for key in keys_to_remove:
                 del self.cache[key]
 
-    def _check_daily_limit(self) -> bool:
-        """Check if we've hit the daily API call limit"""
-        current_date = time.strftime('%Y-%m-%d')
-
-        # Reset counter if it's a new day
-        if current_date != self.last_reset_date:
-            self.daily_api_calls = 0
-            self.last_reset_date = current_date
+    def _store_word_verdict(self, word: str, verdict: Optional[Dict]):
+        """Cache one word verdict, evicting the oldest ones so the limit always holds"""
+        self.word_cache.pop(word, None)
+        while len(self.word_cache) >= self.word_cache_size_limit:
+            del self.word_cache[next(iter(self.word_cache))]
+        self.word_cache[word] = verdict
 
-        if self.daily_api_calls >= self.max_daily_calls:
-            print(f"[GeminiTypo] Daily API limit reached ({self.max_daily_calls}). Using cached results only.")
+    def _needs_word_check(self, word: str) -> bool:
+        """Check if a normalized word has to be sent to the model"""
+        if word in self.word_cache:
+            return False
+        # Very short words, numbers and common words are never worth an API call
+        if len(word) <= 2 or word.isdigit() or self._is_common_word(word):
             return False
-
         return True
 
+    def _assemble_from_words(self, tokens: List[Tuple[str, str]],
+                             fresh_verdicts: Optional[Dict[str, Optional[Dict]]] = None) -> Dict:
+        """
+        Build a sentence result from word verdicts
+
+        Args:
+            tokens: (word as typed, normalized word) pairs
+            fresh_verdicts: Verdicts from this request's model call, which take precedence
+                over the word cache (they may already have been evicted from it)
+        """
+        fresh_verdicts = fresh_verdicts or {}
+        suggestions = []
+        seen = set()
+        for surface, word in tokens:
+            verdict = fresh_verdicts[word] if word in fresh_verdicts else self.word_cache.get(word)
+            if not verdict or word in seen:
+                continue
+            seen.add(word)
+            corrected = verdict['corrected']
+            # Keep the user's capitalization so the client can replace the word in place
+            if surface[:1].isupper():
+                corrected = corrected[:1].upper() + corrected[1:]
+            suggestions.append({
+                'original': surface,
+                'corrected': corrected,
+                'confidence': verdict.get('confidence', 0.9)
+            })
+        return {'suggestions': suggestions, 'has_typos': len(suggestions) > 0}
+
+    def _degraded_typo_result(self, tokens: List[Tuple[str, str]], reason: str) -> Dict:
+        """Answer from cached word verdicts only, without calling the model"""
+        result = self._assemble_from_words(tokens)
+        result['degraded'] = reason
+        return result
+
+    def _parse_json_response(self, response_text: str) -> Dict:
+        """Parse a JSON object out of a model response"""
+        response_text = response_text.strip()
+
+        # Try to find JSON in the response
+        if response_text.startswith('{') and response_text.endswith('}'):
+            return json.loads(response_text)
+
+        # Try to extract JSON from the response
+        start = response_text.find('{')
+        end = response_text.rfind('}') + 1
+        if start != -1 and end != 0:
+            return json.loads(response_text[start:end])
+        raise json.JSONDecodeError("No JSON found in response", response_text, 0)
+
+    def _check_daily_limit(self, priority: str) -> Optional[str]:
+        """Reserve one call from the shared quota; returns None if allowed, otherwise the reason"""
+        allowed, reason = self.quota.try_acquire(priority)
+        if allowed:
+            return None
+
+        if reason == 'daily_limit':
+            print(f"[GeminiTypo] Daily API limit reached for {priority} ({self.max_daily_calls}). Using cached results only.")
+        elif reason == 'quota_unavailable':
+            print(f"[GeminiTypo] Quota unavailable for {priority}, skipping API call")
+        else:
+            print(f"[GeminiTypo] Rate limit reached for {priority}, skipping API call")
+        return reason
+
     def _is_common_word(self, text: str) -> bool:
         """Check if text is a common word that likely doesn't need checking"""
         common_words = {
@@ -102,14 +190,43 @@ class GeminiTypoChecker:
         if self._is_common_word(text):
             return {'suggestions': [], 'has_typos': False, 'skipped': 'common_word'}
 
-        # Check cache first
+        tokens = self._tokenize(text)
+
+        # Only words we have no verdict for go to the model
+        pending_words = []
+        for _, word in tokens:
+            if self._needs_word_check(word) and word not in pending_words:
+                pending_words.append(word)
+
+        # Check cache first. Sentence results are rebuilt from word verdicts so the
+        # suggestions always carry the words exactly as typed in this request; once a
+        # verdict has been evicted the sentence is checked again rather than losing a typo.
         cache_key = self._get_cache_key(text)
-        if cache_key in self.cache:
+        cached = self.cache.get(cache_key)
+        if cached is not None and 'error' in cached:
+            return cached
+        if cached is not None and not pending_words:
             print(f"[GeminiTypo] Cache hit for text: {text[:20]}...")
-            return self.cache[cache_key]
+            return self._assemble_from_words(tokens)
+
+        self.word_cache_hits += len(tokens) - len(pending_words)
+
+        if not pending_words:
+            print(f"[GeminiTypo] Word cache hit for text: {text[:20]}...")
+            result = self._assemble_from_words(tokens)
+            self._manage_cache_size()
+            self.cache[cache_key] = result
+            return result
+
+        # Fail fast to what we already know while the upstream is unhealthy
+        if self.client.breaker.is_open():
+            return self._degraded_typo_result(tokens, 'circuit_open')
 
         # Check daily API limit
-        if not self._check_daily_limit():
+        limit_reason = self._check_daily_limit('typo')
+        if limit_reason in ('rate_limited', 'quota_unavailable'):
+            return self._degraded_typo_result(tokens, limit_reason)
+        if limit_reason:
             # Return a generic response when limit is reached
             return {
                 'suggestions': [],
@@ -118,10 +235,13 @@ class GeminiTypoChecker:
                 'limit_reached': True
             }
 
+        response_text = ''
         try:
             # Create prompt for typo detection
+            words_to_check = ', '.join(f'"{word}"' for word in pending_words)
             prompt = f"""
-            Check the following text for typos and spelling errors.
+            Check the following words for typos and spelling errors.
+            The words come from this sentence, use it only as context: "{self._normalize_text(text)}"
             You must respond with ONLY valid JSON in this exact format:
             {{
                 "suggestions": [
@@ -140,34 +260,34 @@ class GeminiTypoChecker:
                 "has_typos": false
             }}
 
-            Text to check: "{text}"
+            Words to check: {words_to_check}
 
             IMPORTANT: Respond with ONLY the JSON, no other text.
             """
 
-            # Increment API call counter
-            self.daily_api_calls += 1
-            print(f"[GeminiTypo] API call #{self.daily_api_calls}/{self.max_daily_calls} for text: {text[:20]}...")
+            self.words_sent_to_model += len(pending_words)
+            print(f"[GeminiTypo] API call for {len(pending_words)} new word(s): {pending_words[:5]}")
 
-            response = self.model.generate_content(prompt)
+            response_text = self.client.generate(prompt)
+            model_result = self._parse_json_response(response_text)
 
-            # Parse the response as JSON
-            response_text = response.text.strip()
+            # Record a verdict for every word we asked about; words without a suggestion are correct
+            corrections = {}
+            for suggestion in model_result.get('suggestions', []):
+                original = str(suggestion.get('original', '')).strip().lower()
+                corrected = str(suggestion.get('corrected', '')).strip()
+                if original and corrected and corrected.lower() != original:
+                    corrections[original] = {
+                        'corrected': corrected,
+                        'confidence': suggestion.get('confidence', 0.9)
+                    }
 
-            # Try to find JSON in the response
-            if response_text.startswith('{') and response_text.endswith('}'):
-                result = json.loads(response_text)
-            else:
-                # Try to extract JSON from the response
-                start = response_text.find('{')
-                end = response_text.rfind('}') + 1
-                if start != -1 and end != 0:
-                    json_text = response_text[start:end]
-                    result = json.loads(json_text)
-                else:
-                    raise json.JSONDecodeError("No JSON found in response", response_text, 0)
+            fresh_verdicts = {word: corrections.get(word) for word in pending_words}
+            for word, verdict in fresh_verdicts.items():
+                self._store_word_verdict(word, verdict)
 
             # Cache the result
+            result = self._assemble_from_words(tokens, fresh_verdicts)
             self._manage_cache_size()
             self.cache[cache_key] = result
             print(f"[GeminiTypo] Cached result for text: {text[:20]}...")
@@ -175,7 +295,7 @@ class GeminiTypoChecker:
             return result
 
         except json.JSONDecodeError as e:
-            print(f"[GeminiTypo] Failed to parse response: {response.text}")
+            print(f"[GeminiTypo] Failed to parse response: {response_text}")
             error_result = {
                 'suggestions': [],
                 'has_typos': False,
@@ -186,6 +306,16 @@ class GeminiTypoChecker:
             self.cache[cache_key] = error_result
             return error_result
 
+        except GeminiUnavailableError as e:
+            print(f"[GeminiTypo] Gemini unavailable: {str(e)}")
+            # Rejected before reaching Gemini (breaker or saturated client), so no quota was used
+            self.quota.refund('typo')
+            return self._degraded_typo_result(tokens, 'unavailable')
+
+        except TimeoutError as e:
+            print(f"[GeminiTypo] {str(e)}")
+            return self._degraded_typo_result(tokens, 'timeout')
+
         except Exception as e:
             print(f"[GeminiTypo] API error: {str(e)}")
             return {
@@ -208,6 +338,15 @@ class GeminiTypoChecker:
         if not text or len(text.strip()) < 5:
             return {'formatted_text': text}
 
+        # Answers to language questions made only of known language names are formatted locally
+        if main_data_type and 'language' in main_data_type.lower():
+            languages = canonicalize_languages(text)
+            if languages:
+                self.format_local_hits += 1
+                print(f"[GeminiFormat] Local canonicalizer hit for text: {text[:20]}...")
+                return {'formatted_text': ', '.join(languages), 'source': 'local'}
+            self.format_local_misses += 1
+
         if not self.enabled:
             return {'formatted_text': text, 'error': 'Gemini API not available'}
 
@@ -217,8 +356,15 @@ class GeminiTypoChecker:
             print(f"[GeminiFormat] Cache hit for text: {text[:20]}...")
             return self.cache[cache_key]
 
+        # Fail fast to the unformatted answer while the upstream is unhealthy
+        if self.client.breaker.is_open():
+            return {'formatted_text': text, 'degraded': 'circuit_open'}
+
         # Check daily API limit
-        if not self._check_daily_limit():
+        limit_reason = self._check_daily_limit('format')
+        if limit_reason in ('rate_limited', 'quota_unavailable'):
+            return {'formatted_text': text, 'degraded': limit_reason}
+        if limit_reason:
             return {
                 'formatted_text': text,
                 'error': 'Daily API limit reached. Please try again tomorrow.',
@@ -256,12 +402,9 @@ Text: "{text}"
 
 Extract the main items from the text, ignoring filler words. Format them as a clean comma-separated list. Return only the formatted list, nothing else."""
 
-            # Increment API call counter
-            self.daily_api_calls += 1
-            print(f"[GeminiFormat] API call #{self.daily_api_calls}/{self.max_daily_calls} for text: {text[:20]}...")
+            print(f"[GeminiFormat] API call for text: {text[:20]}...")
 
-            response = self.model.generate_content(prompt)
-            formatted_text = response.text.strip()
+            formatted_text = self.client.generate(prompt).strip()
 
             # Clean up the response
             if formatted_text.startswith('"') and formatted_text.endswith('"'):
@@ -276,6 +419,15 @@ Extract the main items from the text, ignoring filler words. Format them as a cl
 
             return result
 
+        except GeminiUnavailableError as e:
+            print(f"[GeminiFormat] Gemini unavailable: {str(e)}")
+            self.quota.refund('format')
+            return {'formatted_text': text, 'degraded': 'unavailable'}
+
+        except TimeoutError as e:
+            print(f"[GeminiFormat] {str(e)}")
+            return {'formatted_text': text, 'degraded': 'timeout'}
+
         except Exception as e:
             print(f"[GeminiFormat] API error: {str(e)}")
             return {
@@ -285,26 +437,38 @@ Extract the main items from the text, ignoring filler words. Format them as a cl
 
     def get_cache_stats(self) -> Dict:
         """Get cache statistics"""
+        quota_stats = self.quota.get_stats()
+        format_lookups = self.format_local_hits + self.format_local_misses
         return {
             'cache_size': len(self.cache),
             'cache_limit': self.cache_size_limit,
+            'word_cache_size': len(self.word_cache),
+            'word_cache_limit': self.word_cache_size_limit,
+            'word_cache_hits': self.word_cache_hits,
+            'words_sent_to_model': self.words_sent_to_model,
+            'format_local_hits': self.format_local_hits,
+            'format_local_misses': self.format_local_misses,
+            'format_local_hit_rate': round(self.format_local_hits / format_lookups, 3) if format_lookups else 0.0,
             'enabled': self.enabled,
             'model': self.model_name if self.enabled else None,
-            'daily_api_calls': self.daily_api_calls,
-            'max_daily_calls': self.max_daily_calls,
-            'remaining_calls': max(0, self.max_daily_calls - self.daily_api_calls),
-            'last_reset_date': self.last_reset_date
+            'backend': self.backend,
+            'daily_api_calls': quota_stats['daily_api_calls'],
+            'max_daily_calls': quota_stats['max_daily_calls'],
+            'remaining_calls': quota_stats['remaining_calls'],
+            'last_reset_date': quota_stats['date'],
+            'quota': quota_stats,
+            'client': self.client.get_stats() if self.client else None
         }
 
     def clear_cache(self):
         """Clear the cache"""
         self.cache.clear()
+        self.word_cache.clear()
         print("[GeminiTypo] Cache cleared")
 
     def reset_daily_counter(self):
-        """Reset the daily API call counter"""
-        self.daily_api_calls = 0
-        self.last_reset_date = time.strftime('%Y-%m-%d')
+        """Reset the daily API call counter for all worker processes"""
+        self.quota.reset()
         print("[GeminiTypo] Daily API counter reset")
 
 
@@ -339,9 +503,7 @@ def reset_daily_counter():
     """Reset the daily API call counter"""
     global typo_checker
     if typo_checker:
-        typo_checker.daily_api_calls = 0
-        typo_checker.last_reset_date = time.strftime('%Y-%m-%d')
-        print("[Gemini] Daily counter reset")
+        typo_checker.reset_daily_counter()
 
 
 def format_answers_api(text: str, main_data_type: str = '') -> Dict:
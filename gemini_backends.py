@@ -0,0 +1,139 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+try:
+    import google.generativeai as genai
+except ImportError:
+    print("Warning: google.generativeai not installed. Typo checking will be disabled.")
+    genai = None
+
+from language_lexicon import FILLER_WORDS
+
+# Backend selection: 'gemini' (default) or 'fake' for offline load tests
+GEMINI_BACKEND = os.environ.get('GEMINI_BACKEND', 'gemini').lower()
+
+# Fake backend behaviour
+GEMINI_FAKE_LATENCY = os.environ.get('GEMINI_FAKE_LATENCY', 'lognormal:-1.6,0.5')  # ~0.2s median
+GEMINI_FAKE_ERROR_RATE = float(os.environ.get('GEMINI_FAKE_ERROR_RATE', '0'))
+GEMINI_FAKE_MALFORMED_RATE = float(os.environ.get('GEMINI_FAKE_MALFORMED_RATE', '0'))
+GEMINI_FAKE_SEED = int(os.environ.get('GEMINI_FAKE_SEED', '42'))
+
+# Misspellings the fake model "detects"; every other word is reported as correct
+FAKE_CORRECTIONS = {
+    'spanich': 'spanish',
+    'englsh': 'english',
+    'engish': 'english',
+    'frenh': 'french',
+    'germn': 'german',
+    'japanes': 'japanese',
+    'chinse': 'chinese',
+    'teh': 'the',
+    'recieve': 'receive',
+    'langauge': 'language',
+    'speek': 'speak',
+    'freind': 'friend',
+}
+
+
+class FakeResponse:
+    """Mimics the `.text` attribute of a google.generativeai response"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiError(Exception):
+    """Injected upstream failure"""
+
+
+def parse_latency_spec(spec: str, rng: random.Random) -> Callable[[], float]:
+    """
+    Build a latency sampler (seconds) from a spec string
+
+    Supported specs: 'fixed:0.2', 'uniform:0.05,0.5', 'normal:0.2,0.05', 'lognormal:-1.6,0.5'
+    """
+    kind, _, args = spec.partition(':')
+    params = [float(a) for a in args.split(',') if a.strip()]
+    kind = kind.strip().lower()
+    if kind == 'fixed':
+        return lambda: params[0]
+    if kind == 'uniform':
+        return lambda: rng.uniform(params[0], params[1])
+    if kind == 'normal':
+        return lambda: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == 'lognormal':
+        return lambda: rng.lognormvariate(params[0], params[1])
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+class FakeGeminiModel:
+    """Deterministic offline stand-in for genai.GenerativeModel.
+
+    Answers typo prompts with JSON built from FAKE_CORRECTIONS and format prompts with a
+    comma-separated list of the non-filler words. Latency, errors and malformed responses
+    are drawn from a seeded RNG, so two runs with the same settings see the same sequence.
+    """
+
+    def __init__(self,
+                 latency_spec: str = GEMINI_FAKE_LATENCY,
+                 error_rate: float = GEMINI_FAKE_ERROR_RATE,
+                 malformed_rate: float = GEMINI_FAKE_MALFORMED_RATE,
+                 seed: int = GEMINI_FAKE_SEED):
+        self.rng = random.Random(seed)
+        self.sample_latency = parse_latency_spec(latency_spec, self.rng)
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str) -> FakeResponse:
+        with self._lock:
+            self.calls += 1
+            latency = self.sample_latency()
+            roll = self.rng.random()
+
+        time.sleep(latency)
+
+        if roll < self.error_rate:
+            raise FakeGeminiError('Injected fake Gemini error')
+        if roll < self.error_rate + self.malformed_rate:
+            return FakeResponse('Sorry, I cannot help with that {')
+
+        if 'Words to check:' in prompt:
+            return FakeResponse(self._typo_response(prompt))
+        return FakeResponse(self._format_response(prompt))
+
+    def _typo_response(self, prompt: str) -> str:
+        line = prompt.split('Words to check:', 1)[1].split('\n', 1)[0]
+        words = re.findall(r'"([^"]+)"', line)
+        suggestions = [
+            {'original': word, 'corrected': FAKE_CORRECTIONS[word], 'confidence': 0.95}
+            for word in words if word in FAKE_CORRECTIONS
+        ]
+        return json.dumps({'suggestions': suggestions, 'has_typos': bool(suggestions)})
+
+    def _format_response(self, prompt: str) -> str:
+        match = re.search(r'Text: "(.*)"', prompt)
+        text = match.group(1) if match else ''
+        items = []
+        for word in re.findall(r"[^\W\d_]+", text):
+            if word.lower() not in FILLER_WORDS and word not in items:
+                items.append(word)
+        return ', '.join(items)
+
+
+def create_model(model_name: str, api_key: Optional[str], backend: str = GEMINI_BACKEND):
+    """Create the model object for the configured backend, or None if it is unavailable"""
+    if backend == 'fake':
+        print("[GeminiBackend] Using fake Gemini backend")
+        return FakeGeminiModel()
+
+    if api_key and genai:
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel(model_name)
+    return None
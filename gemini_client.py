@@ -0,0 +1,246 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Client limits (set via environment)
+GEMINI_TIMEOUT_SECONDS = float(os.environ.get('GEMINI_TIMEOUT_SECONDS', '8'))
+GEMINI_MAX_CONCURRENCY = int(os.environ.get('GEMINI_MAX_CONCURRENCY', '4'))
+
+# Circuit breaker thresholds
+BREAKER_WINDOW_SIZE = int(os.environ.get('GEMINI_BREAKER_WINDOW', '20'))
+BREAKER_MIN_CALLS = int(os.environ.get('GEMINI_BREAKER_MIN_CALLS', '5'))
+BREAKER_ERROR_RATE = float(os.environ.get('GEMINI_BREAKER_ERROR_RATE', '0.5'))
+BREAKER_SLOW_CALL_SECONDS = float(os.environ.get('GEMINI_BREAKER_SLOW_CALL_SECONDS', '5'))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get('GEMINI_BREAKER_COOLDOWN_SECONDS', '30'))
+
+
+class GeminiUnavailableError(Exception):
+    """Raised when a call is rejected without reaching Gemini (breaker open or client saturated)"""
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker over call outcomes and latencies"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self,
+                 window_size: int = BREAKER_WINDOW_SIZE,
+                 min_calls: int = BREAKER_MIN_CALLS,
+                 error_rate_threshold: float = BREAKER_ERROR_RATE,
+                 slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS,
+                 cooldown_seconds: float = BREAKER_COOLDOWN_SECONDS):
+        self.window: Deque[Tuple[bool, float]] = deque(maxlen=window_size)
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Return True if a call may go upstream right now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown_seconds:
+                    return False
+                # Cooldown over: let a single trial call through
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def is_open(self) -> bool:
+        """Check if calls are currently being rejected (without claiming a trial call)"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return False
+            return time.monotonic() - self.opened_at < self.cooldown_seconds
+
+    def record(self, success: bool, latency: float):
+        """Record a call outcome and trip or reset the breaker"""
+        with self._lock:
+            # Slow calls count as failures so a stalled upstream also trips the breaker
+            ok = success and latency <= self.slow_call_seconds
+            self.window.append((ok, latency))
+
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+                if ok:
+                    self.state = self.CLOSED
+                    self.window.clear()
+                else:
+                    self._open()
+                return
+
+            if self.state == self.CLOSED and len(self.window) >= self.min_calls:
+                failures = sum(1 for outcome, _ in self.window if not outcome)
+                if failures / len(self.window) >= self.error_rate_threshold:
+                    self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        print(f"[GeminiClient] Circuit breaker opened (cooldown {self.cooldown_seconds:.0f}s)")
+
+    def get_stats(self) -> Dict:
+        """Get breaker state for the stats endpoint"""
+        with self._lock:
+            failures = sum(1 for outcome, _ in self.window if not outcome)
+            return {
+                'state': self.state,
+                'window_calls': len(self.window),
+                'window_error_rate': round(failures / len(self.window), 3) if self.window else 0.0,
+                'times_opened': self.times_opened,
+                'cooldown_seconds': self.cooldown_seconds
+            }
+
+
+class AsyncGeminiClient:
+    """Runs Gemini calls on a background event loop with deadlines, a concurrency cap and a circuit breaker.
+
+    Flask handlers stay synchronous: `generate` submits the call to the loop thread and
+    waits at most `timeout` seconds, so a slow upstream can never hold a worker indefinitely.
+    """
+
+    def __init__(self, model, timeout: float = GEMINI_TIMEOUT_SECONDS,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.model = model
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies: Deque[float] = deque(maxlen=500)
+        self.in_flight = 0
+        self.total_calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.rejected = 0
+        self._stats_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop_lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background event loop thread on first use"""
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run_loop():
+                    asyncio.set_event_loop(loop)
+                    self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                    ready.set()
+                    loop.run_forever()
+
+                threading.Thread(target=run_loop, name='gemini-client-loop', daemon=True).start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    async def _call_model(self, prompt: str) -> str:
+        """Await the model call, preferring the library's native async API"""
+        if hasattr(self.model, 'generate_content_async'):
+            response = await self.model.generate_content_async(prompt)
+        else:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, self.model.generate_content, prompt)
+        return response.text
+
+    async def _generate(self, prompt: str, timeout: float) -> str:
+        deadline = time.monotonic() + timeout
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise GeminiUnavailableError('Gemini client saturated')
+        try:
+            remaining = max(deadline - time.monotonic(), 0.001)
+            return await asyncio.wait_for(self._call_model(prompt), timeout=remaining)
+        finally:
+            self._semaphore.release()
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Send a prompt and return the response text, raising on timeout, error or open breaker"""
+        timeout = timeout or self.timeout
+        if not self.breaker.allow_request():
+            with self._stats_lock:
+                self.rejected += 1
+            raise GeminiUnavailableError('Circuit breaker open')
+
+        loop = self._ensure_loop()
+        with self._stats_lock:
+            self.in_flight += 1
+            self.total_calls += 1
+        start = time.monotonic()
+        future = asyncio.run_coroutine_threadsafe(self._generate(prompt, timeout), loop)
+        try:
+            # Small grace period so the loop-side deadline fires first
+            text = future.result(timeout=timeout + 0.5)
+        except GeminiUnavailableError:
+            with self._stats_lock:
+                self.rejected += 1
+            self.breaker.record(False, time.monotonic() - start)
+            raise
+        except (asyncio.TimeoutError, concurrent.futures.TimeoutError, TimeoutError):
+            future.cancel()
+            latency = time.monotonic() - start
+            with self._stats_lock:
+                self.timeouts += 1
+            self.breaker.record(False, latency)
+            raise TimeoutError(f'Gemini call exceeded {timeout:.1f}s deadline')
+        except Exception:
+            with self._stats_lock:
+                self.errors += 1
+            self.breaker.record(False, time.monotonic() - start)
+            raise
+        finally:
+            with self._stats_lock:
+                self.in_flight -= 1
+
+        latency = time.monotonic() - start
+        with self._stats_lock:
+            self.latencies.append(latency)
+        self.breaker.record(True, latency)
+        return text
+
+    def _percentile(self, values: List[float], pct: float) -> Optional[float]:
+        if not values:
+            return None
+        index = min(int(round(pct / 100 * (len(values) - 1))), len(values) - 1)
+        return round(values[index] * 1000, 1)
+
+    def get_stats(self) -> Dict:
+        """Get latency percentiles (ms), call counters and breaker state"""
+        with self._stats_lock:
+            latencies = sorted(self.latencies)
+            stats = {
+                'timeout_seconds': self.timeout,
+                'max_concurrency': self.max_concurrency,
+                'in_flight': self.in_flight,
+                'total_calls': self.total_calls,
+                'timeouts': self.timeouts,
+                'errors': self.errors,
+                'rejected': self.rejected,
+            }
+        stats['latency_ms'] = {
+            'p50': self._percentile(latencies, 50),
+            'p95': self._percentile(latencies, 95),
+            'p99': self._percentile(latencies, 99),
+            'samples': len(latencies)
+        }
+        stats['circuit_breaker'] = self.breaker.get_stats()
+        return stats
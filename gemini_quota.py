@@ -0,0 +1,208 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Shared quota configuration (set via environment)
+GEMINI_QUOTA_DB = os.environ.get('GEMINI_QUOTA_DB', str(Path(__file__).parent / 'gemini_quota.sqlite3'))
+GEMINI_MAX_DAILY_CALLS = int(os.environ.get('GEMINI_MAX_DAILY_CALLS', '50'))  # Conservative limit for free tier
+GEMINI_CALLS_PER_SECOND = float(os.environ.get('GEMINI_CALLS_PER_SECOND', '1'))
+GEMINI_BURST_CALLS = float(os.environ.get('GEMINI_BURST_CALLS', '3'))
+
+# Daily calls held back for each priority; lower priorities cannot spend them.
+# With the defaults typo checks stop at 40 calls and the last 10 stay available for formatting.
+PRIORITY_ORDER = ['format', 'typo']
+PRIORITY_RESERVE = {
+    'format': int(os.environ.get('GEMINI_FORMAT_RESERVE', '10')),
+    'typo': 0,
+}
+
+
+class GeminiQuotaManager:
+    """Daily budget and token bucket for Gemini calls, shared by every process on the host.
+
+    State lives in a small SQLite file and every check runs in an IMMEDIATE transaction,
+    so several Flask workers draw from the same budget and a reset applies to all of them.
+    """
+
+    def __init__(self,
+                 db_path: str = GEMINI_QUOTA_DB,
+                 max_daily_calls: int = GEMINI_MAX_DAILY_CALLS,
+                 calls_per_second: float = GEMINI_CALLS_PER_SECOND,
+                 burst: float = GEMINI_BURST_CALLS,
+                 lock_timeout: float = 5):
+        self.db_path = db_path
+        self.lock_timeout = lock_timeout
+        self.max_daily_calls = max_daily_calls
+        self.calls_per_second = calls_per_second
+        self.burst = max(burst, 1.0)
+        self._create_tables()
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None lets us issue BEGIN IMMEDIATE ourselves
+        conn = sqlite3.connect(self.db_path, timeout=self.lock_timeout, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _create_tables(self):
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS gemini_daily_usage (
+                    day TEXT NOT NULL,
+                    priority TEXT NOT NULL,
+                    calls INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, priority)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS gemini_token_bucket (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+        finally:
+            conn.close()
+
+    def _today(self) -> str:
+        return time.strftime('%Y-%m-%d')
+
+    def _daily_limit_for(self, priority: str) -> int:
+        """Budget a priority may draw on: the daily limit minus reserves held for higher priorities"""
+        if priority not in PRIORITY_ORDER:
+            priority = PRIORITY_ORDER[-1]
+        higher = PRIORITY_ORDER[:PRIORITY_ORDER.index(priority)]
+        reserved = sum(PRIORITY_RESERVE.get(p, 0) for p in higher)
+        return max(0, self.max_daily_calls - reserved)
+
+    def _calls_today(self, conn: sqlite3.Connection, day: str) -> int:
+        row = conn.execute('SELECT COALESCE(SUM(calls), 0) FROM gemini_daily_usage WHERE day = ?', (day,)).fetchone()
+        return int(row[0])
+
+    def _take_token(self, conn: sqlite3.Connection) -> bool:
+        """Refill the shared bucket for the elapsed time and take one token if available"""
+        now = time.time()
+        row = conn.execute('SELECT tokens, updated_at FROM gemini_token_bucket WHERE id = 1').fetchone()
+        if row is None:
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, row[0] + (now - row[1]) * self.calls_per_second)
+        if tokens < 1:
+            conn.execute('UPDATE gemini_token_bucket SET tokens = ?, updated_at = ? WHERE id = 1', (tokens, now))
+            return False
+        conn.execute(
+            'INSERT OR REPLACE INTO gemini_token_bucket (id, tokens, updated_at) VALUES (1, ?, ?)',
+            (tokens - 1, now)
+        )
+        return True
+
+    def try_acquire(self, priority: str = 'typo') -> Tuple[bool, Optional[str]]:
+        """
+        Reserve budget for one upstream call
+
+        Returns:
+            (True, None) if the call may proceed, otherwise (False, 'daily_limit', 'rate_limited'
+            or 'quota_unavailable' when the quota database stays locked past lock_timeout)
+        """
+        day = self._today()
+        conn = None
+        try:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            if self._calls_today(conn, day) >= self._daily_limit_for(priority):
+                conn.execute('ROLLBACK')
+                return False, 'daily_limit'
+            if not self._take_token(conn):
+                conn.execute('COMMIT')
+                return False, 'rate_limited'
+            conn.execute('''
+                INSERT INTO gemini_daily_usage (day, priority, calls) VALUES (?, ?, 1)
+                ON CONFLICT(day, priority) DO UPDATE SET calls = calls + 1
+            ''', (day, priority))
+            conn.execute('COMMIT')
+            return True, None
+        except sqlite3.OperationalError as e:
+            # Lock contention (or an unreadable quota file): fail closed rather than overspend
+            if conn is not None and conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"[GeminiQuota] Could not reserve a call for {priority}: {e}")
+            return False, 'quota_unavailable'
+        except Exception:
+            if conn is not None and conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def refund(self, priority: str = 'typo'):
+        """Give back a call reserved with try_acquire that never reached Gemini"""
+        day = self._today()
+        conn = None
+        try:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('''
+                UPDATE gemini_daily_usage SET calls = calls - 1
+                WHERE day = ? AND priority = ? AND calls > 0
+            ''', (day, priority))
+            conn.execute('COMMIT')
+        except sqlite3.OperationalError as e:
+            if conn is not None and conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"[GeminiQuota] Could not refund a call for {priority}: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def calls_today(self) -> int:
+        """Total calls made today across all processes"""
+        conn = self._connect()
+        try:
+            return self._calls_today(conn, self._today())
+        finally:
+            conn.close()
+
+    def reset(self):
+        """Reset today's usage and refill the token bucket for every process"""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM gemini_daily_usage')
+            conn.execute('DELETE FROM gemini_token_bucket')
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict:
+        """Get shared usage and remaining budget per priority"""
+        day = self._today()
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT priority, calls FROM gemini_daily_usage WHERE day = ?', (day,)).fetchall()
+            bucket = conn.execute('SELECT tokens, updated_at FROM gemini_token_bucket WHERE id = 1').fetchone()
+        finally:
+            conn.close()
+
+        calls_by_priority = {priority: calls for priority, calls in rows}
+        total_calls = sum(calls_by_priority.values())
+        if bucket is None:
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, bucket[0] + (time.time() - bucket[1]) * self.calls_per_second)
+        return {
+            'date': day,
+            'daily_api_calls': total_calls,
+            'max_daily_calls': self.max_daily_calls,
+            'remaining_calls': max(0, self.max_daily_calls - total_calls),
+            'calls_by_priority': calls_by_priority,
+            'remaining_by_priority': {
+                priority: max(0, self._daily_limit_for(priority) - total_calls)
+                for priority in PRIORITY_ORDER
+            },
+            'calls_per_second': self.calls_per_second,
+            'bucket_tokens': round(tokens, 2),
+            'db_path': self.db_path
+        }
@@ -0,0 +1,428 @@
+"""
+Out-of-process inference service for the entity analyzer.
+
+The service owns the NER, zero-shot and sentence models so web workers never import torch.
+Web processes talk to it over a Unix socket. Each service process batches concurrent
+requests into single model calls and rejects new work while its queue is full.
+Set ML_ANALYZER_MODE=remote to have model_registry.get_analyzer() return the client.
+
+    python inference_service.py                       # serve on ML_INFERENCE_SOCKET
+    INFERENCE_PROCESSES=2 python inference_service.py
+
+    from model_registry import get_analyzer
+    analyzer = get_analyzer("languages")          # RemoteEntityAnalyzer when ML_ANALYZER_MODE=remote
+    analyzer.rank_users_for_task_ml(user_anchor_answers, area_main_answers, area_name)
+"""
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Service configuration
+ML_INFERENCE_SOCKET = os.environ.get('ML_INFERENCE_SOCKET', '/tmp/lexi_inference.sock')
+INFERENCE_PROCESSES = int(os.environ.get('INFERENCE_PROCESSES', '1'))
+INFERENCE_MAX_BATCH = int(os.environ.get('INFERENCE_MAX_BATCH', '32'))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get('INFERENCE_MAX_WAIT_MS', '10'))
+INFERENCE_MAX_QUEUE = int(os.environ.get('INFERENCE_MAX_QUEUE', '256'))
+INFERENCE_TIMEOUT_SECONDS = float(os.environ.get('INFERENCE_TIMEOUT_SECONDS', '30'))
+
+# Ops that are merged across requests into one batched analyzer call
+BATCHABLE_OPS = ('extract_entities', 'score')
+
+_HEADER = struct.Struct('>I')
+
+
+class InferenceUnavailableError(Exception):
+    """The inference service is not running, timed out, or is shedding load"""
+
+
+class InferenceOverloadedError(InferenceUnavailableError):
+    """The inference service queue is full; retry later"""
+
+
+def _json_default(value):
+    # Analyzer results can contain numpy scalars and arrays
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _send_message(sock: socket.socket, message: Dict):
+    payload = json.dumps(message, default=_json_default).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError('Connection closed mid-message')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv_message(sock: socket.socket) -> Optional[Dict]:
+    header = sock.recv(_HEADER.size, socket.MSG_WAITALL)
+    if not header:
+        return None
+    if len(header) < _HEADER.size:
+        header += _recv_exact(sock, _HEADER.size - len(header))
+    (size,) = _HEADER.unpack(header)
+    return json.loads(_recv_exact(sock, size))
+
+
+class _PendingRequest:
+    def __init__(self, op: str, data_type: str, payload: Dict, timeout: float):
+        self.op = op
+        self.data_type = data_type
+        self.payload = payload
+        self.enqueued_at = time.perf_counter()
+        # The client stops waiting after `timeout`, so later work would be thrown away
+        self.deadline = self.enqueued_at + timeout
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+
+class DynamicBatcher:
+    """Collects requests from many connections and runs them as batched analyzer calls.
+
+    The worker thread takes the first waiting request, then keeps collecting for up to
+    max_wait_ms or until max_batch requests are waiting. Requests with the same op and
+    data type go through the analyzer's batch methods together; requests whose caller
+    has already timed out are dropped. rank_users is batched over users inside the
+    analyzer already, so it runs in the calling connection's thread, one at a time,
+    and never holds up the batches.
+    """
+
+    def __init__(self,
+                 max_batch: int = INFERENCE_MAX_BATCH,
+                 max_wait_ms: float = INFERENCE_MAX_WAIT_MS,
+                 max_queue: int = INFERENCE_MAX_QUEUE):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'rejected': 0, 'expired': 0, 'batches': 0, 'batched_items': 0,
+                      'ranks': 0, 'errors': 0}
+        self._queue_wait_ms: List[float] = []
+        self._rank_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, op: str, data_type: str, payload: Dict, timeout: float = INFERENCE_TIMEOUT_SECONDS) -> Any:
+        """Queue a request and wait for its result; raises InferenceOverloadedError if the queue is full"""
+        if op not in BATCHABLE_OPS:
+            return self._run_unbatched(op, data_type, payload, timeout)
+
+        request = _PendingRequest(op, data_type, payload, timeout)
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            with self._stats_lock:
+                self.stats['rejected'] += 1
+            raise InferenceOverloadedError('Inference queue is full')
+        with self._stats_lock:
+            self.stats['requests'] += 1
+
+        if not request.done.wait(timeout):
+            raise InferenceUnavailableError(f'Inference timed out after {timeout}s')
+        if request.error:
+            raise RuntimeError(request.error)
+        return request.result
+
+    def _run_unbatched(self, op: str, data_type: str, payload: Dict, timeout: float) -> Any:
+        if not self._rank_lock.acquire(timeout=timeout):
+            raise InferenceUnavailableError(f'Inference timed out after {timeout}s')
+        try:
+            with self._stats_lock:
+                self.stats['requests'] += 1
+                self.stats['ranks'] += 1
+            request = _PendingRequest(op, data_type, payload, timeout)
+            try:
+                self._execute(op, data_type, [request])
+            except Exception:
+                with self._stats_lock:
+                    self.stats['errors'] += 1
+                raise
+            return request.result
+        finally:
+            self._rank_lock.release()
+
+    def _collect(self) -> List[_PendingRequest]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            now = time.perf_counter()
+            expired = [request for request in batch if request.deadline <= now]
+            if expired:
+                with self._stats_lock:
+                    self.stats['expired'] += len(expired)
+                for request in expired:
+                    request.error = 'Request expired in the queue'
+                    request.done.set()
+                batch = [request for request in batch if request.deadline > now]
+                if not batch:
+                    continue
+            groups: Dict[Tuple[str, str], List[_PendingRequest]] = {}
+            for request in batch:
+                groups.setdefault((request.op, request.data_type), []).append(request)
+
+            with self._stats_lock:
+                self.stats['batches'] += 1
+                self.stats['batched_items'] += len(batch)
+                self._queue_wait_ms.extend((now - r.enqueued_at) * 1000 for r in batch)
+                self._queue_wait_ms = self._queue_wait_ms[-1000:]
+
+            for (op, data_type), requests in groups.items():
+                try:
+                    self._execute(op, data_type, requests)
+                except Exception as e:
+                    print(f"[InferenceService] {op} batch failed: {e}")
+                    with self._stats_lock:
+                        self.stats['errors'] += len(requests)
+                    for request in requests:
+                        request.error = str(e)
+                for request in requests:
+                    request.done.set()
+
+    def _execute(self, op: str, data_type: str, requests: List[_PendingRequest]):
+        from sentiment_analysis import get_entity_analyzer
+        analyzer = get_entity_analyzer(data_type)
+
+        if op in BATCHABLE_OPS:
+            texts = [request.payload.get('text') or '' for request in requests]
+            if op == 'extract_entities':
+                results = analyzer.extract_entities_batch(texts, batch_size=self.max_batch)
+            else:
+                results = analyzer.calculate_comprehensive_scores_batch(texts, batch_size=self.max_batch)
+            for request, result in zip(requests, results):
+                request.result = result
+        elif op == 'rank_users':
+            # Already batched over all users inside the analyzer; see _run_unbatched
+            for request in requests:
+                request.result = analyzer.rank_users_for_task_ml(
+                    request.payload.get('user_anchor_answers') or {},
+                    request.payload.get('area_main_answers') or [],
+                    request.payload.get('area_name', ''),
+                    batch_size=request.payload.get('batch_size') or self.max_batch,
+                    top_k=request.payload.get('top_k')
+                )
+        else:
+            raise ValueError(f"Unknown inference op: {op}")
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            waits = sorted(self._queue_wait_ms)
+            stats = dict(self.stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        stats['avg_batch_size'] = round(stats['batched_items'] / stats['batches'], 2) if stats['batches'] else 0.0
+        stats['queue_wait_ms_p50'] = round(waits[len(waits) // 2], 2) if waits else None
+        stats['queue_wait_ms_p99'] = round(waits[int(len(waits) * 0.99)], 2) if waits else None
+        stats['pid'] = os.getpid()
+        return stats
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """One connection; handles length-prefixed JSON requests until the client hangs up"""
+
+    def handle(self):
+        while True:
+            try:
+                message = _recv_message(self.request)
+            except (ConnectionError, OSError, ValueError):
+                return
+            if message is None:
+                return
+
+            op = message.get('op')
+            try:
+                if op == 'stats':
+                    from model_registry import get_model_stats
+                    response = {'result': {'batcher': self.server.batcher.get_stats(), 'models': get_model_stats()}}
+                else:
+                    result = self.server.batcher.submit(op, message.get('data_type', 'languages'), message)
+                    response = {'result': result}
+            except InferenceOverloadedError as e:
+                response = {'error': str(e), 'overloaded': True}
+            except Exception as e:
+                response = {'error': str(e)}
+
+            try:
+                _send_message(self.request, response)
+            except OSError:
+                return
+
+
+class _InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    batcher: DynamicBatcher = None
+
+
+def serve(socket_path: str = ML_INFERENCE_SOCKET, processes: int = INFERENCE_PROCESSES):
+    """
+    Run the inference service until interrupted
+
+    Args:
+        socket_path: Unix socket path to listen on
+        processes: Service processes sharing the listening socket (each loads its own models)
+    """
+    from model_registry import warmup_models
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = _InferenceServer(socket_path, _RequestHandler)
+    os.chmod(socket_path, 0o660)
+
+    def run_worker():
+        # Models and the batcher thread are created after fork so nothing is shared between processes
+        warmup_models(force=True)
+        server.batcher = DynamicBatcher()
+        print(f"[InferenceService] Worker {os.getpid()} serving on {socket_path}")
+        server.serve_forever()
+
+    if processes <= 1:
+        try:
+            run_worker()
+        finally:
+            server.server_close()
+            os.unlink(socket_path)
+        return
+
+    children = []
+    for _ in range(processes):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker()
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+class InferenceClient:
+    """Client for the inference service; keeps one connection per thread"""
+
+    def __init__(self, socket_path: str = ML_INFERENCE_SOCKET, timeout: float = INFERENCE_TIMEOUT_SECONDS):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _reset(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def call(self, op: str, **payload) -> Any:
+        """Send one request and return its result"""
+        try:
+            sock = self._connection()
+            _send_message(sock, {'op': op, **payload})
+            response = _recv_message(sock)
+        except (OSError, ConnectionError) as e:
+            self._reset()
+            raise InferenceUnavailableError(f'Inference service unavailable: {e}')
+        if response is None:
+            self._reset()
+            raise InferenceUnavailableError('Inference service closed the connection')
+        if response.get('overloaded'):
+            raise InferenceOverloadedError(response['error'])
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def get_stats(self) -> Dict:
+        return self.call('stats')
+
+
+class RemoteEntityAnalyzer:
+    """Stand-in for MLanguageAnalyzer whose model work runs in the inference service"""
+
+    def __init__(self, data_type: str = "languages", client: Optional[InferenceClient] = None):
+        self.data_type = data_type.lower()
+        self.client = client or get_inference_client()
+
+    def extract_entities_ml(self, text: str) -> List[Dict[str, Any]]:
+        return self.client.call('extract_entities', data_type=self.data_type, text=text)
+
+    def calculate_comprehensive_score(self, text: str) -> Dict[str, float]:
+        return self.client.call('score', data_type=self.data_type, text=text)
+
+    def rank_users_for_task_ml(self,
+                               user_anchor_answers: Dict[str, str],
+                               area_main_answers: List[str],
+                               area_name: str = "",
+                               batch_size: int = 32,
+                               top_k: Optional[int] = None) -> List[Tuple[str, float, Dict]]:
+        ranked = self.client.call('rank_users', data_type=self.data_type,
+                                  user_anchor_answers=user_anchor_answers,
+                                  area_main_answers=area_main_answers,
+                                  area_name=area_name, batch_size=batch_size, top_k=top_k)
+        # JSON turns the user id keys into strings; hand back the caller's own ids
+        user_ids = {str(user_id): user_id for user_id in user_anchor_answers}
+        return [(user_ids.get(user_id, user_id), score, details) for user_id, score, details in ranked]
+
+
+_client: Optional[InferenceClient] = None
+
+
+def get_inference_client() -> InferenceClient:
+    """Get the process-wide inference client"""
+    global _client
+    if _client is None:
+        _client = InferenceClient()
+    return _client
+
+
+def get_remote_entity_analyzer(data_type: str = "languages") -> RemoteEntityAnalyzer:
+    """Remote counterpart of sentiment_analysis.get_entity_analyzer"""
+    return RemoteEntityAnalyzer(data_type)
+
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,266 @@
+import difflib
+import re
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# Language names accepted as entities and used for local answer formatting (lowercase)
+COMMON_LANGUAGES = frozenset({
+    "english", "arabic", "spanish", "french", "german", "italian", "portuguese",
+    "russian", "chinese", "japanese", "korean", "hindi", "urdu", "turkish",
+    "dutch", "swedish", "norwegian", "danish", "finnish", "polish", "czech",
+    "hungarian", "romanian", "bulgarian", "serbian", "croatian", "slovenian",
+    "slovak", "lithuanian", "latvian", "estonian", "greek", "hebrew", "persian",
+    "thai", "vietnamese", "indonesian", "malay", "filipino", "tagalog", "swahili",
+    "yoruba", "igbo", "hausa", "amharic", "somali", "zulu", "xhosa", "afrikaans",
+    "bengali", "punjabi", "gujarati", "marathi", "tamil", "telugu", "kannada",
+    "malayalam", "sinhala", "nepali", "burmese", "lao", "khmer", "mongolian",
+    "kazakh", "uzbek", "kyrgyz", "tajik", "turkmen", "azerbaijani", "georgian",
+    "armenian", "ukrainian", "belarusian", "moldovan", "albanian", "macedonian",
+    "bosnian", "montenegrin", "icelandic", "faroese", "greenlandic", "sami",
+    "basque", "catalan", "galician", "occitan", "breton", "cornish", "welsh",
+    "irish", "scottish", "manx", "frisian", "luxembourgish", "romansh", "ladin",
+    "friulian", "sardinian", "corsican", "sicilian", "venetian", "lombard",
+    "piedmontese", "ligurian", "emilian", "romagnol", "tuscan", "neapolitan",
+    "calabrese", "abruzzese", "molisan", "pugliese", "lucano", "campano",
+    "laziale", "marchigiano", "umbro", "toscano", "sardo", "siciliano"
+})
+
+# Countries, regions and other names that NER tags but that are not languages (lowercase)
+NON_LANGUAGE_ENTITIES = frozenset({
+    "egypt", "usa", "united states", "america", "canada", "mexico", "brazil",
+    "argentina", "chile", "peru", "colombia", "venezuela", "ecuador", "bolivia",
+    "paraguay", "uruguay", "guyana", "suriname", "french guiana", "falkland islands",
+    "uk", "united kingdom", "england", "scotland", "wales", "northern ireland",
+    "ireland", "france", "germany", "italy", "spain", "portugal", "netherlands",
+    "belgium", "switzerland", "austria", "luxembourg", "liechtenstein", "monaco",
+    "andorra", "san marino", "vatican", "malta", "cyprus", "greece", "albania",
+    "macedonia", "bulgaria", "romania", "serbia", "croatia", "slovenia", "slovakia",
+    "czech republic", "poland", "hungary", "ukraine", "belarus", "moldova",
+    "lithuania", "latvia", "estonia", "finland", "sweden", "norway", "denmark",
+    "iceland", "faroe islands", "greenland", "russia", "kazakhstan", "uzbekistan",
+    "kyrgyzstan", "tajikistan", "turkmenistan", "azerbaijan", "georgia", "armenia",
+    "turkey", "syria", "lebanon", "jordan", "iraq", "iran", "kuwait", "saudi arabia",
+    "yemen", "oman", "uae", "qatar", "bahrain", "israel", "palestine", "morocco",
+    "algeria", "tunisia", "libya", "sudan", "south sudan", "ethiopia", "eritrea",
+    "djibouti", "somalia", "kenya", "uganda", "tanzania", "rwanda", "burundi",
+    "congo", "dr congo", "central african republic", "chad", "cameroon", "nigeria",
+    "niger", "mali", "burkina faso", "senegal", "gambia", "guinea-bissau",
+    "guinea", "sierra leone", "liberia", "ivory coast", "ghana", "togo", "benin",
+    "equatorial guinea", "gabon", "sao tome and principe", "angola", "zambia",
+    "zimbabwe", "botswana", "namibia", "south africa", "lesotho", "eswatini",
+    "mozambique", "madagascar", "mauritius", "seychelles", "comoros", "mayotte",
+    "reunion", "china", "japan", "south korea", "north korea", "mongolia",
+    "taiwan", "hong kong", "macau", "vietnam", "laos", "cambodia", "thailand",
+    "myanmar", "bangladesh", "india", "pakistan", "afghanistan", "nepal", "bhutan",
+    "sri lanka", "maldives", "philippines", "indonesia", "malaysia", "singapore",
+    "brunei", "east timor", "papua new guinea", "fiji", "vanuatu", "new caledonia",
+    "solomon islands", "tuvalu", "kiribati", "marshall islands", "micronesia",
+    "palau", "nauru", "australia", "new zealand", "cook islands", "niue",
+    "tokelau", "samoa", "tonga", "french polynesia", "pitcairn islands"
+})
+
+# Alternate spellings, native names and abbreviations -> canonical display name
+LANGUAGE_ALIASES = {
+    "mandarin": "Mandarin",
+    "cantonese": "Cantonese",
+    "taiwanese": "Taiwanese",
+    "shanghainese": "Shanghainese",
+    "hokkien": "Hokkien",
+    "farsi": "Persian",
+    "castilian": "Spanish",
+    "espanol": "Spanish",
+    "español": "Spanish",
+    "francais": "French",
+    "français": "French",
+    "deutsch": "German",
+    "italiano": "Italian",
+    "portugues": "Portuguese",
+    "português": "Portuguese",
+    "nihongo": "Japanese",
+    "hangul": "Korean",
+    "tieng viet": "Vietnamese",
+    "viet": "Vietnamese",
+    "bahasa": "Indonesian",
+    "kiswahili": "Swahili",
+    "creole": "Creole",
+    "haitian creole": "Haitian Creole",
+    "patois": "Patois",
+    "yiddish": "Yiddish",
+    "latin": "Latin",
+    "asl": "American Sign Language",
+    "american sign language": "American Sign Language",
+    "sign language": "Sign Language",
+    "eng": "English",
+}
+
+# Nationality words that people write instead of the language name -> display name
+LANGUAGE_DEMONYMS = {
+    "brazilian": "Portuguese",
+    "mexican": "Spanish",
+    "iranian": "Persian",
+    "israeli": "Hebrew",
+    "egyptian": "Arabic",
+    "ethiopian": "Amharic",
+    "pakistani": "Urdu",
+    "bangladeshi": "Bengali",
+    "bangla": "Bengali",
+    "flemish": "Dutch",
+    "chinese mandarin": "Mandarin",
+}
+
+# Words that carry no item of their own in answers like "I speak English and a bit of French"
+FILLER_WORDS = frozenset({
+    "i", "im", "i'm", "we", "my", "me", "speak", "speaks", "spoke", "speaking", "know", "knows",
+    "can", "also", "too", "and", "or", "a", "an", "the", "bit", "of", "little", "some", "fluent",
+    "fluently", "in", "native", "natively", "language", "languages", "is", "are", "am", "learning",
+    "learn", "basic", "conversational", "mostly", "mainly", "both", "plus", "with", "very", "well",
+    "understand", "read", "write", "only", "but", "as", "just", "currently", "kind",
+    "somewhat", "proficient", "fluency", "mother", "tongue", "first", "second", "home",
+    "family", "level", "etc",
+})
+
+_SEPARATORS = re.compile(r"[,;/&+\n]|\band\b|\bor\b", re.IGNORECASE)
+_WORD = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+
+# Vocabulary for exact and fuzzy lookups: lowercase name -> display name
+_VOCABULARY = {name: name.title() for name in COMMON_LANGUAGES}
+_VOCABULARY.update(LANGUAGE_ALIASES)
+_FUZZY_CANDIDATES = [name for name in _VOCABULARY if ' ' not in name and len(name) >= 4]
+
+
+def match_language(word: str) -> Optional[str]:
+    """Return the display name for a (possibly misspelled) language word, or None"""
+    word = word.lower().strip()
+    if word in _VOCABULARY:
+        return _VOCABULARY[word]
+    if len(word) < 4:
+        return None
+    close = difflib.get_close_matches(word, _FUZZY_CANDIDATES, n=1, cutoff=0.85)
+    return _VOCABULARY[close[0]] if close else None
+
+
+def canonicalize_languages(text: str) -> Optional[List[str]]:
+    """
+    Turn a free-text answer into canonical language names without calling an LLM
+
+    Args:
+        text: Answer such as "spanish, english" or "I speak Englsh and a bit of French"
+
+    Returns:
+        Deduplicated display names in order of appearance, or None if any word is not
+        a known language or filler word (the caller should fall back to the model)
+    """
+    languages: List[str] = []
+    for chunk in _SEPARATORS.split(text or ''):
+        words = _WORD.findall(chunk.lower())
+        i = 0
+        while i < len(words):
+            # Multi-word names ("haitian creole", "american sign language") win over single words
+            matched = None
+            for size in (3, 2):
+                phrase = ' '.join(words[i:i + size])
+                if len(words) - i >= size and phrase in _VOCABULARY:
+                    matched = (_VOCABULARY[phrase], size)
+                    break
+            if matched:
+                name, size = matched
+                i += size
+            else:
+                word = words[i]
+                i += 1
+                if word in FILLER_WORDS:
+                    continue
+                name = match_language(word)
+                if not name:
+                    return None
+            if name not in languages:
+                languages.append(name)
+
+    return languages or None
+
+
+class AhoCorasickMatcher:
+    """Multi-pattern matcher that finds every pattern occurrence in one pass over the text.
+
+    Patterns are matched case-insensitively and only as whole words (the characters
+    around a match must not be letters, digits or underscores). Overlapping matches are
+    resolved leftmost-longest, so "haitian creole" wins over "creole".
+    """
+
+    def __init__(self, patterns: Dict[str, str]):
+        # Trie as parallel lists: transitions, failure link and (length, value) outputs per state
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[Tuple[int, str]]] = [[]]
+
+        for pattern, value in patterns.items():
+            state = 0
+            for char in pattern.lower():
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._outputs[state].append((len(pattern), value))
+
+        # Breadth-first failure links; outputs of the failure state are inherited
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                # Children of the root fail back to the root, not to themselves
+                self._fail[next_state] = target if target != next_state else 0
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    @staticmethod
+    def _is_word_char(char: str) -> bool:
+        return char.isalnum() or char == '_'
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """Return non-overlapping whole-word matches as (start, end, value), in text order"""
+        matches = []
+        state = 0
+        for i, char in enumerate(text):
+            lowered = char.lower()
+            # Keep offsets aligned with the original text when lowercasing changes length
+            char = lowered if len(lowered) == 1 else char
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, value in self._outputs[state]:
+                start, end = i - length + 1, i + 1
+                if start > 0 and self._is_word_char(text[start - 1]):
+                    continue
+                if end < len(text) and self._is_word_char(text[end]):
+                    continue
+                matches.append((start, end, value))
+
+        matches.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+        selected = []
+        last_end = 0
+        for start, end, value in matches:
+            if start >= last_end:
+                selected.append((start, end, value))
+                last_end = end
+        return selected
+
+
+_LANGUAGE_MATCHER = AhoCorasickMatcher({**_VOCABULARY, **LANGUAGE_DEMONYMS})
+
+
+def find_language_mentions(text: str) -> List[Tuple[int, int, str]]:
+    """
+    Find language names, aliases and demonyms in text in a single linear pass
+
+    Returns:
+        (start, end, display name) per mention, in order of appearance
+    """
+    if not text:
+        return []
+    return _LANGUAGE_MATCHER.find_all(text)
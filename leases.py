@@ -0,0 +1,181 @@
+import os
+import socket
+import threading
+import time
+from typing import Dict, Optional
+
+from server.database_utils import db_operation
+from task_config import LEASE_TABLE
+
+CREATE_LEASE_TABLE = f'''
+    CREATE TABLE IF NOT EXISTS {LEASE_TABLE} (
+        name VARCHAR(191) PRIMARY KEY,
+        holder VARCHAR(255) NOT NULL,
+        token BIGINT NOT NULL DEFAULT 1,
+        acquired_at DATETIME NOT NULL,
+        expires_at DATETIME NOT NULL,
+        completed_at DATETIME NULL
+    )
+'''
+
+_table_ready = False
+
+
+def default_holder() -> str:
+    """Identity of this process in the leases table (LEASE_HOLDER_ID overrides host:pid)"""
+    return os.environ.get('LEASE_HOLDER_ID') or f"{socket.gethostname()}:{os.getpid()}"
+
+
+def ensure_lease_table() -> bool:
+    global _table_ready
+    if not _table_ready:
+        _table_ready = bool(db_operation(CREATE_LEASE_TABLE))
+    return _table_ready
+
+
+class Lease:
+    """A named lease in MySQL that at most one holder owns until it expires.
+
+    Built on a table rather than GET_LOCK because db_operation uses a new connection
+    per call, and GET_LOCK locks end with their connection. A holder that dies simply
+    lets the lease run out after `ttl_seconds`. Every acquisition bumps a fencing
+    token. A completed lease can never be acquired again, which makes one-off jobs
+    such as a day's task creation run exactly once across all nodes.
+    """
+
+    def __init__(self, name: str, ttl_seconds: int, holder: Optional[str] = None):
+        self.name = name
+        self.ttl_seconds = int(ttl_seconds)
+        self.holder = holder or default_holder()
+        self.token: Optional[int] = None
+        self.stats = {
+            'attempts': 0, 'acquired': 0, 'denied': 0, 'errors': 0,
+            'last_latency_ms': None, 'max_latency_ms': 0.0, 'total_latency_ms': 0.0,
+            'last_acquired_at': None,
+        }
+
+    def acquire(self) -> bool:
+        """Take the lease if it is free, expired or already ours; returns True on success"""
+        started = time.perf_counter()
+        self.stats['attempts'] += 1
+        acquired = False
+        if ensure_lease_table():
+            # A new row wins outright; otherwise take over an expired lease (or renew our own)
+            acquired = db_operation(f'''
+                INSERT IGNORE INTO {LEASE_TABLE} (name, holder, token, acquired_at, expires_at)
+                VALUES (%s, %s, 1, NOW(), NOW() + INTERVAL %s SECOND)
+            ''', [self.name, self.holder, self.ttl_seconds]) or db_operation(f'''
+                UPDATE {LEASE_TABLE}
+                SET holder = %s, token = token + 1, acquired_at = NOW(),
+                    expires_at = NOW() + INTERVAL %s SECOND
+                WHERE name = %s AND completed_at IS NULL AND (expires_at < NOW() OR holder = %s)
+            ''', [self.holder, self.ttl_seconds, self.name, self.holder])
+        else:
+            self.stats['errors'] += 1
+
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.stats['last_latency_ms'] = round(latency_ms, 1)
+        self.stats['max_latency_ms'] = round(max(self.stats['max_latency_ms'], latency_ms), 1)
+        self.stats['total_latency_ms'] += latency_ms
+        if acquired:
+            row = self.current()
+            self.token = row['token'] if row and row.get('holder') == self.holder else None
+            acquired = self.token is not None
+        if acquired:
+            self.stats['acquired'] += 1
+            self.stats['last_acquired_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+            print(f"[Lease] {self.holder} acquired '{self.name}' (token {self.token}) in {latency_ms:.0f} ms")
+        else:
+            self.stats['denied'] += 1
+        return acquired
+
+    def _update_own(self, assignments: str, extra_params=()) -> bool:
+        if self.token is None:
+            return False
+        return bool(db_operation(f'''
+            UPDATE {LEASE_TABLE} SET {assignments}
+            WHERE name = %s AND holder = %s AND token = %s
+        ''', list(extra_params) + [self.name, self.holder, self.token]))
+
+    def renew(self) -> bool:
+        """Push the expiry out by ttl_seconds; False if the lease was lost"""
+        return self._update_own('expires_at = NOW() + INTERVAL %s SECOND', [self.ttl_seconds])
+
+    def complete(self) -> bool:
+        """Mark the work done; the lease then stays taken for good"""
+        done = self._update_own('completed_at = NOW()')
+        self.token = None
+        return done
+
+    def release(self) -> bool:
+        """Give the lease up early so another holder can take it right away"""
+        released = self._update_own('expires_at = NOW() - INTERVAL 1 SECOND')
+        self.token = None
+        return released
+
+    def current(self) -> Optional[Dict]:
+        """The lease row (holder, token, acquired_at, expires_at, completed_at), or None"""
+        if not ensure_lease_table():
+            return None
+        return db_operation(f'''
+            SELECT name, holder, token, acquired_at, expires_at, completed_at, expires_at > NOW() AS active
+            FROM {LEASE_TABLE} WHERE name = %s
+        ''', [self.name], fetch_one=True) or None
+
+    def is_completed(self) -> bool:
+        row = self.current()
+        return bool(row and row.get('completed_at'))
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['avg_latency_ms'] = round(stats['total_latency_ms'] / stats['attempts'], 1) if stats['attempts'] else None
+        stats['total_latency_ms'] = round(stats['total_latency_ms'], 1)
+        stats['holder'] = self.holder
+        stats['held'] = self.token is not None
+        return stats
+
+
+_leases: Dict[str, Lease] = {}
+_leases_lock = threading.Lock()
+
+
+def get_lease(name: str, ttl_seconds: int) -> Lease:
+    """
+    Shared Lease object per name, so acquisition stats add up across calls
+
+    Names of the form 'job:key' (e.g. one lease per day) keep one entry per job: a new
+    key replaces the previous one and carries its stats over.
+    """
+    family = name.split(':', 1)[0]
+    with _leases_lock:
+        lease = _leases.get(name)
+        if lease is None:
+            lease = Lease(name, ttl_seconds)
+            for other in [n for n in _leases if n.split(':', 1)[0] == family]:
+                lease.stats = _leases.pop(other).stats
+            _leases[name] = lease
+        return lease
+
+
+def prune_leases(prefix: str, keep_days: int = 30) -> bool:
+    """Delete leases under `prefix` that ended more than keep_days ago"""
+    return db_operation(f'''
+        DELETE FROM {LEASE_TABLE}
+        WHERE name LIKE %s AND expires_at < NOW() - INTERVAL %s DAY
+          AND (completed_at IS NULL OR completed_at < NOW() - INTERVAL %s DAY)
+    ''', [f"{prefix}%", keep_days, keep_days])
+
+
+def get_lease_stats() -> Dict:
+    """Acquisition metrics of this process's leases, with the current holder of each"""
+    stats = {}
+    for name, lease in list(_leases.items()):
+        row = lease.current() or {}
+        stats[name] = {
+            **lease.get_stats(),
+            'current_holder': row.get('holder'),
+            'current_token': row.get('token'),
+            'expires_at': str(row['expires_at']) if row.get('expires_at') else None,
+            'completed_at': str(row['completed_at']) if row.get('completed_at') else None,
+        }
+    return stats
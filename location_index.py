@@ -0,0 +1,283 @@
+import heapq
+import math
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from task_config import LOCATION_GRID_CELL_M
+
+EARTH_RADIUS_M = 6371000.0
+# Slack on the ring cut-off for the flat projection used to bucket positions (campus scale)
+PROJECTION_MARGIN = 0.01
+
+
+def haversine_matrix(origins: np.ndarray, destinations: np.ndarray) -> np.ndarray:
+    """
+    Great-circle distances in meters between every origin and destination
+
+    Args:
+        origins: (n, 2) array of (latitude, longitude) in degrees
+        destinations: (m, 2) array of (latitude, longitude) in degrees
+
+    Returns:
+        (n, m) distance matrix
+    """
+    origins = np.radians(np.asarray(origins, dtype=np.float64).reshape(-1, 2))
+    destinations = np.radians(np.asarray(destinations, dtype=np.float64).reshape(-1, 2))
+    lat1, lon1 = origins[:, 0:1], origins[:, 1:2]
+    lat2, lon2 = destinations[:, 0], destinations[:, 1]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def parse_coordinates(latitude, longitude) -> Optional[Tuple[float, float]]:
+    """(latitude, longitude) as floats, or None if missing or out of range"""
+    try:
+        lat, lon = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (math.isfinite(lat) and math.isfinite(lon)) or abs(lat) > 90 or abs(lon) > 180:
+        return None
+    return lat, lon
+
+
+class UserLocationIndex:
+    """Grid index over each user's most recent reported position.
+
+    Positions are bucketed into square cells of `cell_m` meters on a flat projection
+    around the first reported latitude. Nearest and radius queries walk outwards ring
+    by ring from the query's cell and rank candidates by exact haversine distance.
+    Older reports never overwrite newer ones, so rows can be applied in any order.
+    """
+
+    def __init__(self, cell_m: float = LOCATION_GRID_CELL_M, ref_latitude: Optional[float] = None):
+        self.cell_m = float(cell_m)
+        self._ref_latitude = ref_latitude
+        self._cos_ref = math.cos(math.radians(ref_latitude)) if ref_latitude is not None else None
+        self._positions: Dict[str, Tuple[float, float, datetime]] = {}
+        self._cell_of: Dict[str, Tuple[int, int]] = {}
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        # Per-cell (user ids, positions array), rebuilt on the next query after a cell changes
+        self._cell_arrays: Dict[Tuple[int, int], Tuple[List[str], np.ndarray]] = {}
+        self._lock = threading.RLock()
+        # Highest lexi row id applied, so database syncs only read newer rows
+        self.last_row_id = 0
+        self.stats = {'updates': 0, 'stale_updates': 0, 'removals': 0, 'nearest_queries': 0, 'radius_queries': 0}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        if self._cos_ref is None:
+            self._ref_latitude = lat
+            self._cos_ref = math.cos(math.radians(lat))
+        x = math.radians(lon) * EARTH_RADIUS_M * self._cos_ref
+        y = math.radians(lat) * EARTH_RADIUS_M
+        return math.floor(x / self.cell_m), math.floor(y / self.cell_m)
+
+    def update(self, user_id, latitude, longitude, reported_at: Optional[datetime] = None) -> bool:
+        """
+        Record a user's position
+
+        Returns:
+            False if the coordinates are invalid or older than the stored position
+        """
+        coordinates = parse_coordinates(latitude, longitude)
+        if coordinates is None:
+            return False
+        user_id = str(user_id)
+        reported_at = reported_at or datetime.now()
+        with self._lock:
+            current = self._positions.get(user_id)
+            if current is not None and current[2] > reported_at:
+                self.stats['stale_updates'] += 1
+                return False
+            cell = self._cell(*coordinates)
+            old_cell = self._cell_of.get(user_id)
+            if old_cell != cell:
+                if old_cell is not None:
+                    self._discard_from_cell(user_id, old_cell)
+                self._cells.setdefault(cell, set()).add(user_id)
+                self._cell_of[user_id] = cell
+            self._cell_arrays.pop(cell, None)
+            self._positions[user_id] = (coordinates[0], coordinates[1], reported_at)
+            self.stats['updates'] += 1
+            return True
+
+    def _discard_from_cell(self, user_id: str, cell: Tuple[int, int]):
+        members = self._cells.get(cell)
+        self._cell_arrays.pop(cell, None)
+        if members is not None:
+            members.discard(user_id)
+            if not members:
+                del self._cells[cell]
+
+    def remove(self, user_ids: Iterable):
+        """Drop users from the index"""
+        with self._lock:
+            for user_id in map(str, user_ids):
+                if self._positions.pop(user_id, None) is None:
+                    continue
+                self._discard_from_cell(user_id, self._cell_of.pop(user_id))
+                self.stats['removals'] += 1
+
+    def prune(self, older_than: datetime) -> int:
+        """Drop positions reported before `older_than`; returns how many were dropped"""
+        with self._lock:
+            stale = [user_id for user_id, (_, _, reported_at) in self._positions.items() if reported_at < older_than]
+            self.remove(stale)
+            return len(stale)
+
+    def positions(self, user_ids: Optional[Iterable] = None) -> Dict[str, Tuple[float, float]]:
+        """user_id -> (latitude, longitude) for the given users (all users if None) that have a position"""
+        with self._lock:
+            if user_ids is None:
+                return {user_id: (lat, lon) for user_id, (lat, lon, _) in self._positions.items()}
+            found = {}
+            for user_id in map(str, user_ids):
+                position = self._positions.get(user_id)
+                if position is not None:
+                    found[user_id] = (position[0], position[1])
+            return found
+
+    def _ring_cells(self, center: Tuple[int, int], ring: int) -> List[Tuple[int, int]]:
+        cx, cy = center
+        if ring == 0:
+            return [center] if center in self._cells else []
+        cells = []
+        for dx in range(-ring, ring + 1):
+            for cell in ((cx + dx, cy - ring), (cx + dx, cy + ring)):
+                if cell in self._cells:
+                    cells.append(cell)
+        for dy in range(-ring + 1, ring):
+            for cell in ((cx - ring, cy + dy), (cx + ring, cy + dy)):
+                if cell in self._cells:
+                    cells.append(cell)
+        return cells
+
+    def _cells_from_ring(self, center: Tuple[int, int], ring: int) -> List[Tuple[int, int]]:
+        """Occupied cells at Chebyshev distance >= ring from center"""
+        cx, cy = center
+        return [cell for cell in self._cells if max(abs(cell[0] - cx), abs(cell[1] - cy)) >= ring]
+
+    def _cell_points(self, cell: Tuple[int, int]) -> Tuple[List[str], np.ndarray]:
+        arrays = self._cell_arrays.get(cell)
+        if arrays is None:
+            user_ids = list(self._cells[cell])
+            arrays = user_ids, np.array([self._positions[user_id][:2] for user_id in user_ids])
+            self._cell_arrays[cell] = arrays
+        return arrays
+
+    def _distances(self, latitude: float, longitude: float, cells: List[Tuple[int, int]],
+                   allowed: Optional[Set[str]]) -> Tuple[List[str], np.ndarray]:
+        user_ids, points = [], []
+        for cell in cells:
+            cell_ids, cell_points = self._cell_points(cell)
+            if allowed is not None:
+                keep = [i for i, user_id in enumerate(cell_ids) if user_id in allowed]
+                cell_ids, cell_points = [cell_ids[i] for i in keep], cell_points[keep]
+            user_ids.extend(cell_ids)
+            points.append(cell_points)
+        if not user_ids:
+            return [], np.zeros(0)
+        return user_ids, haversine_matrix([(latitude, longitude)], np.concatenate(points))[0]
+
+    @staticmethod
+    def _allowed(user_ids: Optional[Iterable]) -> Optional[Set[str]]:
+        if user_ids is None or isinstance(user_ids, (set, frozenset)):
+            return user_ids
+        return {str(user_id) for user_id in user_ids}
+
+    def nearest(self, latitude, longitude, k: int = 1, max_distance_m: Optional[float] = None,
+                user_ids: Optional[Iterable] = None) -> List[Tuple[str, float]]:
+        """
+        The k users closest to a point
+
+        Args:
+            latitude, longitude: Query point in degrees
+            k: Number of users to return
+            max_distance_m: Ignore users farther than this
+            user_ids: Restrict results to these users (e.g. eligible users); a set is
+                taken to hold string ids already, so repeated queries can share it
+
+        Returns:
+            (user_id, distance in meters) pairs, nearest first
+        """
+        coordinates = parse_coordinates(latitude, longitude)
+        allowed = self._allowed(user_ids)
+        with self._lock:
+            self.stats['nearest_queries'] += 1
+            if coordinates is None or k <= 0 or not self._cells:
+                return []
+            center = self._cell(*coordinates)
+            found: List[Tuple[float, str]] = []
+            ring = 0
+            while True:
+                # Beyond this many rings a full scan of the occupied cells is cheaper
+                exhaustive = ring > 0 and 8 * ring >= len(self._cells)
+                cells = self._cells_from_ring(center, ring) if exhaustive else self._ring_cells(center, ring)
+                ids, distances = self._distances(coordinates[0], coordinates[1], cells, allowed)
+                found.extend(zip(distances.tolist(), ids))
+                if exhaustive:
+                    break
+                # Anything in an unvisited ring is at least `ring` cells away
+                reach = ring * self.cell_m * (1 - PROJECTION_MARGIN)
+                if max_distance_m is not None and reach > max_distance_m:
+                    break
+                if len(found) >= k and heapq.nsmallest(k, found)[-1][0] <= reach:
+                    break
+                ring += 1
+
+            found = heapq.nsmallest(k, found)
+            if max_distance_m is not None:
+                found = [(distance, user_id) for distance, user_id in found if distance <= max_distance_m]
+            return [(user_id, distance) for distance, user_id in found]
+
+    def within_radius(self, latitude, longitude, radius_m: float,
+                      user_ids: Optional[Iterable] = None) -> List[Tuple[str, float]]:
+        """
+        All users within radius_m of a point
+
+        Returns:
+            (user_id, distance in meters) pairs, nearest first
+        """
+        coordinates = parse_coordinates(latitude, longitude)
+        allowed = self._allowed(user_ids)
+        with self._lock:
+            self.stats['radius_queries'] += 1
+            if coordinates is None or radius_m < 0 or not self._cells:
+                return []
+            center = self._cell(*coordinates)
+            rings = math.ceil(radius_m / (self.cell_m * (1 - PROJECTION_MARGIN))) + 1
+            if (2 * rings + 1) ** 2 >= len(self._cells):
+                cells = list(self._cells)
+            else:
+                cells = [cell for ring in range(rings + 1) for cell in self._ring_cells(center, ring)]
+            ids, distances = self._distances(coordinates[0], coordinates[1], cells, allowed)
+            found = sorted((distance, user_id) for distance, user_id in zip(distances.tolist(), ids)
+                           if distance <= radius_m)
+            return [(user_id, distance) for distance, user_id in found]
+
+    def get_stats(self) -> Dict:
+        return {'users': len(self._positions), 'cells': len(self._cells), 'cell_m': self.cell_m,
+                'ref_latitude': self._ref_latitude, 'last_row_id': self.last_row_id, **self.stats}
+
+
+_index: Optional[UserLocationIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_location_index() -> UserLocationIndex:
+    """Get the process-wide user location index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = UserLocationIndex()
+        return _index
+
+
+def record_location(user_id, latitude, longitude, reported_at: Optional[datetime] = None) -> bool:
+    """Update a user's position from a new lexi report (ignored if it has no valid coordinates)"""
+    return get_location_index().update(user_id, latitude, longitude, reported_at)
@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict
+
+# Model names used by the entity analyzer
+NER_MODEL_NAME = "dslim/bert-base-NER"  # Keep this as it's still optimal for NER
+ZERO_SHOT_MODEL_NAME = "facebook/bart-large-mnli"  # Optimal for zero-shot tasks
+SENTENCE_MODEL_NAME = "all-mpnet-base-v2"  # Better than all-MiniLM-L6-v2
+SENTENCE_MODEL_DIM = 768
+
+# Run a dummy inference through every model when warmup_models() is called at startup
+ML_WARMUP_ON_START = os.environ.get('ML_WARMUP_ON_START', '0') == '1'
+
+# Inference backend: 'torch' (default) or 'onnx' for quantized ONNX Runtime on CPU (see onnx_backend.py)
+ML_INFERENCE_BACKEND = os.environ.get('ML_INFERENCE_BACKEND', 'torch').lower()
+
+# Where get_analyzer() runs entity analysis: 'local' (models in this process) or 'remote'
+# (the out-of-process inference_service.py, so this process never loads the models)
+ML_ANALYZER_MODE = os.environ.get('ML_ANALYZER_MODE', 'local').lower()
+
+
+def _current_rss_mb() -> float:
+    """Resident set size of this process in MB (0.0 if it cannot be read)"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except Exception:
+        try:
+            import resource
+            # ru_maxrss is a peak value (KB on Linux, bytes on macOS); good enough as a fallback
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak / (1024 * 1024) if peak > 10 ** 9 else peak / 1024
+        except Exception:
+            return 0.0
+
+
+def _device_index() -> int:
+    import torch
+    return 0 if torch.cuda.is_available() else -1
+
+
+def _load_ner_pipeline():
+    from transformers import pipeline
+    return pipeline("ner", model=NER_MODEL_NAME, device=_device_index())
+
+
+def _load_zero_shot_pipeline():
+    from transformers import pipeline
+    return pipeline("zero-shot-classification", model=ZERO_SHOT_MODEL_NAME, device=_device_index())
+
+
+def _load_sentence_transformer():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(SENTENCE_MODEL_NAME)
+
+
+class ModelRegistry:
+    """Process-wide registry that loads each model once, lazily, on first use.
+
+    Every MLanguageAnalyzer (whatever its data_type) gets its models from here, so
+    the NER, zero-shot and sentence models are only held in memory once per process.
+    """
+
+    def __init__(self, backend: str = ML_INFERENCE_BACKEND):
+        self.backend = backend
+        if backend == 'onnx':
+            import onnx_backend
+            self._loaders: Dict[str, Callable[[], Any]] = {
+                'ner': onnx_backend.load_ner_pipeline,
+                'zero_shot': onnx_backend.load_zero_shot_pipeline,
+                'sentence_transformer': onnx_backend.load_sentence_transformer,
+            }
+        elif backend == 'torch':
+            self._loaders = {
+                'ner': _load_ner_pipeline,
+                'zero_shot': _load_zero_shot_pipeline,
+                'sentence_transformer': _load_sentence_transformer,
+            }
+        else:
+            raise ValueError(f"Unknown ML_INFERENCE_BACKEND: {backend}")
+        self._model_names = {
+            'ner': NER_MODEL_NAME,
+            'zero_shot': ZERO_SHOT_MODEL_NAME,
+            'sentence_transformer': SENTENCE_MODEL_NAME,
+        }
+        self._models: Dict[str, Any] = {}
+        self._load_stats: Dict[str, Dict] = {}
+        self._locks = {key: threading.Lock() for key in self._loaders}
+
+    def get(self, key: str) -> Any:
+        """Return the model for `key`, loading it on first use"""
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._locks[key]:
+            # Another thread may have finished loading while we waited
+            if key in self._models:
+                return self._models[key]
+
+            print(f"[ModelRegistry] Loading {key} model ({self._model_names[key]}, {self.backend})...")
+            rss_before = _current_rss_mb()
+            start = time.perf_counter()
+            model = self._loaders[key]()
+            load_seconds = time.perf_counter() - start
+            rss_delta = _current_rss_mb() - rss_before
+
+            self._models[key] = model
+            self._load_stats[key] = {
+                'model_name': self._model_names[key],
+                'backend': self.backend,
+                'load_seconds': round(load_seconds, 2),
+                'rss_delta_mb': round(rss_delta, 1),
+                'loaded_at': time.strftime('%Y-%m-%d %H:%M:%S')
+            }
+            print(f"[ModelRegistry] Loaded {key} in {load_seconds:.1f}s (+{rss_delta:.0f} MB RSS)")
+            return model
+
+    def embedding_space(self, key: str = 'sentence_transformer') -> str:
+        """
+        Name of the vector space a model's outputs live in: model, backend and quantization
+
+        Backends produce close but not identical vectors, so embedding caches and indexes
+        are kept apart by this name (e.g. 'all-mpnet-base-v2-onnx-int8').
+        """
+        variant = self.backend
+        if self.backend == 'onnx':
+            from onnx_backend import ONNX_QUANTIZE
+            variant = f"onnx-{'int8' if ONNX_QUANTIZE else 'fp32'}"
+        return f"{self._model_names[key]}-{variant}"
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._models
+
+    def warmup(self):
+        """Load every model and run a dummy inference so the first real request is not slow"""
+        start = time.perf_counter()
+        self.get('ner')("I speak English and Spanish.")
+        self.get('zero_shot')("English", ["is a language name", "is a country name"])
+        self.get('sentence_transformer').encode(["I speak English and Spanish."])
+        print(f"[ModelRegistry] Warmup finished in {time.perf_counter() - start:.1f}s")
+
+    def get_stats(self) -> Dict:
+        """Load time and resident memory per model"""
+        return {
+            'backend': self.backend,
+            'analyzer_mode': ML_ANALYZER_MODE,
+            'models': {
+                key: self._load_stats.get(key, {'model_name': self._model_names[key], 'loaded': False})
+                for key in self._loaders
+            },
+            'process_rss_mb': round(_current_rss_mb(), 1)
+        }
+
+
+# Global instance
+model_registry = ModelRegistry()
+
+
+def warmup_models(force: bool = False):
+    """Startup hook: preload and warm up all models if ML_WARMUP_ON_START=1 (or force=True)"""
+    if force or (ML_WARMUP_ON_START and ML_ANALYZER_MODE != 'remote'):
+        model_registry.warmup()
+
+
+def get_analyzer(data_type: str = "languages"):
+    """
+    Entity analyzer for a data type, as selected by ML_ANALYZER_MODE
+
+    Returns:
+        sentiment_analysis.MLanguageAnalyzer ('local') or inference_service.RemoteEntityAnalyzer ('remote')
+    """
+    if ML_ANALYZER_MODE == 'remote':
+        from inference_service import get_remote_entity_analyzer
+        return get_remote_entity_analyzer(data_type)
+    if ML_ANALYZER_MODE == 'local':
+        from sentiment_analysis import get_entity_analyzer
+        return get_entity_analyzer(data_type)
+    raise ValueError(f"Unknown ML_ANALYZER_MODE: {ML_ANALYZER_MODE}")
+
+
+def get_model_stats() -> Dict:
+    """Get per-model load statistics"""
+    return model_registry.get_stats()
@@ -0,0 +1,126 @@
+"""
+ONNX Runtime inference backend for the entity analyzer models.
+
+Each model is exported to ONNX once (cached under ONNX_MODEL_DIR), dynamically quantized
+to int8 and served through ONNX Runtime on CPU. Enable with ML_INFERENCE_BACKEND=onnx;
+requires `optimum[onnxruntime]`.
+"""
+import os
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from model_registry import NER_MODEL_NAME, SENTENCE_MODEL_NAME, ZERO_SHOT_MODEL_NAME
+
+ONNX_MODEL_DIR = os.environ.get('ONNX_MODEL_DIR', str(Path(__file__).parent / 'onnx_models'))
+ONNX_NUM_THREADS = int(os.environ.get('ONNX_NUM_THREADS', '0'))  # 0 = let ONNX Runtime decide
+ONNX_QUANTIZE = os.environ.get('ONNX_QUANTIZE', '1') == '1'
+ONNX_QUANT_ARCH = os.environ.get('ONNX_QUANT_ARCH', 'avx2')  # avx2, avx512, avx512_vnni or arm64
+
+# sentence-transformers short names live under this namespace on the hub
+SENTENCE_MODEL_REPO = f"sentence-transformers/{SENTENCE_MODEL_NAME}"
+
+
+def _session_options():
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    if ONNX_NUM_THREADS > 0:
+        options.intra_op_num_threads = ONNX_NUM_THREADS
+        options.inter_op_num_threads = 1
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+def _export_dir(model_name: str, quantized: bool) -> Path:
+    suffix = 'int8' if quantized else 'fp32'
+    return Path(ONNX_MODEL_DIR) / f"{model_name.replace('/', '__')}-{suffix}"
+
+
+def export_model(model_name: str, ort_class, quantize: bool = ONNX_QUANTIZE) -> Path:
+    """Export `model_name` to ONNX (and quantize it) unless a cached export already exists"""
+    from transformers import AutoTokenizer
+
+    fp32_dir = _export_dir(model_name, quantized=False)
+    if not (fp32_dir / 'model.onnx').exists():
+        print(f"[ONNX] Exporting {model_name} to {fp32_dir}...")
+        model = ort_class.from_pretrained(model_name, export=True)
+        model.save_pretrained(fp32_dir)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(fp32_dir)
+
+    if not quantize:
+        return fp32_dir
+
+    int8_dir = _export_dir(model_name, quantized=True)
+    if not (int8_dir / 'model_quantized.onnx').exists():
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        print(f"[ONNX] Quantizing {model_name} (dynamic int8, {ONNX_QUANT_ARCH}) to {int8_dir}...")
+        quantization_config = getattr(AutoQuantizationConfig, ONNX_QUANT_ARCH)(is_static=False, per_channel=False)
+        quantizer = ORTQuantizer.from_pretrained(fp32_dir)
+        quantizer.quantize(save_dir=int8_dir, quantization_config=quantization_config)
+        AutoTokenizer.from_pretrained(fp32_dir).save_pretrained(int8_dir)
+    return int8_dir
+
+
+def _load(model_name: str, ort_class, quantize: bool = ONNX_QUANTIZE):
+    from transformers import AutoTokenizer
+
+    model_dir = export_model(model_name, ort_class, quantize)
+    file_name = 'model_quantized.onnx' if quantize else 'model.onnx'
+    model = ort_class.from_pretrained(model_dir, file_name=file_name, session_options=_session_options())
+    return model, AutoTokenizer.from_pretrained(model_dir)
+
+
+def load_ner_pipeline(quantize: bool = ONNX_QUANTIZE):
+    from optimum.onnxruntime import ORTModelForTokenClassification
+    from transformers import pipeline
+
+    model, tokenizer = _load(NER_MODEL_NAME, ORTModelForTokenClassification, quantize)
+    return pipeline("ner", model=model, tokenizer=tokenizer)
+
+
+def load_zero_shot_pipeline(quantize: bool = ONNX_QUANTIZE):
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import pipeline
+
+    model, tokenizer = _load(ZERO_SHOT_MODEL_NAME, ORTModelForSequenceClassification, quantize)
+    return pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+
+
+class OnnxSentenceEncoder:
+    """Drop-in for the SentenceTransformer.encode calls the analyzer makes.
+
+    all-mpnet-base-v2 is transformer -> mean pooling -> L2 normalize, which is reproduced here.
+    """
+
+    def __init__(self, model, tokenizer):
+        self.model = model
+        self.tokenizer = tokenizer
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.config.hidden_size
+
+    def encode(self, sentences: List[str], batch_size: int = 32, convert_to_numpy: bool = True, **_kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            batch = sentences[start:start + batch_size]
+            inputs = self.tokenizer(batch, padding=True, truncation=True, max_length=384, return_tensors='np')
+            outputs = self.model(**inputs)
+            token_embeddings = np.asarray(outputs.last_hidden_state, dtype=np.float32)
+            mask = inputs['attention_mask'][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            batches.append(pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12))
+        if not batches:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.concatenate(batches)
+
+
+def load_sentence_transformer(quantize: bool = ONNX_QUANTIZE):
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+
+    model, tokenizer = _load(SENTENCE_MODEL_REPO, ORTModelForFeatureExtraction, quantize)
+    return OnnxSentenceEncoder(model, tokenizer)
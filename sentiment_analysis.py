@@ -1,12 +1,68 @@
 import json
+import os
 import re
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import torch
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from transformers import pipeline
+
+from embedding_store import get_embedding_store
+from language_lexicon import COMMON_LANGUAGES, NON_LANGUAGE_ENTITIES, find_language_mentions
+from model_registry import SENTENCE_MODEL_DIM, model_registry
+from similarity_index import get_similarity_index
+
+# Zero-shot labels for deciding whether an unknown entity is a language
+LANGUAGE_CATEGORIES = (
+    "is a language name",
+    "is a country name",
+    "is a person name",
+    "is an organization name",
+    "is a place name"
+)
+
+# Zero-shot labels describing how much the person likes/values the entity, with their scores
+CONFIDENCE_LEVEL_SCORES = (
+    ("loves and is very proficient with {data_type}", 0.95),
+    ("likes and is good with {data_type}", 0.8),
+    ("is okay with and has basic knowledge of {data_type}", 0.6),
+    ("is learning and interested in {data_type}", 0.7),
+    ("doesn't really like or use {data_type}", 0.3),
+    ("has no interest in {data_type}", 0.1)
+)
+
+# Example sentences for different confidence levels
+CONFIDENCE_TEMPLATES = (
+    "I love {entity} and use it every day",
+    "I like {entity} and am good at it",
+    "I know some {entity}",
+    "I am learning {entity}",
+    "I don't really use {entity}",
+    "I have no interest in {entity}"
+)
+
+# Cue phrases near a lexicon match -> index into CONFIDENCE_LEVEL_SCORES, checked in this order
+LEXICON_CONFIDENCE_CUES = (
+    (r"no interest|not interested", 5),
+    (r"don'?t|do not|doesn'?t|not really|barely|rusty|forgot", 4),
+    (r"learning|studying|want to learn|trying to learn", 3),
+    (r"basic|a little|a bit|some|beginner|conversational|understand", 2),
+    (r"fluent(?:ly)?|native|mother tongue|first language|love|bilingual", 0),
+)
+LEXICON_DEFAULT_LEVEL = 1  # "likes and is good with"
+_LEXICON_CUE_PATTERNS = tuple((re.compile(rf"\b(?:{cue})\b", re.IGNORECASE), level)
+                              for cue, level in LEXICON_CONFIDENCE_CUES)
+_CLAUSE_BREAK = re.compile(r"[,.;:!?()\n]|\b(?:and|or|but)\b", re.IGNORECASE)
+
+# Answer language questions from the lexicon alone when it finds a mention (NER/zero-shot otherwise)
+ML_LEXICON_FAST_PATH = os.environ.get('ML_LEXICON_FAST_PATH', '1') == '1'
+
+# Rank users from the persistent user similarity index instead of re-encoding everyone
+ML_SIMILARITY_INDEX = os.environ.get('ML_SIMILARITY_INDEX', '1') == '1'
+
+# Entries kept in each analyzer's per-entity caches (template embeddings, zero-shot results, language verdicts)
+ENTITY_CACHE_SIZE = 2048
 
 
 class MLanguageAnalyzer:
@@ -17,28 +73,42 @@ class MLanguageAnalyzer:
         print(f"Using device: {self.device}")
         print(f"Initialized for data type: {self.data_type}")
 
-        # Load NER pipeline for entity detection (research-optimized)
-        self.ner_pipeline = pipeline(
-            "ner",
-            model="dslim/bert-base-NER",  # Keep this as it's still optimal for NER
-            device=0 if torch.cuda.is_available() else -1
-        )
+        # Models (NER, zero-shot, sentence transformer) are loaded lazily through the
+        # process-wide model registry and shared by every analyzer instance
 
-        # Load zero-shot classification for entity validation and confidence (research-optimized)
-        self.zero_shot_pipeline = pipeline(
-            "zero-shot-classification",
-            model="facebook/bart-large-mnli",  # Optimal for zero-shot tasks
-            device=0 if torch.cuda.is_available() else -1
-        )
+        # Confidence labels depend only on the data type, so build them once
+        self.confidence_levels = tuple(level.format(data_type=self.data_type) for level, _ in CONFIDENCE_LEVEL_SCORES)
+        self.confidence_mapping = {
+            level.format(data_type=self.data_type): score for level, score in CONFIDENCE_LEVEL_SCORES
+        }
 
-        # Sentence transformer for semantic similarity (research-optimized)
-        self.sentence_transformer = SentenceTransformer('all-mpnet-base-v2')  # Better than all-MiniLM-L6-v2
+        # Per-entity caches so repeated entities skip the models
+        self._template_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._confidence_cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._language_cache: "OrderedDict[str, bool]" = OrderedDict()
+        # The analyzer is shared across Flask threads
+        self._cache_lock = threading.Lock()
 
         # Load entity lists based on data type
         self.entity_list = self._load_entity_list()
 
         print(f"ML Entity Analyzer initialized successfully for {self.data_type}")
 
+    @property
+    def ner_pipeline(self):
+        """NER pipeline for entity detection (research-optimized)"""
+        return model_registry.get('ner')
+
+    @property
+    def zero_shot_pipeline(self):
+        """Zero-shot classification for entity validation and confidence (research-optimized)"""
+        return model_registry.get('zero_shot')
+
+    @property
+    def sentence_transformer(self):
+        """Sentence transformer for semantic similarity (research-optimized)"""
+        return model_registry.get('sentence_transformer')
+
     def _load_entity_list(self) -> set:
         """Load entity list based on data type - now returns empty set for pure ML approach"""
         # Return empty set to rely entirely on ML models
@@ -50,52 +120,21 @@ class MLanguageAnalyzer:
         if not text:
             return []
 
-        try:
-            entities = []
+        # Fast path: a lexicon hit skips NER and zero-shot (only the cached text embedding is needed)
+        lexicon_candidates = self._lexicon_candidates(text)
+        if lexicon_candidates:
+            return self._score_lexicon_candidates([(text, lexicon_candidates, self._encode_normalized([text])[0])])[0]
 
+        try:
             # Step 1: Use NER to detect entities
             ner_results = self.ner_pipeline(text)
             print(f"NER detected {len(ner_results)} entities")
 
-            # Step 2: Filter and accept only language entities
-            for entity in ner_results:
-                if entity['score'] > 0.5:  # Only high-confidence entities
-                    potential_entity = entity['word'].strip()
-
-                    # Filter for languages only - check if it's actually a language
-                    if self._is_language_entity(potential_entity):
-                        print(f"Accepting language entity: '{potential_entity}' (score: {entity['score']:.3f})")
-
-                        # Calculate confidence score
-                        entity_score = self._calculate_entity_score_ml(potential_entity, text)
-
-                        entities.append({
-                            'entity': potential_entity,
-                            'type': self.data_type.upper(),
-                            'confidence': entity_score['confidence'],
-                            'start': entity['start'],
-                            'end': entity['end']
-                        })
-                    else:
-                        print(f"Filtering out non-language entity: '{potential_entity}' (score: {entity['score']:.3f})")
-
-            # Step 3: Simple language detection if no entities found
-            if self.data_type == "languages" and len(entities) == 0:
-                print("No NER entities, checking for common languages...")
-                common_languages = ["English", "Arabic", "Spanish", "French", "German", "Italian", "Portuguese",
-                                  "Russian", "Chinese", "Japanese", "Korean", "Hindi", "Urdu", "Turkish"]
-
-                for language in common_languages:
-                    if language.lower() in text.lower():
-                        print(f"Found language: {language}")
-                        entity_score = self._calculate_entity_score_ml(language, text)
-                        entities.append({
-                            'entity': language,
-                            'type': 'LANGUAGES',
-                            'confidence': entity_score['confidence'],
-                            'start': text.lower().find(language.lower()),
-                            'end': text.lower().find(language.lower()) + len(language)
-                        })
+            # Step 2/3: Keep language entities (with the common-language fallback) and score them
+            entities = []
+            for candidate in self._find_entity_candidates(text, ner_results):
+                entity_score = self._calculate_entity_score_ml(candidate['entity'], text)
+                entities.append({**candidate, 'confidence': entity_score['confidence']})
 
             return sorted(entities, key=lambda x: x['confidence'], reverse=True)
 
@@ -107,244 +146,507 @@ class MLanguageAnalyzer:
 
         # Removed complex zero-shot detection methods - now we just use NER + simple fallback
 
-    def _is_language_entity(self, entity_name: str) -> bool:
-        """Check if an entity is actually a language (not a country, person, etc.)"""
-        if not entity_name:
-            return False
-
-        # Common languages that should be accepted
-        common_languages = {
-            "english", "arabic", "spanish", "french", "german", "italian", "portuguese",
-            "russian", "chinese", "japanese", "korean", "hindi", "urdu", "turkish",
-            "dutch", "swedish", "norwegian", "danish", "finnish", "polish", "czech",
-            "hungarian", "romanian", "bulgarian", "serbian", "croatian", "slovenian",
-            "slovak", "lithuanian", "latvian", "estonian", "greek", "hebrew", "persian",
-            "thai", "vietnamese", "indonesian", "malay", "filipino", "tagalog", "swahili",
-            "yoruba", "igbo", "hausa", "amharic", "somali", "zulu", "xhosa", "afrikaans",
-            "bengali", "punjabi", "gujarati", "marathi", "tamil", "telugu", "kannada",
-            "malayalam", "sinhala", "nepali", "burmese", "lao", "khmer", "mongolian",
-            "kazakh", "uzbek", "kyrgyz", "tajik", "turkmen", "azerbaijani", "georgian",
-            "armenian", "ukrainian", "belarusian", "moldovan", "albanian", "macedonian",
-            "bosnian", "montenegrin", "icelandic", "faroese", "greenlandic", "sami",
-            "basque", "catalan", "galician", "occitan", "breton", "cornish", "welsh",
-            "irish", "scottish", "manx", "frisian", "luxembourgish", "romansh", "ladin",
-            "friulian", "sardinian", "corsican", "sicilian", "venetian", "lombard",
-            "piedmontese", "ligurian", "emilian", "romagnol", "tuscan", "neapolitan",
-            "calabrese", "abruzzese", "molisan", "pugliese", "lucano", "campano",
-            "laziale", "marchigiano", "umbro", "toscano", "sardo", "siciliano"
-        }
-
-        # Common non-language entities that should be filtered out
-        non_languages = {
-            "egypt", "usa", "united states", "america", "canada", "mexico", "brazil",
-            "argentina", "chile", "peru", "colombia", "venezuela", "ecuador", "bolivia",
-            "paraguay", "uruguay", "guyana", "suriname", "french guiana", "falkland islands",
-            "uk", "united kingdom", "england", "scotland", "wales", "northern ireland",
-            "ireland", "france", "germany", "italy", "spain", "portugal", "netherlands",
-            "belgium", "switzerland", "austria", "luxembourg", "liechtenstein", "monaco",
-            "andorra", "san marino", "vatican", "malta", "cyprus", "greece", "albania",
-            "macedonia", "bulgaria", "romania", "serbia", "croatia", "slovenia", "slovakia",
-            "czech republic", "poland", "hungary", "ukraine", "belarus", "moldova",
-            "lithuania", "latvia", "estonia", "finland", "sweden", "norway", "denmark",
-            "iceland", "faroe islands", "greenland", "russia", "kazakhstan", "uzbekistan",
-            "kyrgyzstan", "tajikistan", "turkmenistan", "azerbaijan", "georgia", "armenia",
-            "turkey", "syria", "lebanon", "jordan", "iraq", "iran", "kuwait", "saudi arabia",
-            "yemen", "oman", "uae", "qatar", "bahrain", "israel", "palestine", "morocco",
-            "algeria", "tunisia", "libya", "sudan", "south sudan", "ethiopia", "eritrea",
-            "djibouti", "somalia", "kenya", "uganda", "tanzania", "rwanda", "burundi",
-            "congo", "dr congo", "central african republic", "chad", "cameroon", "nigeria",
-            "niger", "mali", "burkina faso", "senegal", "gambia", "guinea-bissau",
-            "guinea", "sierra leone", "liberia", "ivory coast", "ghana", "togo", "benin",
-            "equatorial guinea", "gabon", "sao tome and principe", "angola", "zambia",
-            "zimbabwe", "botswana", "namibia", "south africa", "lesotho", "eswatini",
-            "mozambique", "madagascar", "mauritius", "seychelles", "comoros", "mayotte",
-            "reunion", "china", "japan", "south korea", "north korea", "mongolia",
-            "taiwan", "hong kong", "macau", "vietnam", "laos", "cambodia", "thailand",
-            "myanmar", "bangladesh", "india", "pakistan", "afghanistan", "nepal", "bhutan",
-            "sri lanka", "maldives", "philippines", "indonesia", "malaysia", "singapore",
-            "brunei", "east timor", "papua new guinea", "fiji", "vanuatu", "new caledonia",
-            "solomon islands", "tuvalu", "kiribati", "marshall islands", "micronesia",
-            "palau", "nauru", "australia", "new zealand", "cook islands", "niue",
-            "tokelau", "samoa", "tonga", "french polynesia", "pitcairn islands"
-        }
-
-        entity_lower = entity_name.lower().strip()
-
-        # Check if it's in the non-languages list
-        if entity_lower in non_languages:
-            return False
+    def _lexicon_candidates(self, text: str) -> List[Dict[str, any]]:
+        """Language mentions found by the Aho-Corasick lexicon (first mention of each language)"""
+        if self.data_type != "languages" or not ML_LEXICON_FAST_PATH:
+            return []
+        return self._language_mentions(text)
+
+    @staticmethod
+    def _language_mentions(text: str) -> List[Dict[str, any]]:
+        """First mention of each language in the lexicon, as entity candidates"""
+        candidates = {}
+        for start, end, name in find_language_mentions(text):
+            if name not in candidates:
+                candidates[name] = {'entity': name, 'type': 'LANGUAGES', 'start': start, 'end': end}
+        return list(candidates.values())
+
+    def _lexicon_confidence_level(self, text: str, start: int, end: int,
+                                  previous_end: int, next_start: int) -> int:
+        """Pick a confidence level from cue words in the mention's own clause"""
+        # Cues before the mention ("a bit of French"), back to the previous mention or clause break
+        before = text[previous_end:start]
+        breaks = list(_CLAUSE_BREAK.finditer(before))
+        if breaks:
+            before = before[breaks[-1].end():]
+        # Cues after the mention ("Spanish fluently"), up to the next mention or clause break
+        after = text[end:next_start]
+        first_break = _CLAUSE_BREAK.search(after)
+        if first_break:
+            after = after[:first_break.start()]
+
+        for window in (before, after):
+            for pattern, level in _LEXICON_CUE_PATTERNS:
+                if pattern.search(window):
+                    return level
+        return LEXICON_DEFAULT_LEVEL
+
+    def _score_lexicon_candidates(self, items: List[Tuple[str, List[Dict], np.ndarray]]) -> List[List[Dict[str, any]]]:
+        """
+        Score lexicon matches with a cue-word level in place of the zero-shot level
+
+        The level and the template similarity go through _combine_entity_score, as on the
+        NER path, so lexicon and NER entities are on the same scale when ranked together.
+
+        Args:
+            items: (text, lexicon candidates, normalized text embedding) per text
+
+        Returns:
+            One entity list per item, best first
+        """
+        try:
+            template_matrices = self._template_embeddings(
+                [candidate['entity'] for _, candidates, _ in items for candidate in candidates])
+        except Exception as e:
+            print(f"Error in lexicon template similarity: {e}")
+            template_matrices = None
 
-        # Check if it's in the languages list
-        if entity_lower in common_languages:
-            return True
+        results = []
+        for text, candidates, text_embedding in items:
+            entities = []
+            for k, candidate in enumerate(candidates):
+                previous_end = candidates[k - 1]['end'] if k > 0 else 0
+                next_start = candidates[k + 1]['start'] if k + 1 < len(candidates) else len(text)
+                level = self._lexicon_confidence_level(text, candidate['start'], candidate['end'],
+                                                       previous_end, next_start)
+                max_similarity = 0.0
+                if template_matrices is not None:
+                    max_similarity = float(np.max(template_matrices[candidate['entity']] @ text_embedding))
+                score = self._combine_entity_score({'labels': [self.confidence_levels[level]], 'scores': [1.0]},
+                                                   max_similarity)
+                entities.append({**candidate, 'confidence': score['confidence']})
+            results.append(sorted(entities, key=lambda x: x['confidence'], reverse=True))
+        return results
+
+    def _find_entity_candidates(self, text: str, ner_results: List[Dict],
+                                verdicts: Optional[Dict[str, bool]] = None) -> List[Dict[str, any]]:
+        """
+        Filter NER output down to language entities (before confidence scoring)
+
+        Args:
+            verdicts: Precomputed _language_verdicts for the entity words; computed for
+                this text's entities in one call when not given
+        """
+        candidates = []
+        if verdicts is None:
+            verdicts = self._language_verdicts(self._ner_entity_words(ner_results))
+
+        # Step 2: Filter and accept only language entities
+        for entity in ner_results:
+            if entity['score'] > 0.5:  # Only high-confidence entities
+                potential_entity = entity['word'].strip()
+
+                # Filter for languages only - check if it's actually a language
+                if verdicts.get(potential_entity, False):
+                    print(f"Accepting language entity: '{potential_entity}' (score: {entity['score']:.3f})")
+                    candidates.append({
+                        'entity': potential_entity,
+                        'type': self.data_type.upper(),
+                        'start': entity['start'],
+                        'end': entity['end']
+                    })
+                else:
+                    print(f"Filtering out non-language entity: '{potential_entity}' (score: {entity['score']:.3f})")
+
+        # Step 3: Fall back to the language lexicon if no entities found
+        if self.data_type == "languages" and len(candidates) == 0:
+            print("No NER entities, checking the language lexicon...")
+            for candidate in self._language_mentions(text):
+                print(f"Found language: {candidate['entity']}")
+                candidates.append(candidate)
+
+        return candidates
+
+    def extract_entities_batch(self, texts: List[str],
+                               text_embeddings: Optional[np.ndarray] = None,
+                               batch_size: int = 32) -> List[List[Dict[str, any]]]:
+        """
+        Extract entities for many texts with one batched call per model
+
+        Args:
+            texts: Texts to analyze
+            text_embeddings: Optional precomputed L2-normalized embeddings of `texts` (same order)
+            batch_size: Batch size passed to the pipelines and the sentence transformer
+
+        Returns:
+            One entity list per text, in the same format as extract_entities_ml
+        """
+        results: List[List[Dict[str, any]]] = [[] for _ in texts]
+        indices = []
+        lexicon_hits = {}
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            # Lexicon hits are answered here; only the rest go through NER and zero-shot
+            lexicon_candidates = self._lexicon_candidates(text)
+            if lexicon_candidates:
+                lexicon_hits[i] = lexicon_candidates
+            else:
+                indices.append(i)
+        if lexicon_hits:
+            if text_embeddings is None:
+                matrix = self._encode_normalized([texts[i] for i in lexicon_hits], batch_size=batch_size)
+                lexicon_embeddings = dict(zip(lexicon_hits, matrix))
+            else:
+                lexicon_embeddings = {i: text_embeddings[i] for i in lexicon_hits}
+            scored = self._score_lexicon_candidates(
+                [(texts[i], candidates, lexicon_embeddings[i]) for i, candidates in lexicon_hits.items()])
+            for i, entities in zip(lexicon_hits, scored):
+                results[i] = entities
+        if not indices:
+            return results
 
-        # For entities not in either list, use zero-shot to determine if it's a language
         try:
-            language_categories = [
-                "is a language name",
-                "is a country name",
-                "is a person name",
-                "is an organization name",
-                "is a place name"
-            ]
+            # One NER pass over every text the lexicon could not answer
+            ner_batches = self.ner_pipeline([texts[i] for i in indices], batch_size=batch_size)
 
-            result = self.zero_shot_pipeline(
-                entity_name,
-                language_categories,
-                hypothesis_template="This entity {{}}"
+            # One zero-shot call decides which entity words are languages, across all texts
+            verdicts = self._language_verdicts(
+                [word for ner_results in ner_batches for word in self._ner_entity_words(ner_results)],
+                batch_size=batch_size
             )
 
-            # If it's classified as a language name, accept it
-            return result['labels'][0] == "is a language name" and result['scores'][0] > 0.6
+            pairs = []  # (text index, candidate)
+            for i, ner_results in zip(indices, ner_batches):
+                for candidate in self._find_entity_candidates(texts[i], ner_results, verdicts):
+                    pairs.append((i, candidate))
+
+            if not pairs:
+                return results
+
+            if text_embeddings is None:
+                embedded = sorted({i for i, _ in pairs})
+                matrix = self._encode_normalized([texts[i] for i in embedded], batch_size=batch_size)
+                text_embeddings = {i: matrix[k] for k, i in enumerate(embedded)}
+            scores = self._score_entities_batch(
+                [(texts[i], candidate['entity'], text_embeddings[i]) for i, candidate in pairs],
+                batch_size=batch_size
+            )
+
+            for (i, candidate), entity_score in zip(pairs, scores):
+                results[i].append({**candidate, 'confidence': entity_score['confidence']})
+
+            return [sorted(entities, key=lambda x: x['confidence'], reverse=True) for entities in results]
 
         except Exception as e:
-            print(f"Error in language classification for '{entity_name}': {e}")
-            # If classification fails, be conservative and reject
-            return False
+            print(f"Error in batched entity extraction: {e}")
+            return results
 
-    def _calculate_entity_score_ml(self, entity_name: str, text: str) -> Dict[str, any]:
-        """Calculate confidence score using pure ML approach - how much they like/value this entity"""
-        try:
-            # Use zero-shot to determine how much they like/value this entity
-            confidence_levels = [
-                f"loves and is very proficient with {self.data_type}",
-                f"likes and is good with {self.data_type}",
-                f"is okay with and has basic knowledge of {self.data_type}",
-                f"is learning and interested in {self.data_type}",
-                f"doesn't really like or use {self.data_type}",
-                f"has no interest in {self.data_type}"
-            ]
+    @staticmethod
+    def _ner_entity_words(ner_results: List[Dict]) -> List[str]:
+        """Words of the high-confidence NER entities, the ones _find_entity_candidates considers"""
+        return [entity['word'].strip() for entity in ner_results if entity['score'] > 0.5]
 
-            confidence_result = self.zero_shot_pipeline(
-                f"Regarding {entity_name} {self.data_type} in: {text}",
-                confidence_levels,
-                hypothesis_template="This person {{}}"
+    def _is_language_entity(self, entity_name: str) -> bool:
+        """Check if an entity is actually a language (not a country, person, etc.)"""
+        return self._language_verdicts([entity_name]).get(entity_name, False)
+
+    def _language_verdicts(self, entity_names: List[str], batch_size: int = 32) -> Dict[str, bool]:
+        """
+        Language verdict per entity name, classifying every unknown name in one zero-shot call
+
+        Names in the lexicon's language or non-language lists never reach the model.
+        """
+        verdicts = {}
+        unknown = []
+        for name in dict.fromkeys(entity_names):
+            entity_lower = name.lower().strip()
+            if not entity_lower or entity_lower in NON_LANGUAGE_ENTITIES:
+                verdicts[name] = False
+            elif entity_lower in COMMON_LANGUAGES:
+                verdicts[name] = True
+            else:
+                unknown.append(name)
+        if unknown:
+            try:
+                found = self._cached_lookup(
+                    self._language_cache, [name.strip() for name in unknown],
+                    lambda missing: self._classify_language_zero_shot(missing, batch_size)
+                )
+                verdicts.update((name, found[name.strip()]) for name in unknown)
+            except Exception as e:
+                print(f"Error in language classification for {unknown}: {e}")
+                # If classification fails, be conservative and reject
+                verdicts.update((name, False) for name in unknown)
+        return verdicts
+
+    def _classify_language_zero_shot(self, entity_names: List[str], batch_size: int = 32) -> List[bool]:
+        """Zero-shot language check for several entity names in one pipeline call"""
+        results = self.zero_shot_pipeline(
+            entity_names,
+            list(LANGUAGE_CATEGORIES),
+            hypothesis_template="This entity {{}}",
+            batch_size=batch_size
+        )
+        if isinstance(results, dict):
+            results = [results]
+
+        # If it's classified as a language name, accept it
+        return [result['labels'][0] == "is a language name" and result['scores'][0] > 0.6 for result in results]
+
+    def _confidence_templates(self, entity_name: str) -> List[str]:
+        """Example sentences for different confidence levels"""
+        return [template.format(entity=entity_name) for template in CONFIDENCE_TEMPLATES]
+
+    def _cached_lookup(self, cache: OrderedDict, keys: List, compute) -> Dict:
+        """
+        Values for `keys` from an LRU cache, computing the missing ones in one call
+
+        Results for this call are collected before the cache is trimmed, so evicting
+        entries (including ones just computed) never loses a value we are returning.
+        """
+        unique = list(dict.fromkeys(keys))
+        found = {}
+        with self._cache_lock:
+            for key in unique:
+                if key in cache:
+                    cache.move_to_end(key)
+                    found[key] = cache[key]
+        missing = [key for key in unique if key not in found]
+        if missing:
+            found.update(zip(missing, compute(missing)))
+            with self._cache_lock:
+                for key in missing:
+                    cache[key] = found[key]
+                while len(cache) > ENTITY_CACHE_SIZE:
+                    cache.popitem(last=False)
+        return found
+
+    def _template_embeddings(self, entity_names: List[str]) -> Dict[str, np.ndarray]:
+        """Normalized template matrices (6 x dim) per entity, encoding only entities not seen before"""
+        def encode(missing: List[str]) -> List[np.ndarray]:
+            templates = [t for name in missing for t in self._confidence_templates(name)]
+            matrix = self._encode_normalized(templates)
+            per_entity = len(CONFIDENCE_TEMPLATES)
+            return [matrix[k * per_entity:(k + 1) * per_entity] for k in range(len(missing))]
+
+        found = self._cached_lookup(self._template_cache, entity_names, encode)
+        return {name: found[name] for name in entity_names}
+
+    def _zero_shot_confidence(self, sequences: List[str], batch_size: int = 32) -> List[Dict]:
+        """Zero-shot confidence results per sequence, running only uncached sequences through BART"""
+        def classify(missing: List[str]) -> List[Dict]:
+            results = self.zero_shot_pipeline(
+                missing,
+                list(self.confidence_levels),
+                hypothesis_template="This person {{}}",
+                batch_size=batch_size
             )
+            return [results] if isinstance(results, dict) else results
+
+        found = self._cached_lookup(self._confidence_cache, sequences, classify)
+        return [found[seq] for seq in sequences]
+
+    def _encode_normalized(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Encode texts into L2-normalized embeddings so dot products are cosine similarities.
+
+        Reads through the persistent embedding store, so only texts never seen before
+        (by any process) reach the sentence transformer.
+        """
+        def encode(missing: List[str]) -> np.ndarray:
+            embeddings = self.sentence_transformer.encode(missing, batch_size=batch_size, convert_to_numpy=True)
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            return embeddings / np.maximum(norms, 1e-12)
+
+        if not texts:
+            return np.zeros((0, SENTENCE_MODEL_DIM), dtype=np.float32)
+        store = get_embedding_store(model_registry.embedding_space(), SENTENCE_MODEL_DIM)
+        if store is None:
+            return encode(texts)
+        return store.encode(texts, encode)
+
+    def _combine_entity_score(self, confidence_result: Dict, max_similarity: float) -> Dict[str, any]:
+        """Turn a zero-shot result and the best template similarity into a confidence score"""
+        top_level = confidence_result['labels'][0]
+        confidence_score = self.confidence_mapping.get(top_level, 0.5)
+
+        # Adjust confidence based on similarity
+        similarity_boost = max_similarity * 0.2
+        final_confidence = min(confidence_score + similarity_boost, 1.0)
+        final_confidence = max(final_confidence, 0.1)  # Minimum confidence
+
+        return {
+            'confidence': final_confidence,
+            'ml_details': {
+                'confidence_level': top_level,
+                'confidence_confidence': confidence_result['scores'][0],
+                'similarity_score': max_similarity
+            }
+        }
 
-            # Map confidence levels to scores (0.0 to 1.0)
-            confidence_mapping = {
-                f"loves and is very proficient with {self.data_type}": 0.95,
-                f"likes and is good with {self.data_type}": 0.8,
-                f"is okay with and has basic knowledge of {self.data_type}": 0.6,
-                f"is learning and interested in {self.data_type}": 0.7,
-                f"doesn't really like or use {self.data_type}": 0.3,
-                f"has no interest in {self.data_type}": 0.1
+    def _default_entity_score(self) -> Dict[str, any]:
+        return {
+            'confidence': 0.5,
+            'ml_details': {
+                'confidence_level': 'unknown',
+                'confidence_confidence': 0.0,
+                'similarity_score': 0.0
             }
+        }
 
-            top_level = confidence_result['labels'][0]
-            confidence_score = confidence_mapping.get(top_level, 0.5)
+    def _calculate_entity_score_ml(self, entity_name: str, text: str) -> Dict[str, any]:
+        """Calculate confidence score using pure ML approach - how much they like/value this entity"""
+        try:
+            # Use zero-shot to determine how much they like/value this entity
+            confidence_result = self._zero_shot_confidence([f"Regarding {entity_name} {self.data_type} in: {text}"])[0]
 
             # Use sentence transformers to refine the confidence score
-            # Create templates for different confidence levels
-            confidence_templates = [
-                f"I love {entity_name} and use it every day",
-                f"I like {entity_name} and am good at it",
-                f"I know some {entity_name}",
-                f"I am learning {entity_name}",
-                f"I don't really use {entity_name}",
-                f"I have no interest in {entity_name}"
-            ]
+            # Calculate similarity with templates for different confidence levels
+            text_embedding = self._encode_normalized([text])[0]
+            template_embeddings = self._template_embeddings([entity_name])[entity_name]
 
-            # Calculate similarity with templates
-            text_embedding = self.sentence_transformer.encode([text])
-            template_embeddings = self.sentence_transformer.encode(confidence_templates)
-
-            similarities = cosine_similarity(text_embedding, template_embeddings)[0]
-            max_similarity = np.max(similarities)
-
-            # Adjust confidence based on similarity
-            similarity_boost = max_similarity * 0.2
-            final_confidence = min(confidence_score + similarity_boost, 1.0)
-            final_confidence = max(final_confidence, 0.1)  # Minimum confidence
-
-            return {
-                'confidence': final_confidence,
-                'ml_details': {
-                    'confidence_level': top_level,
-                    'confidence_confidence': confidence_result['scores'][0],
-                    'similarity_score': max_similarity
-                }
-            }
+            max_similarity = float(np.max(template_embeddings @ text_embedding))
+
+            return self._combine_entity_score(confidence_result, max_similarity)
 
         except Exception as e:
             print(f"Error in ML confidence scoring: {e}")
-            return {
-                'confidence': 0.5,
-                'ml_details': {
-                    'confidence_level': 'unknown',
-                    'confidence_confidence': 0.0,
-                    'similarity_score': 0.0
-                }
-            }
+            return self._default_entity_score()
+
+    def _score_entities_batch(self, items: List[Tuple[str, str, np.ndarray]],
+                              batch_size: int = 32) -> List[Dict[str, any]]:
+        """
+        Batched version of _calculate_entity_score_ml
+
+        Args:
+            items: (text, entity name, normalized text embedding) triples
+
+        Returns:
+            One score dict per item, in order
+        """
+        try:
+            # One zero-shot call for every (entity, text) pair not answered from the cache
+            sequences = [f"Regarding {entity} {self.data_type} in: {text}" for text, entity, _ in items]
+            confidence_results = self._zero_shot_confidence(sequences, batch_size=batch_size)
+
+            # One encode call for the templates of every entity not seen before
+            template_matrices = self._template_embeddings([entity for _, entity, _ in items])
+
+            scores = []
+            for (_, entity, text_embedding), confidence_result in zip(items, confidence_results):
+                max_similarity = float(np.max(template_matrices[entity] @ text_embedding))
+                scores.append(self._combine_entity_score(confidence_result, max_similarity))
+            return scores
+
+        except Exception as e:
+            print(f"Error in batched ML confidence scoring: {e}")
+            return [self._default_entity_score() for _ in items]
 
     def calculate_comprehensive_score(self, text: str) -> Dict[str, float]:
         """Calculate comprehensive ML-based confidence score"""
         if not text:
-            return {
-                'overall_score': 0.0,
-                'confidence': 0.0,
-                'entity_count': 0
-            }
+            return self._empty_comprehensive_score()
 
         try:
             # Extract entities using ML
             entities = self.extract_entities_ml(text)
-
-            # Calculate average confidence
-            avg_confidence = sum(entity['confidence'] for entity in entities) / max(len(entities), 1)
-
-            # Overall score is just the average confidence
-            overall_score = avg_confidence
-
-            return {
-                'overall_score': overall_score,
-                'confidence': avg_confidence,
-                'entity_count': len(entities),
-                'entities': entities
-            }
+            return self._summarize_entities(entities)
 
         except Exception as e:
             print(f"Error in comprehensive scoring: {e}")
-            return {
-                'overall_score': 0.0,
-                'confidence': 0.0,
-                'entity_count': 0,
-                'entities': []
-            }
+            return self._empty_comprehensive_score()
+
+    def calculate_comprehensive_scores_batch(self, texts: List[str],
+                                             text_embeddings: Optional[np.ndarray] = None,
+                                             batch_size: int = 32) -> List[Dict[str, float]]:
+        """Batched version of calculate_comprehensive_score"""
+        entity_lists = self.extract_entities_batch(texts, text_embeddings, batch_size=batch_size)
+        return [
+            self._summarize_entities(entities) if text else self._empty_comprehensive_score()
+            for text, entities in zip(texts, entity_lists)
+        ]
+
+    def _summarize_entities(self, entities: List[Dict]) -> Dict[str, float]:
+        # Calculate average confidence
+        avg_confidence = sum(entity['confidence'] for entity in entities) / max(len(entities), 1)
+
+        # Overall score is just the average confidence
+        overall_score = avg_confidence
+
+        return {
+            'overall_score': overall_score,
+            'confidence': avg_confidence,
+            'entity_count': len(entities),
+            'entities': entities
+        }
+
+    def _empty_comprehensive_score(self) -> Dict[str, float]:
+        return {
+            'overall_score': 0.0,
+            'confidence': 0.0,
+            'entity_count': 0,
+            'entities': []
+        }
 
     def rank_users_for_task_ml(self,
                               user_anchor_answers: Dict[str, str],
                               area_main_answers: List[str],
-                              area_name: str = "") -> List[Tuple[str, float, Dict]]:
-        """Rank users for task using pure ML approach"""
+                              area_name: str = "",
+                              batch_size: int = 32,
+                              top_k: Optional[int] = None) -> List[Tuple[str, float, Dict]]:
+        """
+        Rank users for task using pure ML approach (all users scored in one batched pass)
+
+        Args:
+            user_anchor_answers: user_id -> anchor answer text
+            area_main_answers: Answers collected in the area
+            area_name: Area name (for logging)
+            batch_size: Batch size for the models
+            top_k: Only analyze and return the top_k users by similarity to the area answers
+
+        Returns:
+            (user_id, score, details) tuples, best first
+        """
         try:
-            ranked_users = []
-
-            for user_id, answer in user_anchor_answers.items():
-                # Analyze user's entity profile using ML
-                user_analysis = self.calculate_comprehensive_score(answer)
-
-                # Calculate similarity with area answers using sentence transformers
-                user_embedding = self.sentence_transformer.encode([answer])
-                area_embeddings = self.sentence_transformer.encode(area_main_answers)
-
-                similarities = cosine_similarity(user_embedding, area_embeddings)[0]
-                max_similarity = np.max(similarities)
-
-                # Calculate ranking score
-                base_score = user_analysis['overall_score']
-                similarity_penalty = (1 - max_similarity) * 0.5
-                final_score = base_score - similarity_penalty
-
-                ranked_users.append((
+            if not user_anchor_answers or not area_main_answers:
+                return []
+
+            area_embeddings = self._encode_normalized(area_main_answers, batch_size=batch_size)
+
+            if ML_SIMILARITY_INDEX:
+                # User embeddings come from the similarity index; only changed answers are re-embedded
+                index = get_similarity_index(SENTENCE_MODEL_DIM, model_registry.embedding_space())
+                index.sync(user_anchor_answers, lambda texts: self._encode_normalized(texts, batch_size=batch_size))
+                id_of = {str(user_id): user_id for user_id in user_anchor_answers}
+                k = top_k if top_k is not None else len(id_of)
+                nearest = index.search(area_embeddings, k, allowed_user_ids=id_of.keys())
+                user_ids = [id_of[user_id] for user_id, _ in nearest]
+                max_similarities = np.array([similarity for _, similarity in nearest], dtype=np.float32)
+                user_embeddings = index.vectors([str(user_id) for user_id in user_ids])
+            else:
+                user_ids = list(user_anchor_answers.keys())
+                user_embeddings = self._encode_normalized([user_anchor_answers[u] or "" for u in user_ids],
+                                                          batch_size=batch_size)
+                # Full user x area cosine matrix in one operation
+                max_similarities = (user_embeddings @ area_embeddings.T).max(axis=1)
+                if top_k is not None and len(user_ids) > top_k:
+                    keep = np.argsort(-max_similarities)[:top_k]
+                    user_ids = [user_ids[i] for i in keep]
+                    user_embeddings, max_similarities = user_embeddings[keep], max_similarities[keep]
+
+            answers = [user_anchor_answers[user_id] or "" for user_id in user_ids]
+
+            # Analyze every user's entity profile with batched pipeline calls
+            analyses = self.calculate_comprehensive_scores_batch(answers, user_embeddings, batch_size=batch_size)
+
+            # Calculate ranking scores
+            base_scores = np.array([analysis['overall_score'] for analysis in analyses], dtype=np.float32)
+            similarity_penalties = (1 - max_similarities) * 0.5
+            final_scores = base_scores - similarity_penalties
+
+            ranked_users = [
+                (
                     user_id,
-                    final_score,
+                    float(final_scores[k]),
                     {
-                        'base_score': base_score,
-                        'similarity_penalty': similarity_penalty,
-                        'ml_analysis': user_analysis
+                        'base_score': float(base_scores[k]),
+                        'similarity_penalty': float(similarity_penalties[k]),
+                        'ml_analysis': analyses[k]
                     }
-                ))
+                )
+                for k, user_id in enumerate(user_ids)
+            ]
 
             # Sort by score (highest first)
             ranked_users.sort(key=lambda x: x[1], reverse=True)
@@ -356,11 +658,18 @@ class MLanguageAnalyzer:
             return []
 
 
+# One analyzer per data type; the underlying models are shared through the registry
+_analyzers: Dict[str, MLanguageAnalyzer] = {}
+
+
 # Create a factory function to get the appropriate analyzer
 def get_entity_analyzer(data_type: str = "languages"):
-    """Factory function to create an analyzer for the specified data type"""
-    return MLanguageAnalyzer(data_type)
+    """Factory function to get the (cached) analyzer for the specified data type"""
+    key = data_type.lower()
+    if key not in _analyzers:
+        _analyzers[key] = MLanguageAnalyzer(key)
+    return _analyzers[key]
 
 
 # Backward compatibility - keep the old name for existing code
-sentiment_analyzer = MLanguageAnalyzer("languages")
+sentiment_analyzer = get_entity_analyzer("languages")
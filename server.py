@@ -16,9 +16,9 @@ from dotenv import load_dotenv
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
-from database_utils import db_operation
+from database_utils import db_operation, db_transaction
 
-# from sentiment_analysis import sentiment_analyzer  # COMMENTED OUT - Using proximity only
+# from model_registry import get_analyzer  # COMMENTED OUT - Using proximity only (ML_ANALYZER_MODE picks local or remote)
 
 env_path = Path(__file__).parent / '.env'
 load_dotenv(env_path)
@@ -191,7 +191,9 @@ def create_lexi_tables():
     add_column_if_missing('lexi', 'speaker_academic_level', "ENUM('Freshman','Sophomore','Junior','Senior','Davis Scholar','Faculty/Staff','Pre-college','Non Wellesley-affiliated adult') NULL")
     add_column_if_missing('lexi', 'additional_comments', 'TEXT NULL')
     add_column_if_missing('lexi', 'outstanding_questions', 'TEXT NULL')
-    return ok1 and ok2
+    from area_coverage import ensure_coverage_table
+    ok3 = ensure_coverage_table()
+    return ok1 and ok2 and ok3
 
 
 @app.route('/create-lexi-tables', methods=['POST'])
@@ -613,7 +615,13 @@ def create_lexi_response():
             data.get('additional_comments'),
             data.get('outstanding_questions'),
         ]
-        ok = db_operation(q, params)
+        # Count the visit for the area in the same transaction as the report
+        from area_coverage import LEXI_SOURCE, counter_upsert
+        coverage = counter_upsert(LEXI_SOURCE, [(general_area, datetime.now(), {'visits': 1})])
+        ok = db_transaction([(q, [params]), coverage]) is not False
+        if ok and latitude is not None and longitude is not None:
+            from location_index import record_location
+            record_location(user_id, latitude, longitude)
         return jsonify({"success": bool(ok)})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -668,7 +676,24 @@ def upsert_lexi_user():
             '''
         )
         ok = db_operation(q, [user_id, name, email, anchor_answer_json])
+        if ok and user:
+            # Drop the cached embedding of the previous anchor answer if it changed
+            try:
+                from embedding_store import invalidate_anchor_answer
+                from model_registry import model_registry
+                from similarity_index import remove_user
+                if invalidate_anchor_answer(model_registry.embedding_space(), user.get('anchor_answer'), anchor_answer or []):
+                    # The tombstone keeps other processes' saved copies from restoring the old vector
+                    remove_user(user_id)
+            except Exception as e:
+                print(f"[Lexi] Embedding invalidation skipped: {e}")
         if ok:
+            # Re-read this user's anchor answers on the next lookup instead of waiting for the cache TTL
+            try:
+                from anchor_answers import invalidate_anchor_answers
+                invalidate_anchor_answers(user_id)
+            except Exception as e:
+                print(f"[Lexi] Anchor answer cache invalidation skipped: {e}")
             return jsonify({"success": True, "user": {"user_id": user_id, "name": name, "email": email, "anchor_answer": anchor_answer or []}})
         return jsonify({"success": False})
     except Exception as e:
@@ -782,6 +807,30 @@ def reset_typo_counter():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@app.route('/ml/model-stats', methods=['GET'])
+def get_ml_model_stats():
+    """Get load time and memory of the shared ML models"""
+    try:
+        from embedding_store import get_store_stats
+        from model_registry import get_model_stats
+        stats = get_model_stats()
+        stats['embedding_store'] = get_store_stats()
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/ml/inference-stats', methods=['GET'])
+def get_ml_inference_stats():
+    """Get queue and batching statistics from the out-of-process inference service"""
+    try:
+        from inference_service import InferenceUnavailableError, get_inference_client
+        return jsonify(get_inference_client().get_stats())
+    except InferenceUnavailableError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Start server
 if __name__ == "__main__":
     # Initialize the latest query time file if it doesn't exist
@@ -799,5 +848,12 @@ if __name__ == "__main__":
         port = int(port_str)
     except ValueError:
         port = 5000
+    debug = True
+    # Preload the ML models before serving when ML_WARMUP_ON_START=1. With the debug
+    # reloader the parent process only watches files, so only the serving child warms up.
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from model_registry import warmup_models
+        warmup_models()
+
     print(f"Starting server with HTTP on port {port}")
-    app.run(debug=True, host='0.0.0.0', port=port)
+    app.run(debug=debug, host='0.0.0.0', port=port)
@@ -0,0 +1,403 @@
+import atexit
+import fcntl
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from embedding_store import EMBEDDING_STORE_DIR, normalize_text
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# 'exact' (normalized inner product over every user) or 'hnsw' (approximate, needs hnswlib)
+SIMILARITY_INDEX_MODE = os.environ.get('SIMILARITY_INDEX_MODE', 'exact').lower()
+# Saved indexes go here as `<embedding space>.users.npz`; empty disables saving
+SIMILARITY_INDEX_DIR = os.environ.get('SIMILARITY_INDEX_DIR', EMBEDDING_STORE_DIR)
+# Seconds between background saves of changed indexes (0 saves only when asked and at exit)
+SIMILARITY_INDEX_SAVE_INTERVAL = float(os.environ.get('SIMILARITY_INDEX_SAVE_INTERVAL', '30'))
+# Days a removed user's tombstone is kept, so older saves cannot bring the user back
+SIMILARITY_INDEX_TOMBSTONE_DAYS = float(os.environ.get('SIMILARITY_INDEX_TOMBSTONE_DAYS', '30'))
+
+# HNSW build/query parameters
+HNSW_M = int(os.environ.get('HNSW_M', '16'))
+HNSW_EF_CONSTRUCTION = int(os.environ.get('HNSW_EF_CONSTRUCTION', '200'))
+HNSW_EF_SEARCH = int(os.environ.get('HNSW_EF_SEARCH', '64'))
+
+
+class UserSimilarityIndex:
+    """Index of L2-normalized user anchor-answer embeddings for top-k user lookups per area.
+
+    Rows are kept in one contiguous float32 matrix (removals swap the last row in), so
+    exact search is a single matrix product. In 'hnsw' mode an hnswlib graph over the same
+    vectors proposes candidates, which are then re-scored exactly. Each user's answer text
+    is remembered so sync() only re-embeds users whose answer changed.
+
+    Several processes can save the same file. Every user carries the time of its last
+    upsert, and removals leave a timestamped tombstone. save() holds an flock and, if
+    another process saved since this one last loaded or saved, merges that copy first:
+    per user, the newer upsert or removal wins, so neither process's updates are lost
+    and a removed or re-embedded user is not brought back from an older copy.
+    """
+
+    def __init__(self, dim: int, mode: str = SIMILARITY_INDEX_MODE, path: str = ''):
+        if mode == 'hnsw' and hnswlib is None:
+            print("[SimilarityIndex] hnswlib not installed, falling back to exact search")
+            mode = 'exact'
+        self.dim = dim
+        self.mode = mode
+        self.path = path
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._size = 0
+        self._user_ids: List[str] = []
+        self._texts: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._label_of: Dict[str, int] = {}
+        self._user_of_label: Dict[int, str] = {}
+        self._next_label = 0
+        self._hnsw = None
+        self._dirty = False
+        # Last change per user (time.time_ns()), tombstones of removed users, and the file version we last saw
+        self._version_of: Dict[str, int] = {}
+        self._removed: Dict[str, int] = {}
+        self._saved_version: Optional[Tuple[int, int]] = None
+        self._lock = threading.RLock()
+        self.stats = {'searches': 0, 'upserts': 0, 'removals': 0, 'synced_unchanged': 0}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _ensure_capacity(self, rows: int):
+        if rows <= len(self._matrix):
+            return
+        capacity = max(rows, 2 * len(self._matrix), 64)
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        grown[:self._size] = self._matrix[:self._size]
+        self._matrix = grown
+
+    def _hnsw_index(self):
+        if self._hnsw is None:
+            self._hnsw = hnswlib.Index(space='ip', dim=self.dim)
+            self._hnsw.init_index(max_elements=max(1024, 2 * self._size), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+            self._hnsw.set_ef(HNSW_EF_SEARCH)
+            if self._size:
+                labels = np.array([self._label_of[user_id] for user_id in self._user_ids], dtype=np.int64)
+                self._hnsw.add_items(self._matrix[:self._size], labels)
+        return self._hnsw
+
+    def upsert(self, user_ids: List[str], texts: List[str], embeddings: np.ndarray,
+               versions: Optional[List[int]] = None):
+        """Insert or replace users' normalized embeddings (rows in the same order as user_ids)"""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(user_ids), self.dim)
+        if versions is None:
+            versions = [time.time_ns()] * len(user_ids)
+        with self._lock:
+            self._ensure_capacity(self._size + len(user_ids))
+            for user_id, text, embedding, version in zip(user_ids, texts, embeddings, versions):
+                self._version_of[user_id] = int(version)
+                self._removed.pop(user_id, None)
+                row = self._row_of.get(user_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._row_of[user_id] = row
+                    self._user_ids.append(user_id)
+                    self._texts.append(text)
+                    self._label_of[user_id] = self._next_label
+                    self._user_of_label[self._next_label] = user_id
+                    self._next_label += 1
+                else:
+                    self._texts[row] = text
+                self._matrix[row] = embedding
+
+            if self._hnsw is not None and len(user_ids):
+                index = self._hnsw
+                if index.get_current_count() + len(user_ids) > index.get_max_elements():
+                    index.resize_index(2 * (index.get_current_count() + len(user_ids)))
+                # Re-adding an existing label replaces its vector
+                index.add_items(embeddings, np.array([self._label_of[u] for u in user_ids], dtype=np.int64))
+
+            self.stats['upserts'] += len(user_ids)
+            self._dirty = True
+
+    def remove(self, user_ids: Iterable[str], version: Optional[int] = None):
+        """Drop users from the index, leaving a tombstone that later merges respect"""
+        version = time.time_ns() if version is None else int(version)
+        with self._lock:
+            for user_id in user_ids:
+                if self._removed.get(user_id, -1) < version:
+                    self._removed[user_id] = version
+                    self._dirty = True
+                self._version_of.pop(user_id, None)
+                row = self._row_of.pop(user_id, None)
+                if row is None:
+                    continue
+                last = self._size - 1
+                if row != last:
+                    moved = self._user_ids[last]
+                    self._matrix[row] = self._matrix[last]
+                    self._user_ids[row] = moved
+                    self._texts[row] = self._texts[last]
+                    self._row_of[moved] = row
+                self._user_ids.pop()
+                self._texts.pop()
+                self._size -= 1
+
+                label = self._label_of.pop(user_id)
+                self._user_of_label.pop(label, None)
+                if self._hnsw is not None:
+                    self._hnsw.mark_deleted(label)
+                self.stats['removals'] += 1
+
+    def sync(self, user_anchor_answers: Dict[str, str], encode_fn: Callable[[List[str]], np.ndarray]) -> int:
+        """
+        Bring the given users up to date, embedding only new users and changed answers
+
+        Args:
+            user_anchor_answers: user_id -> anchor answer text (users not listed are left alone)
+            encode_fn: Returns L2-normalized embeddings for a list of texts
+
+        Returns:
+            Number of users that were (re)embedded
+        """
+        with self._lock:
+            stale = []
+            for user_id, answer in user_anchor_answers.items():
+                text = normalize_text(answer or '')
+                row = self._row_of.get(str(user_id))
+                if row is None or self._texts[row] != text:
+                    stale.append((str(user_id), text))
+            self.stats['synced_unchanged'] += len(user_anchor_answers) - len(stale)
+
+        if stale:
+            embeddings = encode_fn([text for _, text in stale])
+            self.upsert([user_id for user_id, _ in stale], [text for _, text in stale], embeddings)
+        return len(stale)
+
+    def vectors(self, user_ids: List[str]) -> np.ndarray:
+        """Stored embeddings for users (all must be in the index)"""
+        with self._lock:
+            return self._matrix[[self._row_of[str(user_id)] for user_id in user_ids]].copy()
+
+    def search(self, area_embeddings: np.ndarray, k: int,
+               allowed_user_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Top-k users by best cosine similarity to any of the area's answer embeddings
+
+        Args:
+            area_embeddings: Normalized embeddings of the area's answers (n x dim)
+            k: Number of users to return
+            allowed_user_ids: Restrict results to these users (e.g. one workspace)
+
+        Returns:
+            (user_id, max similarity) pairs, best first
+        """
+        area_embeddings = np.asarray(area_embeddings, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            self.stats['searches'] += 1
+            if not self._size or not len(area_embeddings) or k <= 0:
+                return []
+
+            if allowed_user_ids is not None:
+                rows = np.array(sorted({self._row_of[u] for u in map(str, allowed_user_ids) if u in self._row_of}),
+                                dtype=np.int64)
+            else:
+                rows = np.arange(self._size)
+            if not len(rows):
+                return []
+
+            if self.mode == 'hnsw' and len(rows) > k:
+                rows = self._hnsw_candidates(area_embeddings, k, rows)
+
+            max_similarities = (self._matrix[rows] @ area_embeddings.T).max(axis=1)
+            if len(rows) > k:
+                top = np.argpartition(-max_similarities, k - 1)[:k]
+            else:
+                top = np.arange(len(rows))
+            top = top[np.argsort(-max_similarities[top])]
+            return [(self._user_ids[rows[i]], float(max_similarities[i])) for i in top]
+
+    def _hnsw_candidates(self, area_embeddings: np.ndarray, k: int, rows: np.ndarray) -> np.ndarray:
+        """Union of the approximate top-k users for every area answer, limited to `rows`"""
+        index = self._hnsw_index()
+        allowed_labels = {self._label_of[self._user_ids[row]] for row in rows}
+        query_k = min(k, len(allowed_labels))
+        index.set_ef(max(HNSW_EF_SEARCH, query_k))
+        labels, _ = index.knn_query(area_embeddings, k=query_k, filter=lambda label: label in allowed_labels)
+        candidate_rows = {self._row_of[self._user_of_label[int(label)]] for label in labels.ravel()}
+        return np.array(sorted(candidate_rows), dtype=np.int64)
+
+    def save(self):
+        """Persist the index (atomically) if it changed since the last save"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            with open(f"{self.path}.lock", 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._merge_newer_save()
+                    expired = time.time_ns() - int(SIMILARITY_INDEX_TOMBSTONE_DAYS * 86400e9)
+                    self._removed = {u: v for u, v in self._removed.items() if v >= expired}
+                    tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+                    np.savez(tmp_path,
+                             matrix=self._matrix[:self._size],
+                             user_ids=np.array(self._user_ids, dtype=object),
+                             texts=np.array(self._texts, dtype=object),
+                             versions=np.array([self._version_of[u] for u in self._user_ids], dtype=np.int64),
+                             removed_ids=np.array(list(self._removed), dtype=object),
+                             removed_versions=np.array(list(self._removed.values()), dtype=np.int64))
+                    os.replace(tmp_path, self.path)
+                    self._saved_version = self._file_version()
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+            self._dirty = False
+
+    def _file_version(self) -> Optional[Tuple[int, int]]:
+        """Identity of the saved file; every save replaces it with a new inode"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _read_saved(self) -> Optional[Dict]:
+        """Contents of the saved file, or None if missing or of another dimension"""
+        if not os.path.exists(self.path):
+            return None
+        with np.load(self.path, allow_pickle=True) as data:
+            matrix = data['matrix']
+            if matrix.shape[1:] != (self.dim,):
+                print(f"[SimilarityIndex] Ignoring saved index with dimension {matrix.shape[1:]}")
+                return None
+            user_ids = [str(u) for u in data['user_ids']]
+            # Files saved before versions were recorded count as older than any change
+            return {
+                'user_ids': user_ids,
+                'texts': [str(t) for t in data['texts']],
+                'matrix': matrix,
+                'versions': [int(v) for v in data['versions']] if 'versions' in data else [0] * len(user_ids),
+                'removed': (dict(zip((str(u) for u in data['removed_ids']), (int(v) for v in data['removed_versions'])))
+                            if 'removed_ids' in data else {}),
+            }
+
+    def _local_version(self, user_id: str) -> int:
+        return max(self._version_of.get(user_id, -1), self._removed.get(user_id, -1))
+
+    def _merge_newer_save(self):
+        """Apply the upserts and removals of another process's save that are newer than ours"""
+        version = self._file_version()
+        if version is None or version == self._saved_version:
+            return
+        saved = self._read_saved()
+        if saved is None:
+            return
+        keep = [k for k, (user_id, saved_version) in enumerate(zip(saved['user_ids'], saved['versions']))
+                if saved_version > self._local_version(user_id)]
+        if keep:
+            self.upsert([saved['user_ids'][k] for k in keep], [saved['texts'][k] for k in keep],
+                        saved['matrix'][keep], [saved['versions'][k] for k in keep])
+        for user_id, removed_version in saved['removed'].items():
+            if removed_version > self._local_version(user_id):
+                self.remove([user_id], removed_version)
+
+    def load(self) -> bool:
+        """Load a saved index (the HNSW graph is rebuilt lazily); returns False if none exists"""
+        if not self.path:
+            return False
+        with self._lock:
+            version = self._file_version()
+            saved = self._read_saved()
+            if saved is None:
+                return False
+            self.upsert(saved['user_ids'], saved['texts'], saved['matrix'], saved['versions'])
+            self._removed.update(saved['removed'])
+            self._saved_version = version
+            self._dirty = False
+        return True
+
+    def get_stats(self) -> Dict:
+        return {'mode': self.mode, 'users': self._size, 'dim': self.dim, 'path': self.path, **self.stats}
+
+
+_indexes: Dict[str, UserSimilarityIndex] = {}
+_index_lock = threading.Lock()
+_flusher: Optional[threading.Thread] = None
+
+
+def index_path(space: str) -> str:
+    """Saved index file for an embedding space ('' when saving is disabled)"""
+    if not SIMILARITY_INDEX_DIR:
+        return ''
+    return str(Path(SIMILARITY_INDEX_DIR) / f"{re.sub(r'[^a-zA-Z0-9_.-]', '_', space)}.users.npz")
+
+
+def get_similarity_index(dim: int, space: str) -> UserSimilarityIndex:
+    """
+    Get the process-wide user similarity index for an embedding space, loading the saved copy on first use
+
+    Args:
+        dim: Embedding dimension
+        space: Model plus backend (model_registry.embedding_space()); each space has its own index
+    """
+    with _index_lock:
+        index = _indexes.get(space)
+        if index is None:
+            index = _indexes[space] = UserSimilarityIndex(dim, path=index_path(space))
+            if index.load():
+                print(f"[SimilarityIndex] Loaded {len(index)} users from {index.path}")
+            _start_flusher()
+        return index
+
+
+def save_indexes():
+    """Save every index that changed since its last save"""
+    for index in list(_indexes.values()):
+        try:
+            index.save()
+        except Exception as e:
+            print(f"[SimilarityIndex] Could not save {index.path}: {e}")
+
+
+def _start_flusher():
+    # Saves happen here rather than on the ranking path; the caller holds _index_lock
+    global _flusher
+    if _flusher is not None or SIMILARITY_INDEX_SAVE_INTERVAL <= 0:
+        return
+
+    def run():
+        while True:
+            time.sleep(SIMILARITY_INDEX_SAVE_INTERVAL)
+            save_indexes()
+
+    _flusher = threading.Thread(target=run, name='similarity-index-flush', daemon=True)
+    _flusher.start()
+
+
+atexit.register(save_indexes)
+
+
+def use_directory(directory: str):
+    """Save and load indexes under `directory` from now on ('' disables saving), e.g. for benchmarks"""
+    global SIMILARITY_INDEX_DIR
+    with _index_lock:
+        SIMILARITY_INDEX_DIR = directory
+        indexes = list(_indexes.values())
+        _indexes.clear()
+    for index in indexes:
+        index.save()
+
+
+def remove_user(user_id) -> None:
+    """Drop a user from the indexes (e.g. when they leave a workspace)"""
+    for index in list(_indexes.values()):
+        index.remove([str(user_id)])
+
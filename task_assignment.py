@@ -1,14 +1,22 @@
-import json
 import random
 import threading
-import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-from server.database_utils import db_operation, expire_old_tasks, sanitize_column_name
-# from sentiment_analysis import get_entity_analyzer  # COMMENTED OUT - Using proximity only
-from task_config import (AREA_QUESTION_TEXT, ASSIGNMENT_HOURS,
-                         ENABLE_DEBUG_LOGS, MAX_TASKS_PER_DAY, PROXIMITY_BONUS,
+from anchor_answers import anchor_answer_cache
+from area_coverage import counter_upsert, ensure_coverage_table, workspace_source
+from server.database_utils import db_claim_rows, db_operation
+# from model_registry import get_analyzer  # COMMENTED OUT - Using proximity only (ML_ANALYZER_MODE picks local or remote)
+from task_config import (ASSIGNMENT_CLAIM_BATCH_SIZE, ASSIGNMENT_MODE,
+                         ASSIGNMENT_WORKERS, ENABLE_DEBUG_LOGS,
+                         MAX_TASKS_PER_DAY, PROXIMITY_BONUS, TASKS_TABLE,
                          TASKS_PER_PERSON_PER_ASSIGNMENT, USER_ROLE)
+from task_proximity import area_user_distances, candidate_users, load_user_locations, solve_area_assignment
+from task_store import ensure_tasks_table, existing_workspace_tables, mirror_assignments, sync_workspace_tables
+
+# Column of the tasks table holding the task's area
+AREA_COLUMN = 'area'
 
 
 def has_unassigned_tasks():
@@ -16,16 +24,12 @@ def has_unassigned_tasks():
     Check if there are any unassigned tasks available.
     Returns True if there are unassigned tasks, False otherwise.
     """
-    workspaces = db_operation('SELECT * FROM workspaces', fetch_all=True) or []
-    total_unassigned = 0
-
-    for ws in workspaces:
-        ws_id = ws['id']
-        table_name = f"workspace_{ws_id}_responses"
-        unassigned = db_operation(f'SELECT COUNT(*) as cnt FROM {table_name} WHERE user_id IS NULL AND time_task_assigned IS NULL', fetch_one=True)
-        if unassigned:
-            total_unassigned += unassigned['cnt']
-    return total_unassigned > 0
+    unassigned = db_operation(f'''
+        SELECT 1 AS found FROM {TASKS_TABLE}
+        WHERE user_id IS NULL AND time_task_assigned IS NULL
+        LIMIT 1
+    ''', fetch_one=True)
+    return bool(unassigned)
 
 
 def has_eligible_users():
@@ -46,134 +50,325 @@ def should_assign_tasks():
     Check if task assignment should run.
     Returns True if conditions are met, False otherwise.
     """
+    # Tasks the external app created in the workspace tables count as unassigned too
+    if ensure_tasks_table():
+        sync_workspace_tables()
     return has_unassigned_tasks() and has_eligible_users()
 
 
-def assign_tasks_to_users():
-    """
-    Assigns unassigned tasks to eligible users.
-    This runs multiple times per day at scheduled hours.
-    """
-    print("[TaskAssignment] Starting task assignment...")
+def _today_bounds():
+    """Start of today and start of tomorrow, for index-friendly range filters on time_task_assigned"""
+    today_start = datetime.combine(datetime.now().date(), datetime.min.time())
+    return today_start, today_start + timedelta(days=1)
 
-    # 1. For each workspace
-    workspaces = db_operation('SELECT * FROM workspaces', fetch_all=True) or []
-    print(f"[TaskAssignment] Found {len(workspaces)} workspaces")
-
-    total_tasks_assigned = 0
-
-    for ws in workspaces:
-        ws_id = ws['id']
-        questions = ws.get('questions')
-        if isinstance(questions, str):
-            try:
-                questions = json.loads(questions)
-            except Exception:
-                questions = []
-        table_name = f"workspace_{ws_id}_responses"
-
-        # Find the area question and its column name
-        area_question = next((q for q in (questions or []) if q.get('text') == AREA_QUESTION_TEXT), None)
-        if not area_question:
-            continue
-        area_col = sanitize_column_name(area_question['text'])
 
-        print(f"[TaskAssignment] Processing workspace {ws_id} using proximity-based assignment")
+def _load_tasks_assigned_today(workspace_id=None):
+    """
+    Today's per-user assignment counts, per workspace, in one GROUP BY query
 
-        if ENABLE_DEBUG_LOGS:
-            print(f"[TaskAssignment] Workspace {ws_id}: Area column = '{area_col}'")
+    Args:
+        workspace_id: Only count this workspace (all workspaces if None)
 
-        # 2. Get unassigned tasks for this workspace
-        unassigned_query = f'''
-            SELECT * FROM {table_name}
-            WHERE user_id IS NULL AND time_task_assigned IS NULL
-            ORDER BY time_task_created ASC
-        '''
-        unassigned_tasks = db_operation(unassigned_query, fetch_all=True) or []
+    Returns:
+        workspace_id -> Counter of tasks assigned today per user
+    """
+    today_start, tomorrow_start = _today_bounds()
+    params = [today_start, tomorrow_start]
+    workspace_filter = ''
+    if workspace_id is not None:
+        workspace_filter = 'AND workspace_id = %s'
+        params.append(str(workspace_id))
+    rows = db_operation(f'''
+        SELECT workspace_id, user_id, COUNT(*) as cnt FROM {TASKS_TABLE}
+        WHERE time_task_assigned >= %s AND time_task_assigned < %s AND user_id IS NOT NULL {workspace_filter}
+        GROUP BY workspace_id, user_id
+    ''', params, fetch_all=True) or []
+    counts = {}
+    for row in rows:
+        counts.setdefault(row['workspace_id'], Counter())[row['user_id']] += row['cnt']
+    return counts
+
+
+def _proximity_score(user, task):
+    """Score how well a user fits a task (higher is better)"""
+    # Base score (random for now, can be replaced with actual proximity calculation)
+    base_score = random.uniform(0.1, 1.0)
+
+    # Add proximity bonus (placeholder - would use actual GPS distance)
+    return base_score + (PROXIMITY_BONUS * 0.1)  # Small bonus for now
+
+
+def plan_assignments(tasks, eligible_users, area_col, tasks_today, assigned_this_run):
+    """
+    Choose a user for each task without touching the database
 
-        if not unassigned_tasks:
-            print(f"[TaskAssignment] No unassigned tasks for workspace {ws_id}")
-            continue
+    Args:
+        tasks: Unassigned task rows (oldest first)
+        eligible_users: Active user rows
+        area_col: Column holding the task's area
+        tasks_today: Counter of tasks assigned today per user (updated in place)
+        assigned_this_run: Counter of tasks assigned in this run per user (updated in place)
 
-        print(f"[TaskAssignment] Found {len(unassigned_tasks)} unassigned tasks for workspace {ws_id}")
+    Returns:
+        List of (task_id, user_id, score)
+    """
+    assignments = []
+    for task in tasks:
+        task_id = task['task_id']
+        if not task.get(area_col, ''):
+            print(f"[TaskAssignment] Task {task_id} missing area, skipping")
+            continue
 
-        # 3. Get eligible users
-        eligible_users_query = '''
-            SELECT * FROM users_updated
-            WHERE role = %s AND status = 'active'
-            ORDER BY created_at ASC
-        '''
-        eligible_users = db_operation(eligible_users_query, [USER_ROLE], fetch_all=True) or []
+        best = None
+        for user in eligible_users:
+            user_id = user['id']
+            # Skip users at their daily limit or at the per-run limit
+            if tasks_today[user_id] >= MAX_TASKS_PER_DAY:
+                continue
+            if assigned_this_run[user_id] >= TASKS_PER_PERSON_PER_ASSIGNMENT:
+                continue
+            score = _proximity_score(user, task)
+            if best is None or score > best[1]:
+                best = (user_id, score)
 
-        if not eligible_users:
-            print(f"[TaskAssignment] No eligible users found")
+        if best is None:
+            print(f"[TaskAssignment] No eligible users for task {task_id} (all users at their limits)")
             continue
 
-        print(f"[TaskAssignment] Found {len(eligible_users)} eligible users")
+        best_user_id, best_score = best
+        if ENABLE_DEBUG_LOGS:
+            print(f"[TaskAssignment] Task {task_id} -> user {best_user_id} with proximity score {best_score:.3f} "
+                  f"(tasks today: {tasks_today[best_user_id]})")
+        tasks_today[best_user_id] += 1
+        assigned_this_run[best_user_id] += 1
+        assignments.append((task_id, best_user_id, best_score))
 
-        # 4. For each unassigned task, find the best user using proximity-based assignment
-        for task in unassigned_tasks:
-            task_id = task['task_id']
-            task_area = task.get(area_col, '')
+    return assignments
 
-            if not task_area:
-                print(f"[TaskAssignment] Task {task_id} missing area, skipping")
-                continue
 
-            # Simple proximity-based assignment:
-            # For now, we'll use random assignment with a proximity bonus concept
-            # TODO: Implement actual GPS-based proximity when user locations are available
+def plan_assignments_gps(tasks, eligible_users, area_col, tasks_today, assigned_this_run, user_locations):
+    """
+    Distance-based version of plan_assignments: minimum total travel distance
 
-            # Get users who haven't done too many tasks today
-            user_scores = []
-            for user in eligible_users:
-                user_id = user['id']
+    Builds a haversine matrix between the task areas' centroids and users' latest
+    positions and solves it as a capacity-constrained min-cost assignment, where each
+    user's capacity is what is left of their per-run and daily limits. Only each area's
+    nearest users from the location index are considered (see candidate_users). Tasks
+    are prioritized oldest first when there is not enough capacity for all of them.
 
-                # Count how many tasks this user has been assigned today
-                today = datetime.now().date()
-                task_count_query = f'''
-                    SELECT COUNT(*) as cnt FROM {table_name}
-                    WHERE user_id = %s AND DATE(time_task_assigned) = %s
-                '''
-                task_count = db_operation(task_count_query, [user_id, today], fetch_one=True)
-                tasks_today = task_count['cnt'] if task_count else 0
+    Returns:
+        List of (task_id, user_id, distance in meters)
+    """
+    tasks = [task for task in tasks if task.get(area_col, '')]
+    users = [user for user in eligible_users
+             if tasks_today[user['id']] < MAX_TASKS_PER_DAY
+             and assigned_this_run[user['id']] < TASKS_PER_PERSON_PER_ASSIGNMENT]
+    if not tasks or not users:
+        return []
+
+    user_ids = [user['id'] for user in users]
+    capacity = [
+        min(TASKS_PER_PERSON_PER_ASSIGNMENT - assigned_this_run[user_id], MAX_TASKS_PER_DAY - tasks_today[user_id])
+        for user_id in user_ids
+    ]
+    areas = sorted({task[area_col] for task in tasks})
+    area_index = {area: i for i, area in enumerate(areas)}
+    task_areas = [area_index[task[area_col]] for task in tasks]
+    area_task_counts = Counter(task_areas)
+    kept = candidate_users(areas, [area_task_counts[i] for i in range(len(areas))], user_ids, capacity)
+    user_ids = [user_ids[i] for i in kept]
+    capacity = [capacity[i] for i in kept]
+    distances = area_user_distances(areas, user_ids, user_locations)
+
+    assignments = []
+    for task, area, user_index in zip(tasks, task_areas, solve_area_assignment(distances, task_areas, capacity)):
+        if user_index < 0:
+            continue
+        task_id, user_id = task['task_id'], user_ids[user_index]
+        distance = float(distances[area, user_index])
+        if ENABLE_DEBUG_LOGS:
+            print(f"[TaskAssignment] Task {task_id} -> user {user_id} ({distance:.0f} m, tasks today: {tasks_today[user_id]})")
+        tasks_today[user_id] += 1
+        assigned_this_run[user_id] += 1
+        assignments.append((task_id, user_id, distance))
 
-                # Skip users who have reached their daily limit
-                if tasks_today >= MAX_TASKS_PER_DAY:
-                    continue
+    unassigned = len(tasks) - len(assignments)
+    if unassigned:
+        print(f"[TaskAssignment] {unassigned} tasks left unassigned (all users at their limits)")
+    return assignments
 
-                # Base score (random for now, can be replaced with actual proximity calculation)
-                base_score = random.uniform(0.1, 1.0)
 
-                # Add proximity bonus (placeholder - would use actual GPS distance)
-                proximity_score = base_score + (PROXIMITY_BONUS * 0.1)  # Small bonus for now
+def _has_capacity(eligible_users, tasks_today, assigned_this_run, plan_lock):
+    """Whether any eligible user can still take a task in this run"""
+    with plan_lock:
+        return any(tasks_today[user['id']] < MAX_TASKS_PER_DAY
+                   and assigned_this_run[user['id']] < TASKS_PER_PERSON_PER_ASSIGNMENT
+                   for user in eligible_users)
 
-                user_scores.append((user_id, proximity_score, tasks_today))
 
-            if not user_scores:
-                print(f"[TaskAssignment] No eligible users for task {task_id} (all users at daily limit)")
-                continue
+def _assign_workspace(ws_id, eligible_users, user_locations,
+                      tasks_today, workspace_counts, assigned_this_run, plan_lock, workspace_tables=None):
+    """
+    Assign one workspace's unassigned tasks, claiming them in batches
+
+    Each batch of the oldest unassigned tasks is locked with FOR UPDATE SKIP LOCKED,
+    planned and written in one transaction, so other threads or server instances skip
+    those rows instead of assigning them twice. The area coverage counters are updated
+    in the same transaction, as is the workspace table while SYNC_WORKSPACE_TABLES is on.
+    Today's counts for the workspace are re-read at every batch, and the shared per-user
+    counters are only touched under plan_lock.
+
+    Args:
+        tasks_today: Per-user counts of tasks assigned today, over all workspaces
+        workspace_counts: This workspace's share of tasks_today
+        workspace_tables: Result of existing_workspace_tables(), to save a lookup per batch
+
+    Returns:
+        Number of tasks assigned
+    """
+    print(f"[TaskAssignment] Processing workspace {ws_id} using {ASSIGNMENT_MODE} assignment")
 
-            # Sort by score (highest first)
-            user_scores.sort(key=lambda x: x[1], reverse=True)
-            best_user_id, best_score, tasks_today = user_scores[0]
+    total_assigned = 0
+    last_claimed = None
+    while True:
+        # Keyset pagination past rows this run already looked at (e.g. tasks without an area)
+        after = ''
+        params = [str(ws_id)]
+        if last_claimed:
+            after = 'AND (time_task_created > %s OR (time_task_created = %s AND task_id > %s))'
+            params += [last_claimed['time_task_created'], last_claimed['time_task_created'], last_claimed['task_id']]
+        claim_query = f'''
+            SELECT * FROM {TASKS_TABLE}
+            WHERE user_id IS NULL AND time_task_assigned IS NULL AND workspace_id = %s {after}
+            ORDER BY time_task_created ASC, task_id ASC
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        '''
+        assignments = []
+
+        def plan(tasks):
+            committed = _load_tasks_assigned_today(ws_id).get(str(ws_id), Counter())
+            with plan_lock:
+                # Pick up assignments other instances committed to this workspace since the last batch
+                tasks_today.subtract(workspace_counts)
+                tasks_today.update(committed)
+                workspace_counts.clear()
+                workspace_counts.update(committed)
+                if ASSIGNMENT_MODE == 'gps':
+                    assignments.extend(plan_assignments_gps(tasks, eligible_users, AREA_COLUMN,
+                                                            tasks_today, assigned_this_run, user_locations))
+                else:
+                    assignments.extend(plan_assignments(tasks, eligible_users, AREA_COLUMN,
+                                                        tasks_today, assigned_this_run))
+                for _, user_id, _ in assignments:
+                    workspace_counts[user_id] += 1
+            # Each assigned task moves from unassigned (its creation day) to a visit today
+            claimed_tasks = {task['task_id']: task for task in tasks}
+            now = datetime.now()
+            coverage = []
+            for task_id, _, _ in assignments:
+                task = claimed_tasks[task_id]
+                coverage.append((task.get(AREA_COLUMN), task['time_task_created'], {'unassigned': -1}))
+                coverage.append((task.get(AREA_COLUMN), now, {'visits': 1}))
+            # The IS NULL guard also covers writers that do not lock the rows
+            return [(f'''
+                UPDATE {TASKS_TABLE}
+                SET user_id = %s, time_task_assigned = %s, task_status = 'assigned'
+                WHERE workspace_id = %s AND task_id = %s AND user_id IS NULL
+            ''', [(user_id, now, str(ws_id), task_id) for task_id, user_id, _ in assignments]),
+                counter_upsert(workspace_source(ws_id), coverage),
+                mirror_assignments(ws_id, [(user_id, now, task_id) for task_id, user_id, _ in assignments],
+                                   workspace_tables)]
+
+        claimed, affected = db_claim_rows(claim_query, params + [ASSIGNMENT_CLAIM_BATCH_SIZE], plan)
+        if affected is False:
+            print(f"[TaskAssignment] Failed to write {len(assignments)} assignments for workspace {ws_id}")
+            with plan_lock:
+                for _, user_id, _ in assignments:
+                    tasks_today[user_id] -= 1
+                    workspace_counts[user_id] -= 1
+                    assigned_this_run[user_id] -= 1
+            break
+
+        if claimed:
+            print(f"[TaskAssignment] Workspace {ws_id}: claimed {len(claimed)} tasks, assigned {len(assignments)}")
+        total_assigned += len(assignments)
+        # Stop at the last batch, or once every user is at their limit
+        if len(claimed) < ASSIGNMENT_CLAIM_BATCH_SIZE or not _has_capacity(eligible_users, tasks_today,
+                                                                           assigned_this_run, plan_lock):
+            break
+        last_claimed = claimed[-1]
+
+    return total_assigned
 
-            if ENABLE_DEBUG_LOGS:
-                print(f"[TaskAssignment] Task {task_id} assigned to user {best_user_id} with proximity score {best_score:.3f} (tasks today: {tasks_today})")
 
-            # Update the task assignment
-            assignment_query = f'''
-                UPDATE {table_name}
-                SET user_id = %s, time_task_assigned = NOW(), task_status = 'assigned'
-                WHERE task_id = %s
-            '''
-            update_result = db_operation(assignment_query, [best_user_id, task_id])
+def assign_tasks_to_users():
+    """
+    Assigns unassigned tasks to eligible users.
+    This runs multiple times per day at scheduled hours.
 
-            if update_result:
-                total_tasks_assigned += 1
-                print(f"[TaskAssignment] Successfully assigned task {task_id} to user {best_user_id}")
-            else:
-                print(f"[TaskAssignment] Failed to assign task {task_id} to user {best_user_id}")
+    Workspaces are processed in parallel on ASSIGNMENT_WORKERS threads, each claiming
+    its tasks in batches of ASSIGNMENT_CLAIM_BATCH_SIZE with SELECT ... FOR UPDATE
+    SKIP LOCKED, so several server instances can run assignment at once without
+    assigning a task twice. Per-user counts are tracked in memory across workspaces,
+    so MAX_TASKS_PER_DAY and TASKS_PER_PERSON_PER_ASSIGNMENT hold across the run;
+    assignments committed by other instances are counted from the next batch on.
+    """
+    print("[TaskAssignment] Starting task assignment...")
+    if not ensure_tasks_table() or not ensure_coverage_table():
+        print("[TaskAssignment] Could not create the tasks or area coverage table")
+        return 0
+    sync_workspace_tables()
+
+    # Only workspaces that have unassigned tasks (a scan of the queue index's prefix)
+    workspace_rows = db_operation(f'''
+        SELECT DISTINCT workspace_id FROM {TASKS_TABLE}
+        WHERE user_id IS NULL AND time_task_assigned IS NULL
+    ''', fetch_all=True) or []
+    workspace_ids = [row['workspace_id'] for row in workspace_rows]
+    print(f"[TaskAssignment] Found {len(workspace_ids)} workspaces with unassigned tasks")
+    if not workspace_ids:
+        return 0
+
+    # Eligible users are the same for every workspace
+    eligible_users_query = '''
+        SELECT * FROM users_updated
+        WHERE role = %s AND status = 'active'
+        ORDER BY created_at ASC
+    '''
+    eligible_users = db_operation(eligible_users_query, [USER_ROLE], fetch_all=True) or []
+    if not eligible_users:
+        print("[TaskAssignment] No eligible users found")
+        return 0
+    print(f"[TaskAssignment] Found {len(eligible_users)} eligible users")
+
+    user_locations = {}
+    if ASSIGNMENT_MODE == 'gps':
+        user_locations = load_user_locations([user['id'] for user in eligible_users])
+        print(f"[TaskAssignment] Found recent locations for {len(user_locations)} users")
+
+    # Today's counts over every workspace, so each worker sees the full per-user totals
+    workspace_counts = _load_tasks_assigned_today()
+    tasks_today = Counter()
+    for counts in workspace_counts.values():
+        tasks_today.update(counts)
+    for ws_id in workspace_ids:
+        workspace_counts.setdefault(ws_id, Counter())
+    assigned_this_run = Counter()
+    plan_lock = threading.Lock()
+    workspace_tables = existing_workspace_tables()
+
+    def run(ws_id):
+        try:
+            return _assign_workspace(ws_id, eligible_users, user_locations,
+                                     tasks_today, workspace_counts[ws_id], assigned_this_run, plan_lock,
+                                     workspace_tables)
+        except Exception as e:
+            print(f"[TaskAssignment] Error assigning tasks for workspace {ws_id}: {e}")
+            return 0
+
+    with ThreadPoolExecutor(max_workers=max(1, min(ASSIGNMENT_WORKERS, len(workspace_ids)))) as pool:
+        total_tasks_assigned = sum(pool.map(run, workspace_ids))
 
     print(f"[TaskAssignment] Task assignment completed. Total tasks assigned: {total_tasks_assigned}")
     return total_tasks_assigned
@@ -183,80 +378,23 @@ def _get_user_anchor_answer(user_id: str, workspace_id: str) -> str:
     """
     Get user's anchor answer (welcome question response) for a specific workspace.
     This is stored when the user joins the workspace.
-    """
-    try:
-        # Get user's workspaces and anchor answers
-        user_query = 'SELECT workspaces, anchor_answers FROM users_updated WHERE id = %s'
-        user_result = db_operation(user_query, [user_id], fetch_one=True)
-
-        if not user_result:
-            return ""
-
-        # Parse workspaces and anchor answers
-        workspaces = []
-        anchor_answers = {}
-
-        if user_result.get('workspaces'):
-            try:
-                if isinstance(user_result['workspaces'], str):
-                    workspaces = json.loads(user_result['workspaces'])
-                else:
-                    workspaces = user_result['workspaces']
-            except Exception:
-                workspaces = []
-
-        if user_result.get('anchor_answers'):
-            try:
-                if isinstance(user_result['anchor_answers'], str):
-                    anchor_answers = json.loads(user_result['anchor_answers'])
-                else:
-                    anchor_answers = user_result['anchor_answers']
-            except Exception:
-                anchor_answers = {}
-
-        # Check if user has joined this workspace and has an anchor answer
-        if workspace_id in workspaces and workspace_id in anchor_answers:
-            return anchor_answers[workspace_id]
 
-        return ""
-
-    except Exception as e:
-        print(f"[TaskAssignment] Error getting user anchor answer: {e}")
-        return ""
+    Served from the shared anchor answer cache; to rank many users, fetch the whole
+    workspace at once with anchor_answer_cache.workspace_answers instead.
+    """
+    return anchor_answer_cache.user_answer(user_id, workspace_id)
 
 
 def run_task_assignment_scheduler():
     """
     Run the task assignment scheduler.
-    This function runs continuously and assigns tasks at scheduled hours.
+    Assignment runs at ASSIGNMENT_HOURS (and on demand, e.g. right after task creation)
+    from the shared job scheduler in task_scheduler.py; this blocks while it runs.
     """
-    print("[TaskAssignment] Starting task assignment scheduler...")
-
-    while True:
-        try:
-            current_time = datetime.now()
-            current_hour = current_time.hour
-
-            # Check if it's time to assign tasks
-            if current_hour in ASSIGNMENT_HOURS:
-                print(f"[TaskAssignment] It's {current_hour}:00, checking for task assignment...")
-
-                if should_assign_tasks():
-                    print("[TaskAssignment] Conditions met, starting task assignment...")
-                    assigned_count = assign_tasks_to_users()
-                    print(f"[TaskAssignment] Task assignment completed. Assigned {assigned_count} tasks.")
-                else:
-                    print("[TaskAssignment] Conditions not met, skipping task assignment.")
+    from task_scheduler import start_scheduler
 
-                # Wait until next hour to avoid multiple assignments
-                time.sleep(3600)  # Wait 1 hour
-            else:
-                # Wait 5 minutes before checking again
-                time.sleep(300)
-
-        except Exception as e:
-            print(f"[TaskAssignment] Error in task assignment scheduler: {e}")
-            time.sleep(300)  # Wait 5 minutes before retrying
+    print("[TaskAssignment] Starting task assignment scheduler...")
+    start_scheduler().join()
 
 
 if __name__ == "__main__":
@@ -6,12 +6,47 @@ ASSIGNMENT_HOURS = [9, 10, 11]
 TASKS_PER_PERSON_PER_ASSIGNMENT = 1
 MAX_TASKS_PER_DAY = 3
 
+# Workspaces assigned in parallel, and tasks claimed per transaction (SELECT ... FOR UPDATE SKIP LOCKED)
+ASSIGNMENT_WORKERS = 4
+ASSIGNMENT_CLAIM_BATCH_SIZE = 200
+
 PROXIMITY_BONUS = 5
 
 MAX_AREAS_TO_CREATE_TASKS_FOR = 5
+# Read area visit counts from the area_coverage counters (area_coverage.py) instead of scanning responses
+USE_AREA_COVERAGE_COUNTERS = True
 TASK_EXPIRY_HOURS = 24
+# Cron schedule of the task_expiry job (task_scheduler.py)
+TASK_EXPIRY_SCHEDULE = '30 * * * *'
+# Rows expired per UPDATE, to keep row locks short
+TASK_EXPIRY_CHUNK_SIZE = 1000
+# Tasks of every workspace live in one table (task_store.py); > 0 partitions it by workspace_id
+TASKS_TABLE = 'tasks'
+TASKS_TABLE_PARTITIONS = 0
+# Keep the workspace_{id}_responses tables and the tasks table in sync while the external app
+# still uses the workspace tables; set to False once it reads and writes the tasks table
+SYNC_WORKSPACE_TABLES = True
+# Daily task creation runs under a database lease (leases.py) so only one node creates each day's tasks
+LEASE_TABLE = 'task_leases'
+TASK_CREATION_LEASE_SECONDS = 1800
 
 USER_ROLE = 'user'
+# Seconds before the cached anchor answers of eligible users are reloaded in full
+ANCHOR_ANSWER_CACHE_TTL = 300
 AREA_QUESTION_TEXT = 'Which general area on campus are you reporting from?'
 
 ENABLE_DEBUG_LOGS = True
+
+# 'gps' matches tasks to the nearest users (lexi latitude/longitude); 'random' keeps the old placeholder scoring
+ASSIGNMENT_MODE = 'gps'
+LOCATION_LOOKBACK_DAYS = 7
+UNKNOWN_LOCATION_DISTANCE_M = 5000
+# Cell size of the in-memory user location grid (location_index.py)
+LOCATION_GRID_CELL_M = 200
+# Nearest users per task kept as candidates for an area before the assignment solve
+CANDIDATE_USERS_PER_TASK = 4
+
+# Job scheduler (task_scheduler.py)
+ASSIGN_AFTER_TASK_CREATION = True  # Assign new tasks right away instead of at the next ASSIGNMENT_HOURS
+SCHEDULER_CATCH_UP_HOURS = 6  # Missed runs older than this are skipped rather than caught up
+SCHEDULER_STATE_FILE = 'scheduler_state.json'
@@ -1,96 +1,107 @@
 import json
-import os
 import random
-import threading
-import time
 import uuid
 from datetime import datetime, timedelta
 
-from server.database_utils import db_operation, sanitize_column_name
+from area_coverage import area_totals, counter_upsert, ensure_coverage_table, workspace_source
+from leases import get_lease, prune_leases
+from server.database_utils import db_operation, db_transaction
 from task_config import (AREA_QUESTION_TEXT, ENABLE_DEBUG_LOGS,
                          MAX_AREAS_TO_CREATE_TASKS_FOR, TASK_CREATION_HOUR,
-                         TASK_CREATION_MINUTE, TASKS_PER_AREA)
+                         TASK_CREATION_LEASE_SECONDS, TASK_CREATION_MINUTE,
+                         TASKS_PER_AREA, TASKS_TABLE, USE_AREA_COVERAGE_COUNTERS)
+from task_store import ensure_tasks_table, existing_workspace_tables, mirror_new_tasks, sync_workspace_tables
 
 
+def _creation_lease(current_date):
+    # One lease per day: whichever node completes it first owns that day's task creation
+    return get_lease(f"task_creation:{current_date}", TASK_CREATION_LEASE_SECONDS)
+
 def tasks_already_created_today():
     """
     Check if tasks were already created today.
     Returns True if tasks were created today, False otherwise.
     """
-    lock_file = "task_creation.lock"
-    current_date = datetime.now().date()
+    return _creation_lease(datetime.now().date()).is_completed()
 
-    if os.path.exists(lock_file):
-        try:
-            with open(lock_file, 'r') as f:
-                lock_date = f.read().strip()
-                if lock_date == str(current_date):
-                    return True
-                elif lock_date != str(current_date):
-                    # Clean up old lock file
-                    print(f"[TaskCreation] Cleaning up old lock file from {lock_date}")
-                    os.remove(lock_file)
-        except:
-            pass
+def _load_area_counts(ws_id, area_options):
+    """
+    area -> (visits, unassigned tasks) for a workspace's area options, in one grouped query
 
-    return False
+    Visits are rows with a user; unassigned tasks are rows without one. With
+    USE_AREA_COVERAGE_COUNTERS they come from the area_coverage counters instead of
+    the tasks table. Areas with no rows are missing from the result.
+    """
+    if not area_options:
+        return {}
+    if USE_AREA_COVERAGE_COUNTERS:
+        totals = area_totals(workspace_source(ws_id), list(area_options))
+        return {area: (counts['visits'], counts['unassigned']) for area, counts in totals.items()}
+    placeholders = ', '.join(['%s'] * len(area_options))
+    rows = db_operation(f'''
+        SELECT area,
+               SUM(user_id IS NOT NULL) AS visits,
+               SUM(user_id IS NULL) AS unassigned
+        FROM {TASKS_TABLE}
+        WHERE workspace_id = %s AND area IN ({placeholders})
+        GROUP BY area
+    ''', [str(ws_id)] + list(area_options), fetch_all=True) or []
+    return {row['area']: (int(row['visits'] or 0), int(row['unassigned'] or 0)) for row in rows}
 
 def create_daily_task_pool():
     """
     Creates a daily pool of unassigned tasks for each workspace.
-    This runs once per day.
+    This runs once per day, on whichever scheduler node takes the day's lease first.
+
+    Returns:
+        Number of tasks created
     """
-    # Use a lock file to prevent multiple instances
-    lock_file = "task_creation.lock"
-    current_date = datetime.now().date()
+    if not ensure_tasks_table() or not ensure_coverage_table():
+        print("[TaskCreation] Could not create the tasks or area coverage table, skipping creation")
+        return 0
 
-    # Check if lock file exists and is from today
-    if os.path.exists(lock_file):
-        try:
-            with open(lock_file, 'r') as f:
-                lock_date = f.read().strip()
-                if lock_date == str(current_date):
-                    print(f"[TaskCreation] Task creation already completed today ({current_date}), skipping...")
-                    return
-                elif lock_date != str(current_date):
-                    # Clean up old lock file
-                    print(f"[TaskCreation] Cleaning up old lock file from {lock_date}")
-                    os.remove(lock_file)
-        except:
-            pass
+    # A database lease makes sure exactly one node creates each day's tasks
+    current_date = datetime.now().date()
+    lease = _creation_lease(current_date)
+    if not lease.acquire():
+        holder = lease.current() or {}
+        if holder.get('completed_at'):
+            print(f"[TaskCreation] Task creation already completed today ({current_date}) by {holder.get('holder')}, skipping...")
+        else:
+            print(f"[TaskCreation] Task creation for {current_date} is running on {holder.get('holder', 'another node')}, skipping...")
+        return 0
 
-    # Create lock file immediately to prevent race conditions
     try:
-        with open(lock_file, 'w') as f:
-            f.write(str(current_date))
-    except:
-        print("[TaskCreation] Warning: Could not create lock file")
-        return  # Don't proceed if we can't create the lock
-
+        created = _create_tasks(current_date)
+    except Exception:
+        # Let another node (or the next catch-up run) retry the day
+        lease.release()
+        raise
+    lease.complete()
+    prune_leases('task_creation:')
+    return created
+
+def _create_tasks(current_date):
+    """Create the day's tasks; the caller holds the day's creation lease"""
     print("[TaskCreation] Starting daily task creation...")
+    # Tasks and visits the external app wrote to the workspace tables count towards today's choice
+    sync_workspace_tables()
 
     # Check if tasks were already created today before proceeding
-    workspaces = db_operation('SELECT * FROM workspaces', fetch_all=True) or []
-    tasks_created_today = 0
-
-    for ws in workspaces:
-        ws_id = ws['id']
-        table_name = f"workspace_{ws_id}_responses"
-        today_tasks = db_operation(f'SELECT COUNT(*) as cnt FROM {table_name} WHERE DATE(time_task_created)=%s', [current_date], fetch_one=True)
-        if today_tasks:
-            tasks_created_today += today_tasks['cnt']
+    day_start = datetime.combine(current_date, datetime.min.time())
+    today_tasks = db_operation(f'''
+        SELECT COUNT(*) as cnt FROM {TASKS_TABLE}
+        WHERE time_task_created >= %s AND time_task_created < %s
+    ''', [day_start, day_start + timedelta(days=1)], fetch_one=True)
+    tasks_created_today = today_tasks['cnt'] if today_tasks else 0
 
     if tasks_created_today > 0:
         print(f"[TaskCreation] Found {tasks_created_today} tasks already created today, skipping creation...")
-        # Update lock file to reflect that tasks were already created
-        try:
-            with open(lock_file, 'w') as f:
-                f.write(str(current_date))
-        except:
-            pass
-        return
+        return 0
 
+    workspaces = db_operation('SELECT * FROM workspaces', fetch_all=True) or []
     print(f"[TaskCreation] Found {len(workspaces)} workspaces")
+    workspace_tables = existing_workspace_tables()
 
     total_tasks_created = 0
 
@@ -104,21 +115,16 @@ def create_daily_task_pool():
                 questions = json.loads(questions)
             except Exception:
                 questions = []
-        table_name = f"workspace_{ws_id}_responses"
 
-        # Find the area question and its column name
+        # Find the area question and its options
         area_question = next((q for q in (questions or []) if q.get('text') == AREA_QUESTION_TEXT), None)
         if not area_question:
             continue
-        area_col = sanitize_column_name(area_question['text'])
         area_options = area_question.get('options', [])
 
-        # Count visits for each area
-        area_counts = []
-        for area in area_options:
-            visit_count = db_operation(f'SELECT COUNT(*) as cnt FROM {table_name} WHERE `{area_col}`=%s AND user_id IS NOT NULL', [area], fetch_one=True)
-            count = visit_count['cnt'] if visit_count else 0
-            area_counts.append((area, count))
+        # Visit and unassigned counts for every area in one grouped query
+        counts_by_area = _load_area_counts(ws_id, area_options)
+        area_counts = [(area, counts_by_area.get(area, (0, 0))[0]) for area in area_options]
 
         # Find the bottom areas with the least visits
         area_counts.sort(key=lambda x: x[1])
@@ -137,10 +143,10 @@ def create_daily_task_pool():
 
             print(f"[TaskCreation] Workspace {ws_id}: Creating tasks for {len(bottom_areas)} areas: {bottom_areas}")
 
+            new_tasks = []
             for area in bottom_areas:
                 # Create TASKS_PER_AREA unassigned tasks for each of the lowest areas
-                unassigned = db_operation(f'SELECT COUNT(*) as cnt FROM {table_name} WHERE `{area_col}`=%s AND user_id IS NULL', [area], fetch_one=True)
-                existing_count = unassigned['cnt'] if unassigned else 0
+                existing_count = counts_by_area.get(area, (0, 0))[1]
                 print(f"[TaskCreation] Workspace {ws_id}, Area '{area}': {existing_count} existing unassigned tasks")
 
                 # Only create tasks if we have 0 unassigned tasks (matching the attached code)
@@ -148,125 +154,54 @@ def create_daily_task_pool():
                     print(f"[TaskCreation] Creating {TASKS_PER_AREA} task(s) for area '{area}'")
                     for _ in range(TASKS_PER_AREA):
                         now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        task_id = str(uuid.uuid4())
-                        columns = [
-                            'task_id',
-                            'time_task_created',
-                            'user_id',
-                            'time_task_assigned',
-                            'time_task_responded',
-                            'time_completed',
-                            f'`{area_col}`',
-                            'latitude',
-                            'longitude',
-                            'task_status'
-                        ]
-                        values = [
-                            task_id,
+                        new_tasks.append([
+                            str(ws_id),
+                            str(uuid.uuid4()),  # task_id
                             now,
-                            None,  # user_id
-                            None,  # time_task_assigned
-                            None,  # time_task_responded
-                            None,  # time_completed
                             area,
-                            None,  # latitude
-                            None,  # longitude
                             'created'
-                        ]
-                        for q in (questions or []):
-                            if sanitize_column_name(q['text']) != area_col:
-                                columns.append(f'`{sanitize_column_name(q["text"])}`')
-                                values.append(None)
-                        placeholders = ', '.join(['%s'] * len(values))
-                        query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
-                        db_operation(query, values)
-                        total_tasks_created += 1
-                        if ENABLE_DEBUG_LOGS:
-                            print(f"[TaskCreation] Created unassigned task for workspace {ws_id} at area '{area}'")
+                        ])
+
+            if new_tasks:
+                # All of the workspace's new tasks in one round trip
+                query = f'''
+                    INSERT INTO {TASKS_TABLE} (workspace_id, task_id, time_task_created, area, task_status)
+                    VALUES (%s, %s, %s, %s, %s)
+                '''
+                # The area counters move in the same transaction as the new rows
+                coverage = counter_upsert(workspace_source(ws_id),
+                                          ((values[3], values[2], {'unassigned': 1}) for values in new_tasks))
+                created = db_transaction([(query, new_tasks), coverage,
+                                          mirror_new_tasks(ws_id, new_tasks, workspace_tables)])
+                if created is False:
+                    print(f"[TaskCreation] Failed to create {len(new_tasks)} tasks for workspace {ws_id}")
+                else:
+                    total_tasks_created += len(new_tasks)
+                    if ENABLE_DEBUG_LOGS:
+                        for values in new_tasks:
+                            print(f"[TaskCreation] Created unassigned task for workspace {ws_id} at area '{values[3]}'")
 
     print(f"[TaskCreation] Daily task creation complete at {datetime.now().strftime('%H:%M')}. Total tasks created: {total_tasks_created}")
+    return total_tasks_created
 
 def run_scheduled_task_creation():
     """
-    Background thread that runs task creation once per day at 6:15 PM.
-    If task creation is already completed today, schedule for tomorrow.
+    Run the shared job scheduler in the foreground.
+    Task creation runs daily at TASK_CREATION_HOUR:TASK_CREATION_MINUTE, next to task
+    assignment; see task_scheduler.py.
     """
-    print("[TaskCreation] Background scheduled task creation thread started.")
-    print(f"[TaskCreation] Task creation: Daily at {TASK_CREATION_HOUR}:{TASK_CREATION_MINUTE:02d}")
-
-    while True:
-        try:
-            now = datetime.now()
-            current_hour = now.hour
-            current_minute = now.minute
-            current_date = now.date()
-
-            # Check if tasks were already created today
-            lock_file = "task_creation.lock"
-            tasks_already_created_today = False
-
-            if os.path.exists(lock_file):
-                try:
-                    with open(lock_file, 'r') as f:
-                        lock_date = f.read().strip()
-                        if lock_date == str(current_date):
-                            tasks_already_created_today = True
-                            print(f"[TaskCreation] Tasks already created today ({current_date}), scheduling for tomorrow...")
-                except:
-                    pass
-
-            # Check if it's time to create tasks
-            should_create_tasks = False
-
-            if (current_hour == TASK_CREATION_HOUR and current_minute == TASK_CREATION_MINUTE):
-                # Normal scheduled run at 6:15 PM
-                if not tasks_already_created_today:
-                    should_create_tasks = True
-                    print(f"[TaskCreation] Scheduled run - creating daily task pool at {now.strftime('%H:%M')}...")
-                else:
-                    print(f"[TaskCreation] Tasks already created today, skipping scheduled run...")
+    from task_scheduler import start_scheduler
 
-            if should_create_tasks:
-                create_daily_task_pool()
-
-            # Calculate sleep time until next scheduled run
-            now = datetime.now()
-            next_run = now.replace(hour=TASK_CREATION_HOUR, minute=TASK_CREATION_MINUTE, second=0, microsecond=0)
-
-            # If we've already passed today's scheduled time, schedule for tomorrow
-            if now >= next_run:
-                next_run = next_run + timedelta(days=1)
-
-            sleep_seconds = (next_run - now).total_seconds()
-            print(f"[TaskCreation] Next run scheduled for {next_run.strftime('%Y-%m-%d %H:%M')} (in {sleep_seconds/3600:.1f} hours)")
-            time.sleep(sleep_seconds)
-
-        except Exception as e:
-            print("[TaskCreation] Error in scheduled task creation:", e)
-            import traceback
-            traceback.print_exc()
-            time.sleep(60 * 60)  # Sleep for 1 hour on error
+    print(f"[TaskCreation] Task creation: Daily at {TASK_CREATION_HOUR}:{TASK_CREATION_MINUTE:02d}")
+    start_scheduler().join()
 
-# Start background thread when imported (only once)
-_task_creation_thread_started = False
-_task_creation_thread = None
 
 def start_task_creation_thread():
-    global _task_creation_thread_started, _task_creation_thread
-
-    # Check if thread is already running
-    if _task_creation_thread and _task_creation_thread.is_alive():
-        print("[TaskCreation] Background task creation thread already running, skipping...")
-        return
+    """Start the shared job scheduler (task creation and assignment) in the background"""
+    from task_scheduler import start_scheduler
 
-    if not _task_creation_thread_started:
-        print("[TaskCreation] Starting background task creation thread...")
-        _task_creation_thread = threading.Thread(target=run_scheduled_task_creation, daemon=True)
-        _task_creation_thread.start()
-        _task_creation_thread_started = True
-        print("[TaskCreation] Background task creation thread started successfully")
-    else:
-        print("[TaskCreation] Background task creation thread already started, skipping...")
+    print("[TaskCreation] Starting background scheduler thread...")
+    start_scheduler()
 
 # Don't auto-start - let the server control this
 # start_task_creation_thread()
@@ -0,0 +1,316 @@
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from location_index import UserLocationIndex, get_location_index, haversine_matrix
+from task_config import CANDIDATE_USERS_PER_TASK, LOCATION_LOOKBACK_DAYS, UNKNOWN_LOCATION_DISTANCE_M
+
+AREA_COORDINATES_PATH = Path(__file__).parent / 'constants' / 'areaCoordinates.ts'
+
+_AREA_ENTRY = re.compile(r'"([^"]+)"\s*:\s*\{\s*latitude:\s*(-?[\d.]+),\s*longitude:\s*(-?[\d.]+)\s*\}')
+
+# Task area option labels (LEXI_AREAS in server.py) -> buildings in areaCoordinates.ts.
+# Composite areas are placed at the centroid of their buildings; labels that are also a
+# building name need no entry.
+AREA_BUILDINGS = {
+    "The Quint (Beebe, Cazenove, Pomeroy, Shafer, Munger)": ("Beebe", "Cazenove", "Pomeroy", "Shafer"),
+    "East Side (Bates, Freeman, McAfee)": ("Bates", "Freeman", "McAfee"),
+    "Tower Court (East, West, Claflin, Severance)": ("Tower Court", "Claflin", "Severance"),
+    "Academic Quad (Green, Founders, PNE/PNW, Jewett)": ("Green Hall", "Founders Hall", "Pendleton Hall",
+                                                          "Jewett Arts Center"),
+    "Keohane Sports Center (KSC)": ("Keohane Sports Center",),
+    "Acorns": ("Acorns House",),
+    "On the Local Motion (‘What time do you take the bus?’)": ("On the Local Motion",),
+    "Bus stops (Chapel, Lulu, Founders)": ("Chapel bus stop", "Lulu Chow Wang Campus Center", "Founders bus stop"),
+}
+
+_unlocated_areas = set()
+
+
+@lru_cache(maxsize=1)
+def load_area_coordinates(path: str = str(AREA_COORDINATES_PATH)) -> Dict[str, Tuple[float, float]]:
+    """Area name -> (latitude, longitude), read from the app's constants/areaCoordinates.ts"""
+    try:
+        source = Path(path).read_text(encoding='utf-8')
+    except OSError as e:
+        print(f"[TaskProximity] Could not read area coordinates: {e}")
+        return {}
+    return {name: (float(lat), float(lon)) for name, lat, lon in _AREA_ENTRY.findall(source)}
+
+
+def resolve_area_coordinates(areas: Sequence[str],
+                             area_coordinates: Optional[Dict[str, Tuple[float, float]]] = None
+                             ) -> Dict[str, Tuple[float, float]]:
+    """
+    Area label -> (latitude, longitude) for the areas that can be placed
+
+    A label is looked up as a building name first, then through AREA_BUILDINGS (centroid
+    of the listed buildings). Areas with no coordinates are logged once per process.
+    """
+    area_coordinates = area_coordinates if area_coordinates is not None else load_area_coordinates()
+    resolved = {}
+    for area in areas:
+        if area in area_coordinates:
+            resolved[area] = area_coordinates[area]
+            continue
+        points = [area_coordinates[b] for b in AREA_BUILDINGS.get(area, ()) if b in area_coordinates]
+        if points:
+            resolved[area] = tuple(np.mean(np.array(points), axis=0).tolist())
+        elif area not in _unlocated_areas:
+            _unlocated_areas.add(area)
+            print(f"[TaskProximity] No coordinates for area '{area}', "
+                  f"its tasks use UNKNOWN_LOCATION_DISTANCE_M ({UNKNOWN_LOCATION_DISTANCE_M} m)")
+    return resolved
+
+
+def sync_location_index(index: Optional[UserLocationIndex] = None,
+                        lookback_days: int = LOCATION_LOOKBACK_DAYS) -> int:
+    """
+    Apply lexi reports newer than the last synced row to the location index
+
+    One query per sync: each user's newest new row that has coordinates. Positions that
+    fall out of the lookback window are dropped.
+
+    Returns:
+        Number of positions updated
+    """
+    from server.database_utils import db_operation
+
+    index = index or get_location_index()
+    since = datetime.now() - timedelta(days=lookback_days)
+    rows = db_operation('''
+        SELECT l.id, l.user_id, l.latitude, l.longitude, l.created_at FROM lexi l
+        JOIN (
+            SELECT user_id, MAX(id) AS max_id FROM lexi
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL AND created_at >= %s AND id > %s
+            GROUP BY user_id
+        ) latest ON l.id = latest.max_id
+    ''', [since, index.last_row_id], fetch_all=True) or []
+
+    updated = 0
+    for row in rows:
+        if index.update(row['user_id'], row['latitude'], row['longitude'], row.get('created_at')):
+            updated += 1
+        index.last_row_id = max(index.last_row_id, int(row['id']))
+    index.prune(since)
+    return updated
+
+
+def load_user_locations(user_ids: Sequence, lookback_days: int = LOCATION_LOOKBACK_DAYS) -> Dict[str, Tuple[float, float]]:
+    """Latest reported position per user in the lookback window, from the synced location index"""
+    if not user_ids:
+        return {}
+    index = get_location_index()
+    sync_location_index(index, lookback_days)
+    return index.positions(user_ids)
+
+
+def nearest_users_to_area(area: str, k: int, user_ids: Optional[Sequence] = None,
+                          max_distance_m: Optional[float] = None,
+                          index: Optional[UserLocationIndex] = None) -> List[Tuple[str, float]]:
+    """The k users whose latest position is closest to an area's centroid, as (user_id, meters)"""
+    coordinates = resolve_area_coordinates([area]).get(area)
+    if coordinates is None:
+        return []
+    index = index or get_location_index()
+    return index.nearest(coordinates[0], coordinates[1], k, max_distance_m, user_ids)
+
+
+def candidate_users(areas: Sequence[str], area_task_counts: Sequence[int], user_ids: Sequence,
+                    capacity: Sequence[int], per_task: int = CANDIDATE_USERS_PER_TASK,
+                    index: Optional[UserLocationIndex] = None) -> List[int]:
+    """
+    Positions in user_ids worth considering for the assignment solve
+
+    Each area keeps its per_task nearest users per task from the location index. All
+    users are kept when an area has no coordinates or the candidates' capacity cannot
+    cover every task, since the solve would then reach past the nearest users anyway.
+
+    Args:
+        areas: Task areas
+        area_task_counts: Number of tasks in each area
+        user_ids: Users that can take tasks
+        capacity: Tasks each user can still take
+        per_task: Nearest users kept per task of an area
+
+    Returns:
+        Sorted positions into user_ids
+    """
+    everyone = list(range(len(user_ids)))
+    area_coordinates = resolve_area_coordinates(areas)
+    if any(area not in area_coordinates for area in areas):
+        return everyone
+    position_of = {str(user_id): i for i, user_id in enumerate(user_ids)}
+    allowed = set(position_of)
+    selected = set()
+    for area, count in zip(areas, area_task_counts):
+        nearest = nearest_users_to_area(area, int(count) * per_task, allowed, index=index)
+        selected.update(position_of[user_id] for user_id, _ in nearest)
+    if sum(capacity[i] for i in selected) < sum(area_task_counts):
+        return everyone
+    return sorted(selected)
+
+
+def area_user_distances(areas: List[str], user_ids: List, user_locations: Dict[str, Tuple[float, float]],
+                        area_coordinates: Optional[Dict[str, Tuple[float, float]]] = None) -> np.ndarray:
+    """
+    (areas x users) distance matrix; areas without coordinates (see resolve_area_coordinates)
+    or users without a position get UNKNOWN_LOCATION_DISTANCE_M so they are matched only
+    after every known pair
+    """
+    area_coordinates = resolve_area_coordinates(areas, area_coordinates)
+    distances = np.full((len(areas), len(user_ids)), UNKNOWN_LOCATION_DISTANCE_M, dtype=np.float64)
+
+    area_rows = [i for i, area in enumerate(areas) if area in area_coordinates]
+    user_cols = [j for j, user_id in enumerate(user_ids) if str(user_id) in user_locations]
+    if area_rows and user_cols:
+        area_points = np.array([area_coordinates[areas[i]] for i in area_rows])
+        user_points = np.array([user_locations[str(user_ids[j])] for j in user_cols])
+        distances[np.ix_(area_rows, user_cols)] = haversine_matrix(area_points, user_points)
+    return distances
+
+
+def solve_area_assignment(cost: np.ndarray, task_areas: Sequence[int], capacity: Sequence[int]) -> np.ndarray:
+    """
+    Minimum total cost assignment of tasks to users with per-user capacity
+
+    Tasks in the same area cost the same, so this is a min-cost flow over areas x users
+    rather than a tasks x users Hungarian problem. Tasks are added one at a time in the
+    given order (oldest first) along successive shortest paths, so the solution stays
+    optimal for the tasks placed so far and, once capacity runs out, the newest tasks
+    are the ones left over. Paths only visit areas: moving one user from area b to area
+    a costs cost[a, u] - cost[b, u], the cheapest such user per (a, b) pair is cached,
+    and Dijkstra runs on the (areas x areas) graph with reduced costs.
+
+    Args:
+        cost: (areas x users) cost matrix
+        task_areas: Area row of each task, in priority order
+        capacity: Tasks each user can still take
+
+    Returns:
+        User column for each task, -1 where no capacity was left
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    task_areas = np.asarray(task_areas, dtype=np.int64)
+    num_areas, num_users = cost.shape
+    result = np.full(len(task_areas), -1, dtype=np.int64)
+    remaining = np.maximum(np.asarray(capacity, dtype=np.int64), 0)
+    free_total = int(remaining.sum())
+    if not len(task_areas) or not free_total:
+        return result
+
+    rows = np.arange(num_areas)
+    flow = np.zeros((num_areas, num_users), dtype=np.int64)
+    serving = [set() for _ in range(num_areas)]
+    # exchange[a, b]: cheapest cost[a, u] - cost[b, u] over users u currently serving b
+    exchange = np.full((num_areas, num_areas), np.inf)
+    exchange_user = np.full((num_areas, num_areas), -1, dtype=np.int64)
+    # Users by distance per area, with a pointer to the nearest one that still has capacity
+    nearest = np.argsort(cost, axis=1, kind='stable')
+    pointer = np.zeros(num_areas, dtype=np.int64)
+    free_cost = np.full(num_areas, np.inf)
+    potential = np.zeros(num_areas)
+    sink_potential = 0.0
+
+    def advance(area):
+        position = pointer[area]
+        while position < num_users:
+            chunk = remaining[nearest[area, position:position + 256]] > 0
+            if chunk.any():
+                position += int(chunk.argmax())
+                free_cost[area] = cost[area, nearest[area, position]]
+                break
+            position += len(chunk)
+        else:
+            free_cost[area] = np.inf
+        pointer[area] = position
+
+    def add_server(area, user):
+        serving[area].add(user)
+        delta = cost[:, user] - cost[area, user]
+        delta[area] = np.inf
+        closer = delta < exchange[:, area]
+        exchange[closer, area] = delta[closer]
+        exchange_user[closer, area] = user
+
+    def refresh_exchange(area):
+        users = np.fromiter(serving[area], dtype=np.int64, count=len(serving[area]))
+        if not users.size:
+            exchange[:, area] = np.inf
+            exchange_user[:, area] = -1
+            return
+        delta = cost[:, users] - cost[area, users]
+        best = delta.argmin(axis=1)
+        exchange[:, area] = delta[rows, best]
+        exchange_user[:, area] = users[best]
+        exchange[area, area] = np.inf
+
+    for area in range(num_areas):
+        advance(area)
+
+    placed = 0
+    for source in task_areas:
+        if not free_total:
+            break
+
+        # Dijkstra from the task's area; the sink is any user with free capacity. Reduced
+        # edge costs are computed per visited area rather than for the whole graph.
+        sink_reduced = np.maximum(free_cost + potential - sink_potential, 0.0)
+        dist = np.full(num_areas, np.inf)
+        dist[source] = 0.0
+        frontier = dist.copy()
+        parent = np.full(num_areas, -1, dtype=np.int64)
+        best, end = np.inf, -1
+        area = int(source)
+        while True:
+            frontier[area] = np.inf
+            area_dist = float(dist[area])
+            if area_dist + sink_reduced[area] < best:
+                best, end = area_dist + sink_reduced[area], area
+            candidate = np.maximum(exchange[area] + (potential[area] - potential), 0.0) + area_dist
+            better = candidate < dist
+            dist[better] = candidate[better]
+            frontier[better] = candidate[better]
+            parent[better] = area
+            area = int(frontier.argmin())
+            if frontier[area] >= best:
+                break
+        potential += np.minimum(dist, best)
+        sink_potential += best
+
+        # Augment: the end area takes a free user, each area on the path takes a user from the next
+        user = int(nearest[end, pointer[end]])
+        flow[end, user] += 1
+        if flow[end, user] == 1:
+            add_server(end, user)
+        stale = set()
+        area = end
+        while area != source:
+            previous = int(parent[area])
+            moved = int(exchange_user[previous, area])
+            flow[area, moved] -= 1
+            if flow[area, moved] == 0:
+                serving[area].discard(moved)
+                stale.add(area)
+            flow[previous, moved] += 1
+            if flow[previous, moved] == 1:
+                add_server(previous, moved)
+            area = previous
+        for area in stale:
+            refresh_exchange(area)
+
+        remaining[user] -= 1
+        free_total -= 1
+        if not remaining[user]:
+            pointed = nearest[rows, np.minimum(pointer, num_users - 1)]
+            for area in np.nonzero((pointed == user) & (free_cost < np.inf))[0]:
+                advance(area)
+        placed += 1
+
+    for area in range(num_areas):
+        result[np.nonzero(task_areas[:placed] == area)[0]] = np.repeat(np.arange(num_users), flow[area])
+    return result
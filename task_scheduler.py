@@ -0,0 +1,328 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from task_config import (ASSIGN_AFTER_TASK_CREATION, ASSIGNMENT_HOURS, SCHEDULER_CATCH_UP_HOURS,
+                         SCHEDULER_STATE_FILE, TASK_CREATION_HOUR, TASK_CREATION_MINUTE,
+                         TASK_EXPIRY_SCHEDULE)
+
+
+def _parse_cron_field(field: str, low: int, high: int) -> List[int]:
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/', 1)
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(v) for v in part.split('-', 1))
+        else:
+            start = end = int(part)
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Invalid cron field '{field}'")
+        values.update(range(start, end + 1, step))
+    return sorted(values)
+
+
+class CronSpec:
+    """Daily cron schedule: 'minute hour * * *' (lists, ranges and steps in the first two fields)"""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5 or fields[2:] != ['*', '*', '*']:
+            raise ValueError(f"Only daily cron specs ('M H * * *') are supported: '{expression}'")
+        self.expression = expression
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+
+    @classmethod
+    def at(cls, hours, minute: int = 0) -> 'CronSpec':
+        hours = [hours] if isinstance(hours, int) else hours
+        return cls(f"{minute} {','.join(str(h) for h in sorted(hours))} * * *")
+
+    def _times_on(self, day) -> List[datetime]:
+        start = datetime.combine(day, datetime.min.time())
+        return [start.replace(hour=h, minute=m) for h in self.hours for m in self.minutes]
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First scheduled time strictly after `moment`"""
+        for offset in (0, 1):
+            for candidate in self._times_on(moment.date() + timedelta(days=offset)):
+                if candidate > moment:
+                    return candidate
+        raise ValueError(f"No upcoming time for '{self.expression}'")
+
+    def last_at_or_before(self, moment: datetime) -> datetime:
+        """Most recent scheduled time at or before `moment`"""
+        for offset in (0, 1):
+            for candidate in reversed(self._times_on(moment.date() - timedelta(days=offset))):
+                if candidate <= moment:
+                    return candidate
+        raise ValueError(f"No previous time for '{self.expression}'")
+
+    def __repr__(self):
+        return f"CronSpec('{self.expression}')"
+
+
+class Job:
+    """A named callable with an optional cron schedule and run metrics"""
+
+    def __init__(self, name: str, func: Callable, schedule: Optional[CronSpec] = None, catch_up: bool = True):
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.catch_up = catch_up
+        self.running = False
+        self.pending_reasons: List[str] = []
+        self.last_completed_slot: Optional[datetime] = None
+        self.stats = {
+            'runs': 0, 'failures': 0, 'caught_up': 0, 'triggered': 0,
+            'last_started_at': None, 'last_duration_s': None, 'total_duration_s': 0.0, 'max_duration_s': 0.0,
+            'last_result': None, 'last_error': None, 'last_reason': None, 'next_run_at': None,
+        }
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['avg_duration_s'] = round(stats['total_duration_s'] / stats['runs'], 3) if stats['runs'] else None
+        stats['schedule'] = self.schedule.expression if self.schedule else None
+        stats['running'] = self.running
+        return stats
+
+
+class JobScheduler:
+    """Runs jobs from a timer heap on one background thread.
+
+    Scheduled runs wake at the exact cron time instead of polling. A run that was
+    missed (server down or the thread busy) is caught up once, if it is no older than
+    SCHEDULER_CATCH_UP_HOURS. trigger() queues an immediate run; triggers that arrive
+    while a job is queued or running are merged into one run. Jobs run one at a time.
+    """
+
+    def __init__(self, state_file: str = SCHEDULER_STATE_FILE, catch_up_hours: float = SCHEDULER_CATCH_UP_HOURS):
+        self.state_file = state_file
+        self.catch_up_window = timedelta(hours=catch_up_hours)
+        self._jobs: Dict[str, Job] = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def add_job(self, job: Job):
+        with self._condition:
+            self._jobs[job.name] = job
+            if self._thread is not None:
+                self._schedule_next(job, datetime.now())
+
+    def _push(self, when: datetime, job: Job, reason: str, slot: Optional[datetime] = None):
+        heapq.heappush(self._heap, (when, next(self._sequence), job.name, reason, slot))
+        self._condition.notify()
+
+    def _schedule_next(self, job: Job, after: datetime):
+        if job.schedule is None:
+            return
+        slot = job.schedule.next_after(after)
+        job.stats['next_run_at'] = slot.isoformat(timespec='seconds')
+        self._push(slot, job, 'scheduled', slot)
+
+    def trigger(self, name: str, reason: str = 'on demand') -> bool:
+        """Run a job as soon as the scheduler is free; returns False for an unknown job"""
+        with self._condition:
+            job = self._jobs.get(name)
+            if job is None:
+                return False
+            job.stats['triggered'] += 1
+            if job.pending_reasons:
+                job.pending_reasons.append(reason)
+                return True
+            job.pending_reasons.append(reason)
+            self._push(datetime.now(), job, 'trigger', None)
+            return True
+
+    def _load_state(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"[Scheduler] Could not read state file: {e}")
+            return
+        for name, slot in state.items():
+            if name in self._jobs and slot:
+                self._jobs[name].last_completed_slot = datetime.fromisoformat(slot)
+
+    def _save_state(self):
+        if not self.state_file:
+            return
+        state = {name: job.last_completed_slot.isoformat() if job.last_completed_slot else None
+                 for name, job in self._jobs.items()}
+        try:
+            tmp_path = f"{self.state_file}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_file)
+        except Exception as e:
+            print(f"[Scheduler] Could not write state file: {e}")
+
+    def _plan_initial_runs(self, now: datetime):
+        for job in self._jobs.values():
+            if job.schedule is None:
+                continue
+            missed = job.schedule.last_at_or_before(now)
+            if (job.catch_up and now - missed <= self.catch_up_window
+                    and (job.last_completed_slot is None or job.last_completed_slot < missed)):
+                print(f"[Scheduler] Catching up missed {job.name} run from {missed.strftime('%Y-%m-%d %H:%M')}")
+                job.stats['caught_up'] += 1
+                self._push(now, job, 'catch-up', missed)
+            self._schedule_next(job, now)
+
+    def _run(self, job: Job, reason: str, slot: Optional[datetime]):
+        job.running = True
+        started = time.perf_counter()
+        job.stats['last_started_at'] = datetime.now().isoformat(timespec='seconds')
+        job.stats['last_reason'] = reason
+        print(f"[Scheduler] Running {job.name} ({reason})")
+        try:
+            result = job.func()
+            job.stats['last_result'] = result
+            job.stats['last_error'] = None
+        except Exception as e:
+            job.stats['failures'] += 1
+            job.stats['last_error'] = str(e)
+            print(f"[Scheduler] {job.name} failed: {e}")
+            traceback.print_exc()
+        finally:
+            duration = time.perf_counter() - started
+            job.running = False
+            job.stats['runs'] += 1
+            job.stats['last_duration_s'] = round(duration, 3)
+            job.stats['total_duration_s'] += duration
+            job.stats['max_duration_s'] = round(max(job.stats['max_duration_s'], duration), 3)
+            print(f"[Scheduler] {job.name} finished in {duration:.1f}s")
+
+        if slot is not None:
+            with self._condition:
+                if job.last_completed_slot is None or slot > job.last_completed_slot:
+                    job.last_completed_slot = slot
+                    self._save_state()
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                while not self._stopping:
+                    if self._heap:
+                        # Re-check at least every minute so clock jumps and suspends are noticed
+                        wait = (self._heap[0][0] - datetime.now()).total_seconds()
+                        if wait <= 0:
+                            break
+                        self._condition.wait(min(wait, 60))
+                    else:
+                        self._condition.wait(60)
+                if self._stopping:
+                    return
+                when, _, name, reason, slot = heapq.heappop(self._heap)
+                job = self._jobs[name]
+                if reason == 'trigger':
+                    reason = f"trigger: {', '.join(dict.fromkeys(job.pending_reasons))}"
+                    job.pending_reasons.clear()
+                elif reason == 'scheduled':
+                    late = (datetime.now() - when).total_seconds()
+                    if late > 60:
+                        reason = f"scheduled, {late / 60:.0f} min late"
+                    self._schedule_next(job, max(when, datetime.now()))
+            self._run(job, reason, slot)
+
+    def start(self, daemon: bool = True) -> threading.Thread:
+        """Start the scheduler thread (no-op if it is already running)"""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return self._thread
+            self._stopping = False
+            # Keep on-demand triggers queued before start; scheduled runs are planned afresh
+            self._heap = [entry for entry in self._heap if entry[3] == 'trigger']
+            heapq.heapify(self._heap)
+            self._load_state()
+            self._plan_initial_runs(datetime.now())
+            self._thread = threading.Thread(target=self._loop, name='job-scheduler', daemon=daemon)
+            self._thread.start()
+        for job in self._jobs.values():
+            if job.schedule:
+                print(f"[Scheduler] {job.name}: '{job.schedule.expression}', next run {job.stats['next_run_at']}")
+        return self._thread
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+    def get_stats(self) -> Dict:
+        with self._condition:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'queued': [{'job': name, 'at': when.isoformat(timespec='seconds'), 'reason': reason}
+                           for when, _, name, reason, _ in sorted(self._heap)],
+                'jobs': {name: job.get_stats() for name, job in self._jobs.items()},
+            }
+
+
+def _run_task_assignment():
+    from task_assignment import assign_tasks_to_users, should_assign_tasks
+
+    if not should_assign_tasks():
+        print("[Scheduler] No unassigned tasks or eligible users, skipping task assignment")
+        return 0
+    return assign_tasks_to_users()
+
+
+def _run_task_creation():
+    from task_creation import create_daily_task_pool
+
+    created = create_daily_task_pool()
+    if created and ASSIGN_AFTER_TASK_CREATION:
+        scheduler.trigger('task_assignment', 'tasks created')
+    return created
+
+
+def _run_task_expiry():
+    from server.database_utils import expire_old_tasks
+
+    return expire_old_tasks()
+
+
+scheduler = JobScheduler()
+scheduler.add_job(Job('task_creation', _run_task_creation, CronSpec.at(TASK_CREATION_HOUR, TASK_CREATION_MINUTE)))
+scheduler.add_job(Job('task_assignment', _run_task_assignment, CronSpec.at(ASSIGNMENT_HOURS)))
+scheduler.add_job(Job('task_expiry', _run_task_expiry, CronSpec(TASK_EXPIRY_SCHEDULE)))
+
+
+def start_scheduler() -> threading.Thread:
+    """Start the shared task scheduler in the background"""
+    return scheduler.start()
+
+
+def trigger_task_assignment(reason: str = 'on demand') -> bool:
+    """Assign unassigned tasks now instead of waiting for the next assignment hour"""
+    return scheduler.trigger('task_assignment', reason)
+
+
+def get_scheduler_stats() -> Dict:
+    from leases import get_lease_stats
+    from server.database_utils import get_expiry_stats
+
+    stats = scheduler.get_stats()
+    stats['leases'] = get_lease_stats()
+    stats['expiry'] = get_expiry_stats()
+    return stats
+
+
+if __name__ == "__main__":
+    start_scheduler().join()
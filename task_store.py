@@ -0,0 +1,294 @@
+"""
+Single tasks table for every workspace.
+
+Replaces the per-workspace workspace_{id}_responses tables for task bookkeeping: one
+row per task keyed by (workspace_id, task_id), with the workspace's area answer in
+`area` and any other question columns in `answers` (JSON). Cross-workspace checks
+such as "any unassigned tasks?" or expiry are one indexed statement each.
+
+Until the external app moves to the tasks table, SYNC_WORKSPACE_TABLES keeps both
+stores in step: its changes are pulled in with sync_workspace_tables() before each
+task creation, assignment and expiry run, and those runs write their own changes to
+the workspace table in the same transaction (mirror_* operations, expiry).
+
+    python task_store.py migrate     # copy rows from the workspace_{id}_responses tables
+"""
+import json
+import sys
+from typing import Optional, Set
+
+from server.database_utils import db_operation, db_transaction, sanitize_column_name
+from task_config import AREA_QUESTION_TEXT, SYNC_WORKSPACE_TABLES, TASKS_TABLE, TASKS_TABLE_PARTITIONS
+
+# Indexes follow the queries that use them:
+#   queue     unassigned tasks, globally and per workspace oldest first (assignment, has_unassigned_tasks)
+#   assigned  per-user counts of tasks assigned today
+#   created   tasks created today
+#   status_*  expiry of assigned and accepted tasks
+#   area      per-area visit counts (task creation fallback, coverage rebuild)
+CREATE_TASKS_TABLE = f'''
+    CREATE TABLE IF NOT EXISTS {TASKS_TABLE} (
+        workspace_id VARCHAR(64) NOT NULL,
+        task_id VARCHAR(64) NOT NULL,
+        area VARCHAR(255) NULL,
+        user_id VARCHAR(255) NULL,
+        task_status VARCHAR(32) NOT NULL DEFAULT 'created',
+        time_task_created DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        time_task_assigned DATETIME NULL,
+        time_task_responded DATETIME NULL,
+        time_completed DATETIME NULL,
+        latitude DECIMAL(10, 8) NULL,
+        longitude DECIMAL(11, 8) NULL,
+        answers JSON NULL,
+        PRIMARY KEY (workspace_id, task_id),
+        KEY idx_tasks_queue (user_id, time_task_assigned, workspace_id, time_task_created),
+        KEY idx_tasks_assigned (time_task_assigned, user_id),
+        KEY idx_tasks_created (time_task_created),
+        KEY idx_tasks_status_assigned (task_status, time_task_assigned),
+        KEY idx_tasks_status_responded (task_status, time_task_responded),
+        KEY idx_tasks_area (workspace_id, area, user_id)
+    ){f' PARTITION BY KEY (workspace_id) PARTITIONS {int(TASKS_TABLE_PARTITIONS)}' if TASKS_TABLE_PARTITIONS else ''}
+'''
+
+_table_ready = False
+
+
+def ensure_tasks_table() -> bool:
+    """Create the tasks table if needed; a newly created table is filled from the workspace tables"""
+    global _table_ready
+    if _table_ready:
+        return True
+    exists = db_operation(f"SHOW TABLES LIKE '{TASKS_TABLE}'", fetch_one=True)
+    if exists is False or not db_operation(CREATE_TASKS_TABLE):
+        return False
+    _table_ready = True
+    if not exists:
+        print(f"[TaskStore] Created {TASKS_TABLE}, migrating tasks from the workspace tables")
+        migrate_workspace_tables()
+    return True
+
+
+def _workspace_questions(ws):
+    questions = ws.get('questions')
+    if isinstance(questions, str):
+        try:
+            questions = json.loads(questions)
+        except Exception:
+            questions = []
+    return questions or []
+
+
+def workspace_table(ws_id) -> str:
+    return f"workspace_{ws_id}_responses"
+
+
+def existing_workspace_tables() -> Set[str]:
+    """Names of the workspace_{id}_responses tables that exist"""
+    rows = db_operation("SHOW TABLES LIKE 'workspace\\_%\\_responses'", fetch_all=True) or []
+    return {next(iter(row.values())) for row in rows}
+
+
+def _workspace_columns(ws):
+    """The workspace table's area column and its other question columns"""
+    area_col = None
+    answer_cols = []
+    for question in _workspace_questions(ws):
+        column = sanitize_column_name(question.get('text', ''))
+        if not column:
+            continue
+        if question.get('text') == AREA_QUESTION_TEXT:
+            area_col = column
+        elif column not in answer_cols:
+            answer_cols.append(column)
+    return area_col, answer_cols
+
+
+def _copy_workspace_table(ws, update_existing: bool):
+    """
+    Copy one workspace table into the tasks table
+
+    Responses written without a task (task_id NULL) are copied too, under a task_id
+    derived from the row, so they still count as visits. They get task_status
+    'response' unless the row has one, which keeps them out of assignment and expiry.
+
+    Args:
+        update_existing: Also overwrite tasks rows whose workspace row has changed
+
+    Returns:
+        Rows added or changed, or False on failure
+    """
+    ws_id = str(ws['id'])
+    area_col, answer_cols = _workspace_columns(ws)
+
+    def answers(prefix=''):
+        if not answer_cols:
+            return 'NULL'
+        return f"JSON_OBJECT({', '.join(f'%s, {prefix}`{c}`' for c in answer_cols)})"
+
+    response_key = ("CONCAT('response:', MD5(JSON_ARRAY(user_id, time_task_created, time_task_assigned, "
+                    "time_task_responded, time_completed, latitude, longitude)))")
+    operations = [(f'''
+        INSERT IGNORE INTO {TASKS_TABLE} (
+            workspace_id, task_id, area, user_id, task_status,
+            time_task_created, time_task_assigned, time_task_responded, time_completed,
+            latitude, longitude, answers
+        )
+        SELECT %s, COALESCE(task_id, {response_key}), {f'`{area_col}`' if area_col else 'NULL'}, user_id,
+               COALESCE(task_status, IF(task_id IS NULL, 'response', 'created')),
+               COALESCE(time_task_created, time_task_assigned, time_task_responded, time_completed, NOW()),
+               time_task_assigned, time_task_responded, time_completed, latitude, longitude, {answers()}
+        FROM {workspace_table(ws_id)}
+        WHERE task_id IS NOT NULL OR user_id IS NOT NULL
+    ''', [[ws_id] + answer_cols])]
+    if update_existing:
+        # Task rows the external app changed since the last copy; the workspace row wins
+        columns = {
+            'area': f'w.`{area_col}`' if area_col else 't.area',
+            'user_id': 'w.user_id',
+            'task_status': "COALESCE(w.task_status, 'created')",
+            'time_task_assigned': 'w.time_task_assigned',
+            'time_task_responded': 'w.time_task_responded',
+            'time_completed': 'w.time_completed',
+            'latitude': 'w.latitude',
+            'longitude': 'w.longitude',
+            'answers': answers('w.'),
+        }
+        operations.append((f'''
+            UPDATE {TASKS_TABLE} t JOIN {workspace_table(ws_id)} w ON t.workspace_id = %s AND t.task_id = w.task_id
+            SET {', '.join(f't.{column} = {value}' for column, value in columns.items())}
+            WHERE NOT ({' AND '.join(f't.{column} <=> {value}' for column, value in columns.items())})
+        ''', [[ws_id] + answer_cols + answer_cols]))
+    return db_transaction(operations)
+
+
+def _copy_workspace_tables(update_existing: bool) -> int:
+    workspaces = db_operation('SELECT * FROM workspaces', fetch_all=True) or []
+    tables = existing_workspace_tables()
+    copied = 0
+    for ws in workspaces:
+        table_name = workspace_table(ws['id'])
+        if table_name not in tables:
+            continue
+        rows = _copy_workspace_table(ws, update_existing)
+        if rows is False:
+            print(f"[TaskStore] Failed to copy {table_name}")
+            continue
+        copied += rows
+        if rows:
+            print(f"[TaskStore] Copied {rows} rows from {table_name}")
+    if copied:
+        # Copied rows bypass the coverage counters, so recount them from the tasks table
+        from area_coverage import ensure_coverage_table, rebuild
+        if ensure_coverage_table():
+            rebuild()
+    return copied
+
+
+def migrate_workspace_tables() -> int:
+    """
+    Copy every workspace_{id}_responses table into the tasks table
+
+    Safe to re-run: rows already in the tasks table are left alone. The old tables are
+    not dropped.
+
+    Returns:
+        Number of rows copied
+    """
+    copied = _copy_workspace_tables(update_existing=False)
+    print(f"[TaskStore] Migration complete: {copied} rows copied")
+    return copied
+
+
+def sync_workspace_tables() -> int:
+    """
+    Pull what the external app wrote to the workspace tables into the tasks table
+
+    Runs before task creation, assignment and expiry while SYNC_WORKSPACE_TABLES is on:
+    new tasks and responses are added, and tasks it assigned, answered or completed are
+    updated. Writes in the other direction go through the mirror_* operations.
+
+    Returns:
+        Number of tasks rows added or changed
+    """
+    if not SYNC_WORKSPACE_TABLES:
+        return 0
+    synced = _copy_workspace_tables(update_existing=True)
+    if synced:
+        print(f"[TaskStore] Synced {synced} rows from the workspace tables")
+    return synced
+
+
+def _mirror(ws_id, tables: Optional[Set[str]], query: str, params_list: list):
+    table_name = workspace_table(ws_id)
+    if not SYNC_WORKSPACE_TABLES or table_name not in (existing_workspace_tables() if tables is None else tables):
+        return query.format(table=table_name), []
+    return query.format(table=table_name), params_list
+
+
+def mirror_new_tasks(ws_id, new_tasks, tables: Optional[Set[str]] = None):
+    """
+    Operation that writes new tasks to the workspace table too, for db_transaction
+
+    Args:
+        new_tasks: (workspace_id, task_id, time_task_created, area, task_status) rows
+        tables: Result of existing_workspace_tables(), to save a lookup
+
+    Returns:
+        (query, params_list) pair; params_list is empty when syncing is off or there is no table
+    """
+    return _mirror(ws_id, tables, f'''
+        INSERT INTO {{table}} (task_id, time_task_created, `{sanitize_column_name(AREA_QUESTION_TEXT)}`, task_status)
+        VALUES (%s, %s, %s, %s)
+    ''', [values[1:] for values in new_tasks])
+
+
+def mirror_assignments(ws_id, assignments, tables: Optional[Set[str]] = None):
+    """
+    Operation that writes assignments to the workspace table too, for db_claim_rows
+
+    Args:
+        assignments: (user_id, time_task_assigned, task_id) rows
+        tables: Result of existing_workspace_tables(), to save a lookup
+    """
+    return _mirror(ws_id, tables, '''
+        UPDATE {table}
+        SET user_id = %s, time_task_assigned = %s, task_status = 'assigned'
+        WHERE task_id = %s AND user_id IS NULL
+    ''', [list(values) for values in assignments])
+
+
+def mirror_expired_tasks() -> int:
+    """
+    Mark tasks expired in the tasks table as incomplete in the workspace tables too
+
+    Returns:
+        Number of workspace rows updated
+    """
+    if not SYNC_WORKSPACE_TABLES:
+        return 0
+    tables = existing_workspace_tables()
+    updated = 0
+    for ws in db_operation('SELECT id FROM workspaces', fetch_all=True) or []:
+        table_name = workspace_table(ws['id'])
+        if table_name not in tables:
+            continue
+        rows = db_transaction([(f'''
+            UPDATE {table_name} w JOIN {TASKS_TABLE} t ON t.workspace_id = %s AND t.task_id = w.task_id
+            SET w.task_status = 'incomplete'
+            WHERE t.task_status = 'incomplete' AND NOT w.task_status <=> 'incomplete'
+        ''', [[str(ws['id'])]])])
+        if rows is False:
+            print(f"[TaskStore] Failed to mirror expired tasks to {table_name}")
+            continue
+        updated += rows
+    return updated
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['migrate']:
+        print("Usage: python task_store.py migrate")
+        sys.exit(2)
+    if not ensure_tasks_table():
+        sys.exit(1)
+    # A table created just now was already migrated by ensure_tasks_table
+    migrate_workspace_tables()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The server modules are flat files at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,50 @@
+import numpy as np
+
+import embedding_store
+from embedding_store import EmbeddingStore
+
+
+def vectors(values):
+    return np.array([[value, -value] for value in values], dtype=np.float32)
+
+
+def test_compact_keeps_only_live_rows(tmp_path):
+    store = EmbeddingStore('model-torch', 2, str(tmp_path))
+    store.put_many(['a', 'b', 'c'], vectors([1, 2, 3]))
+    store.invalidate(['b'])
+    store.put_many(['c'], vectors([4]))
+
+    assert store.compact() == 2
+    assert store.get_stats()['stored_rows'] == 2
+    assert store.get('b') is None
+    np.testing.assert_array_equal(store.get('a'), [1, -1])
+    np.testing.assert_array_equal(store.get('c'), [4, -4])
+
+
+def test_other_instances_reload_after_compaction(tmp_path):
+    writer = EmbeddingStore('model-torch', 2, str(tmp_path))
+    reader = EmbeddingStore('model-torch', 2, str(tmp_path))
+    writer.put_many(['a', 'b'], vectors([1, 2]))
+    np.testing.assert_array_equal(reader.get('b'), [2, -2])
+
+    writer.invalidate(['a'])
+    writer.compact()
+    writer.put_many(['c'], vectors([3]))
+
+    assert reader.get('a') is None
+    np.testing.assert_array_equal(reader.get('b'), [2, -2])
+    np.testing.assert_array_equal(reader.get('c'), [3, -3])
+
+
+def test_appends_compact_at_max_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_store, 'EMBEDDING_STORE_MAX_ROWS', 8)
+    store = EmbeddingStore('model-torch', 2, str(tmp_path))
+    for i in range(20):
+        store.put_many([f"t{i}"], vectors([i]))
+
+    stats = store.get_stats()
+    assert stats['stored_rows'] < 8
+    assert stats['compactions'] > 0
+    # The most recently written texts survive
+    np.testing.assert_array_equal(store.get('t19'), [19, -19])
+    assert store.get('t0') is None
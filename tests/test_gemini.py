@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import gemini
+from gemini_client import CircuitBreaker
+from gemini_quota import GeminiQuotaManager
+
+
+class FakeClient:
+    """Answers typo prompts from a fixed table of misspellings"""
+
+    def __init__(self, typos):
+        self.typos = typos
+        self.breaker = CircuitBreaker()
+        self.prompts = []
+
+    def generate(self, prompt):
+        self.prompts.append(prompt)
+        words = prompt.split('Words to check:')[1].split('IMPORTANT')[0]
+        suggestions = [{'original': typo, 'corrected': fix, 'confidence': 0.9}
+                       for typo, fix in self.typos.items() if f'"{typo}"' in words]
+        return json.dumps({'suggestions': suggestions, 'has_typos': bool(suggestions)})
+
+
+@pytest.fixture
+def checker(tmp_path):
+    checker = gemini.GeminiTypoChecker()
+    checker.quota = GeminiQuotaManager(str(tmp_path / 'quota.sqlite3'), max_daily_calls=100, burst=100)
+    checker.client = FakeClient({'langauge': 'language', 'spansh': 'spanish'})
+    checker.enabled = True
+    return checker
+
+
+def test_evicted_word_verdict_is_rechecked(checker):
+    result = checker.check_typo("my langauge is spansh")
+    assert {s['corrected'] for s in result['suggestions']} == {'language', 'spanish'}
+
+    del checker.word_cache['spansh']
+    result = checker.check_typo("my langauge is spansh")
+
+    assert {s['corrected'] for s in result['suggestions']} == {'language', 'spanish'}
+    assert len(checker.client.prompts) == 2
+    assert '"spansh"' in checker.client.prompts[-1] and '"langauge"' not in checker.client.prompts[-1]
+
+
+def test_word_cache_limit_holds_on_every_insert(checker):
+    checker.word_cache_size_limit = 3
+    result = checker.check_typo("fluent langauge spansh speaker native")
+
+    assert len(checker.word_cache) <= 3
+    # Verdicts evicted during this call still reach its result
+    assert {s['corrected'] for s in result['suggestions']} == {'language', 'spanish'}
+
+
+def test_rejected_call_does_not_spend_quota(checker):
+    def reject(prompt):
+        raise gemini.GeminiUnavailableError('Circuit breaker open')
+    checker.client.generate = reject
+
+    result = checker.check_typo("my langauge is spansh")
+
+    assert result['degraded'] == 'unavailable'
+    assert checker.quota.calls_today() == 0
+
+
+def test_format_canonicalizes_only_language_answers(checker):
+    checker.client.generate = lambda prompt: 'spansh, english'
+
+    assert checker.format_answers('spansh and english', 'languages')['source'] == 'local'
+    assert checker.format_answers('spansh and english') == {'formatted_text': 'spansh, english'}
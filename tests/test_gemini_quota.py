@@ -0,0 +1,26 @@
+import sqlite3
+
+from gemini_quota import GeminiQuotaManager
+
+
+def test_acquire_within_budget(tmp_path):
+    quota = GeminiQuotaManager(str(tmp_path / 'quota.sqlite3'), max_daily_calls=1, burst=5)
+
+    assert quota.try_acquire('format') == (True, None)
+    assert quota.try_acquire('format') == (False, 'daily_limit')
+    assert quota.calls_today() == 1
+
+
+def test_lock_contention_fails_closed(tmp_path):
+    db_path = str(tmp_path / 'quota.sqlite3')
+    quota = GeminiQuotaManager(db_path, lock_timeout=0.05)
+    holder = sqlite3.connect(db_path, isolation_level=None)
+    holder.execute('BEGIN IMMEDIATE')
+    try:
+        assert quota.try_acquire('typo') == (False, 'quota_unavailable')
+    finally:
+        holder.execute('ROLLBACK')
+        holder.close()
+
+    assert quota.calls_today() == 0
+    assert quota.try_acquire('typo') == (True, None)
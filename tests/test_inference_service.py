@@ -0,0 +1,97 @@
+import inspect
+import json
+import threading
+
+import pytest
+
+import inference_service
+from inference_service import DynamicBatcher, InferenceUnavailableError
+
+
+class RecordingBatcher(DynamicBatcher):
+    """Batcher whose analyzer calls are recorded instead of running the models"""
+
+    def __init__(self, **kwargs):
+        self.executed = []
+        self.busy = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        super().__init__(**kwargs)
+
+    def _execute(self, op, data_type, requests):
+        if op in inference_service.BATCHABLE_OPS:
+            self.busy.set()
+            self.release.wait()
+        self.executed.append((op, [request.payload['text'] if 'text' in request.payload else None
+                                   for request in requests]))
+        for request in requests:
+            request.result = op
+
+
+def test_expired_requests_are_not_executed():
+    batcher = RecordingBatcher(max_wait_ms=1)
+    batcher.release.clear()
+    # Occupies the worker until released
+    first = threading.Thread(target=batcher.submit, args=('score', 'languages', {'text': 'first'}))
+    first.start()
+    batcher.busy.wait()
+
+    with pytest.raises(InferenceUnavailableError):
+        batcher.submit('score', 'languages', {'text': 'late'}, timeout=0.05)
+    batcher.release.set()
+    first.join()
+    assert batcher.submit('score', 'languages', {'text': 'next'}) == 'score'
+
+    assert ('score', ['late']) not in batcher.executed
+    assert batcher.get_stats()['expired'] == 1
+
+
+def test_rank_runs_outside_the_batcher():
+    batcher = RecordingBatcher(max_wait_ms=1)
+    batcher.release.clear()
+    blocked = threading.Thread(target=batcher.submit, args=('score', 'languages', {'text': 'slow'}))
+    blocked.start()
+    batcher.busy.wait()
+
+    # The batcher thread is stuck on 'slow', yet a rank request still completes
+    assert batcher.submit('rank_users', 'languages', {'user_anchor_answers': {}}, timeout=1) == 'rank_users'
+    batcher.release.set()
+    blocked.join()
+
+    assert batcher.get_stats()['ranks'] == 1
+
+
+def test_get_analyzer_remote_mode(monkeypatch):
+    import model_registry
+    monkeypatch.setattr(model_registry, 'ML_ANALYZER_MODE', 'remote')
+    analyzer = model_registry.get_analyzer("Languages")
+    assert isinstance(analyzer, inference_service.RemoteEntityAnalyzer)
+    assert analyzer.data_type == "languages"
+
+
+class WireClient:
+    """Client that sends requests through the service's JSON encoding and ranks users in order"""
+
+    def __init__(self):
+        self.payloads = []
+
+    def call(self, op, **payload):
+        payload = json.loads(json.dumps(payload, default=inference_service._json_default))
+        self.payloads.append(payload)
+        ranked = [[user_id, 1.0, {'area': payload['area_name']}] for user_id in payload['user_anchor_answers']]
+        return json.loads(json.dumps(ranked[:payload['top_k']]))
+
+
+def test_remote_rank_matches_local_signature():
+    local = inspect.signature(pytest.importorskip("sentiment_analysis").MLanguageAnalyzer.rank_users_for_task_ml)
+    assert inspect.signature(inference_service.RemoteEntityAnalyzer.rank_users_for_task_ml) == local
+
+
+def test_remote_rank_returns_callers_ids():
+    client = WireClient()
+    analyzer = inference_service.RemoteEntityAnalyzer("languages", client=client)
+    ranked = analyzer.rank_users_for_task_ml({7: "Spanish", 9: "French", 11: "Dutch"}, ["Spanish"], "Quad",
+                                             batch_size=8, top_k=2)
+
+    assert ranked == [(7, 1.0, {'area': "Quad"}), (9, 1.0, {'area': "Quad"})]
+    assert client.payloads[0]['batch_size'] == 8 and client.payloads[0]['top_k'] == 2
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+sentiment_analysis = pytest.importorskip("sentiment_analysis")
+
+
+class FakeZeroShot:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, sequences, labels, hypothesis_template=None, batch_size=None):
+        self.calls.append(list(sequences))
+        return [{'labels': list(labels), 'scores': [1.0] * len(labels), 'sequence': seq} for seq in sequences]
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    fake = FakeZeroShot()
+    monkeypatch.setattr(sentiment_analysis.MLanguageAnalyzer, 'zero_shot_pipeline', property(lambda self: fake))
+    analyzer = sentiment_analysis.MLanguageAnalyzer("languages")
+    analyzer.fake_zero_shot = fake
+    return analyzer
+
+
+def test_zero_shot_confidence_on_full_cache(analyzer):
+    size = sentiment_analysis.ENTITY_CACHE_SIZE
+    analyzer._zero_shot_confidence([f"s{i}" for i in range(size)])
+    assert len(analyzer._confidence_cache) == size
+
+    # The least recently used hit plus one new sequence used to evict the hit before reading it
+    results = analyzer._zero_shot_confidence(["s0", "new"])
+    assert [r['sequence'] for r in results] == ["s0", "new"]
+    assert analyzer.fake_zero_shot.calls[-1] == ["new"]
+    assert len(analyzer._confidence_cache) == size
+    assert "s1" not in analyzer._confidence_cache
+
+
+def test_zero_shot_confidence_more_new_sequences_than_cache(analyzer):
+    sequences = [f"n{i}" for i in range(sentiment_analysis.ENTITY_CACHE_SIZE + 10)]
+    results = analyzer._zero_shot_confidence(sequences)
+    assert [r['sequence'] for r in results] == sequences
+    assert len(analyzer._confidence_cache) == sentiment_analysis.ENTITY_CACHE_SIZE
+
+
+def test_template_embeddings_on_full_cache(analyzer, monkeypatch):
+    def encode(texts, batch_size=32):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    monkeypatch.setattr(analyzer, '_encode_normalized', encode)
+    size = sentiment_analysis.ENTITY_CACHE_SIZE
+    analyzer._template_embeddings([f"e{i}" for i in range(size)])
+
+    result = analyzer._template_embeddings(["e0", "new", "e0"])
+    assert set(result) == {"e0", "new"}
+    assert result["new"].shape == (len(sentiment_analysis.CONFIDENCE_TEMPLATES), 4)
+    assert len(analyzer._template_cache) == size
+
+
+def test_language_check_batched_across_texts(analyzer, monkeypatch):
+    ner_results = {
+        "text one": [{'word': 'Klingon', 'score': 0.9, 'start': 0, 'end': 7},
+                     {'word': 'Albania', 'score': 0.9, 'start': 8, 'end': 15},
+                     {'word': 'Spanish', 'score': 0.9, 'start': 16, 'end': 23}],
+        "text two": [{'word': 'Dothraki', 'score': 0.9, 'start': 0, 'end': 8},
+                     {'word': 'Klingon', 'score': 0.9, 'start': 9, 'end': 16}],
+    }
+    monkeypatch.setattr(sentiment_analysis.MLanguageAnalyzer, 'ner_pipeline',
+                        property(lambda self: lambda texts, batch_size=None: [ner_results[t] for t in texts]))
+    monkeypatch.setattr(sentiment_analysis, 'ML_LEXICON_FAST_PATH', False)
+    monkeypatch.setattr(analyzer, '_encode_normalized',
+                        lambda texts, batch_size=32: np.ones((len(texts), 4), dtype=np.float32) / 2)
+
+    results = analyzer.extract_entities_batch(["text one", "text two"])
+
+    language_calls = [call for call in analyzer.fake_zero_shot.calls if not call[0].startswith("Regarding")]
+    assert language_calls == [["Klingon", "Dothraki"]]
+    assert [[e['entity'] for e in entities] for entities in results] == [["Klingon", "Spanish"], ["Dothraki", "Klingon"]]
+
+
+def test_fallback_uses_the_language_lexicon(analyzer):
+    # NER found nothing: the fallback knows the lexicon's languages and matches whole words only
+    candidates = analyzer._find_entity_candidates("I speak Swahili and some Dutch, no Thai food", [], {})
+    assert [c['entity'] for c in candidates] == ["Swahili", "Dutch", "Thai"]
+    assert analyzer._find_entity_candidates("my englishman friend", [], {}) == []
+
+
+def test_lexicon_and_ner_entities_share_a_scale(analyzer, monkeypatch):
+    # "Klingon" is not in the lexicon, so its text goes through NER and zero-shot
+    monkeypatch.setattr(sentiment_analysis.MLanguageAnalyzer, 'ner_pipeline', property(
+        lambda self: lambda texts, batch_size=None: [[{'word': 'Klingon', 'score': 0.9, 'start': 6, 'end': 13}]
+                                                     for _ in texts]))
+    monkeypatch.setattr(analyzer, '_encode_normalized',
+                        lambda texts, batch_size=32: np.ones((len(texts), 4), dtype=np.float32) / 2)
+
+    lexicon, ner = analyzer.extract_entities_batch(["I can speak some Spanish", "I know Klingon"])
+
+    # Both paths add the same template-similarity boost (1.0 * 0.2) to their level's score
+    some = analyzer.confidence_mapping[analyzer.confidence_levels[2]]
+    top = analyzer.confidence_mapping[analyzer.confidence_levels[0]]
+    assert lexicon[0]['entity'] == "Spanish" and lexicon[0]['confidence'] == pytest.approx(min(some + 0.2, 1.0))
+    assert ner[0]['confidence'] == pytest.approx(min(top + 0.2, 1.0))
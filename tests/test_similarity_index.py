@@ -0,0 +1,70 @@
+import numpy as np
+
+from similarity_index import UserSimilarityIndex
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).reshape(1, -1)
+
+
+def saved_users(path):
+    index = UserSimilarityIndex(2, mode='exact', path=path)
+    index.load()
+    return {user_id: index._texts[index._row_of[user_id]] for user_id in index._user_ids}
+
+
+def test_concurrent_saves_keep_both_writers_users(tmp_path):
+    path = str(tmp_path / 'users.npz')
+    first = UserSimilarityIndex(2, mode='exact', path=path)
+    second = UserSimilarityIndex(2, mode='exact', path=path)
+
+    first.upsert(['u1'], ['english'], unit(1, 0))
+    first.save()
+    second.upsert(['u2'], ['spanish'], unit(0, 1))
+    second.save()
+
+    assert saved_users(path) == {'u1': 'english', 'u2': 'spanish'}
+    # The merged users are usable in the process that saved last
+    assert [user_id for user_id, _ in second.search(unit(1, 0), 1)] == ['u1']
+
+
+def test_save_does_not_revert_another_writers_changes(tmp_path):
+    path = str(tmp_path / 'users.npz')
+    seed = UserSimilarityIndex(2, mode='exact', path=path)
+    seed.upsert(['u1', 'u2'], ['english', 'french'], np.vstack([unit(1, 0), unit(0, 1)]))
+    seed.save()
+
+    first = UserSimilarityIndex(2, mode='exact', path=path)
+    second = UserSimilarityIndex(2, mode='exact', path=path)
+    first.load()
+    second.load()
+
+    first.upsert(['u1'], ['english, spanish'], unit(1, 1))
+    first.save()
+    second.remove(['u2'])
+    second.save()
+
+    assert saved_users(path) == {'u1': 'english, spanish'}
+
+
+def test_removed_and_reembedded_users_are_not_restored(tmp_path):
+    path = str(tmp_path / 'users.npz')
+    seed = UserSimilarityIndex(2, mode='exact', path=path)
+    seed.upsert(['u1', 'u2'], ['english', 'french'], np.vstack([unit(1, 0), unit(0, 1)]))
+    seed.save()
+
+    first = UserSimilarityIndex(2, mode='exact', path=path)
+    second = UserSimilarityIndex(2, mode='exact', path=path)
+    first.load()
+    second.load()
+
+    first.remove(['u1'])
+    first.upsert(['u2'], ['french, german'], unit(1, 1))
+    first.save()
+    # second still holds the old u1 and u2, but only changed u3
+    second.upsert(['u3'], ['spanish'], unit(1, 0))
+    second.save()
+
+    assert saved_users(path) == {'u2': 'french, german', 'u3': 'spanish'}
+    assert 'u1' not in [user_id for user_id, _ in second.search(unit(1, 0), 3)]
@@ -0,0 +1,116 @@
+import ast
+import re
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import task_proximity
+from location_index import UserLocationIndex, haversine_matrix
+from task_config import UNKNOWN_LOCATION_DISTANCE_M
+
+# Areas with no building in constants/areaCoordinates.ts
+UNLOCATED_AREAS = {"Shakespeare Houses", "Other"}
+
+
+def _lexi_areas():
+    source = (Path(task_proximity.__file__).parent / 'server.py').read_text(encoding='utf-8')
+    return ast.literal_eval(re.search(r'^LEXI_AREAS = (\[.*?\])', source, re.S | re.M).group(1))
+
+
+def test_area_buildings_exist_in_coordinates():
+    coordinates = task_proximity.load_area_coordinates()
+    for area, buildings in task_proximity.AREA_BUILDINGS.items():
+        assert buildings, area
+        assert all(building in coordinates for building in buildings), area
+
+
+def test_every_task_area_resolves():
+    areas = _lexi_areas()
+    resolved = task_proximity.resolve_area_coordinates(areas)
+    assert set(areas) - set(resolved) == UNLOCATED_AREAS
+
+
+def test_composite_area_is_centroid_of_buildings():
+    coordinates = {'A': (42.0, -71.0), 'B': (42.2, -71.4)}
+    task_proximity.AREA_BUILDINGS['Both (A, B)'] = ('A', 'B')
+    try:
+        resolved = task_proximity.resolve_area_coordinates(['Both (A, B)', 'A'], coordinates)
+    finally:
+        del task_proximity.AREA_BUILDINGS['Both (A, B)']
+    assert resolved['A'] == (42.0, -71.0)
+    assert resolved['Both (A, B)'] == pytest.approx((42.1, -71.2))
+
+
+def test_area_user_distances_unknown_area_and_user():
+    coordinates = {'A': (42.0, -71.0)}
+    locations = {'u1': (42.01, -71.0)}
+    distances = task_proximity.area_user_distances(['A', 'Nowhere'], ['u1', 'u2'], locations, coordinates)
+    assert distances[0, 0] == pytest.approx(haversine_matrix([coordinates['A']], [locations['u1']])[0, 0])
+    assert distances[0, 1] == UNKNOWN_LOCATION_DISTANCE_M
+    assert (distances[1] == UNKNOWN_LOCATION_DISTANCE_M).all()
+
+
+def _assignment_cost(cost, task_areas, result):
+    return sum(cost[area, user] for area, user in zip(task_areas, result) if user >= 0)
+
+
+def test_solver_respects_capacity_and_priority():
+    cost = np.zeros((1, 2))
+    result = task_proximity.solve_area_assignment(cost, [0] * 5, [1, 2])
+    # Oldest tasks first; the newest are left over once capacity runs out
+    assert (result[:3] >= 0).all() and (result[3:] == -1).all()
+    assert np.bincount(result[:3], minlength=2).tolist() == [1, 2]
+
+
+def test_solver_prefers_nearest_users():
+    cost = np.array([[1.0, 10.0, 10.0],
+                     [10.0, 1.0, 2.0]])
+    result = task_proximity.solve_area_assignment(cost, [0, 1, 1], [1, 1, 1])
+    assert result[0] == 0
+    assert sorted(result[1:].tolist()) == [1, 2]
+
+
+def test_solver_matches_linear_sum_assignment():
+    optimize = pytest.importorskip('scipy.optimize')
+    rng = np.random.default_rng(7)
+    for _ in range(200):
+        num_areas, num_users = rng.integers(1, 6), rng.integers(1, 7)
+        num_tasks = int(rng.integers(1, 12))
+        cost = rng.uniform(0, 1000, size=(num_areas, num_users)).round()
+        task_areas = rng.integers(0, num_areas, size=num_tasks)
+        capacity = rng.integers(0, 3, size=num_users)
+        result = task_proximity.solve_area_assignment(cost, task_areas, capacity)
+
+        slots = np.repeat(np.arange(num_users), capacity)
+        placed = min(num_tasks, len(slots))
+        assert (result >= 0).sum() == placed
+        assert (result[:placed] >= 0).all()
+        assert all(np.bincount(result[result >= 0], minlength=num_users) <= capacity)
+        if not placed:
+            continue
+        # Same tasks (the oldest `placed`) against every capacity slot
+        matrix = cost[np.ix_(task_areas[:placed], slots)]
+        rows, cols = optimize.linear_sum_assignment(matrix)
+        assert _assignment_cost(cost, task_areas, result) == pytest.approx(matrix[rows, cols].sum())
+
+
+def test_candidate_users_keeps_nearest_per_area():
+    coordinates = task_proximity.load_area_coordinates()
+    area_a, area_b = 'Beebe', 'Lulu Chow Wang Campus Center'
+    index = UserLocationIndex()
+    for user_id, (lat, lon) in {'a1': coordinates[area_a], 'b1': coordinates[area_b]}.items():
+        index.update(user_id, lat, lon)
+    for i in range(5):
+        index.update(f'far{i}', coordinates[area_a][0] + 0.05 + i * 0.01, coordinates[area_a][1])
+    user_ids = ['far0', 'a1', 'far1', 'b1', 'far2', 'far3', 'far4', 'unlocated']
+
+    kept = task_proximity.candidate_users([area_a, area_b], [1, 1], user_ids, [1] * 8, per_task=1, index=index)
+    assert [user_ids[i] for i in kept] == ['a1', 'b1']
+
+    # Not enough capacity among the nearest users, or an area that cannot be placed: keep everyone
+    everyone = list(range(len(user_ids)))
+    assert task_proximity.candidate_users([area_a, area_b], [2, 1], user_ids, [1] * 8,
+                                          per_task=1, index=index) == everyone
+    assert task_proximity.candidate_users([area_a, 'Other'], [1, 1], user_ids, [1] * 8,
+                                          per_task=1, index=index) == everyone